@@ -0,0 +1,5 @@
+LOAD DATA LOCAL INFILE %s {ignore}INTO TABLE {table_name}
+    CHARACTER SET utf8
+    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\'
+    LINES TERMINATED BY '{line_terminator}'
+    ({columns})
\ No newline at end of file
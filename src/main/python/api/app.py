@@ -1,18 +1,30 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 
+from api.cache import CatalogCache
+from api.job import CrawlJob, CrawlJobQueue, JobConflictError
+from api.metrics import RequestMetrics
 from crawler.item import HaemukItemCrawler
 from crawler.recipe import MangaeRecipeCrawler, HaemukRecipeCrawler
 from utils.logging import init_logger
-from utils.s3_manager.manage import S3Manager
 
 
-def main():
+def create_app() -> Flask:
+    """
+        used by both development server (main) and serving mode (api.serve)
+    :return: flask app
+    """
     logger = init_logger()
 
     app = Flask(__name__)
     app.config['JSON_AS_ASCII'] = False
     app.config['JSON_SORT_KEYS'] = False
 
+    job_queue = CrawlJobQueue()
+    catalog_cache = CatalogCache(bucket_name="production-bobsim")
+    app.extensions["crawl_job_queue"] = job_queue
+
+    RequestMetrics().init_app(app)
+
     # TODO: classify crawl recipe API service
     @app.route('/', methods=['GET'])
     def index():
@@ -20,17 +32,24 @@ def main():
                 <h3>Recipe</h3>\
                 <strong>Mangae</strong><br>\
                 [GET] : /crawl_recipe/M?str_num=6932924&end_num=6932926<br>\
-                [GET] : /recipe/M<br><br>\
+                [GET] : /recipe/M?format=page&offset=0&limit=100<br><br>\
                 <strong>Haemuk</strong><br>\
                 [GET] : /crawl_recipe/H?str_num=5004&end_num=5005<br>\
                 [GET] : /recipe/H<br><br>\
+                <strong>Crawl Job</strong><br>\
+                [POST] : /crawl_job?source=M&str_num=6932924&end_num=6933924&backend=lxml&worker_num=1<br>\
+                [GET] : /crawl_job<br>\
+                [GET] : /crawl_job/&lt;job_id&gt;<br>\
+                [GET] : /crawl_job/&lt;job_id&gt;/recipes<br><br>\
                 <h3>Item</h3>\
                 <strong>Emart</strong><br>\
                 [GET] : /crawl_item/E<br>\
                 [GET] : /item/E<br><br>\
                 <strong>Haemuk</strong><br>\
                 [GET] : /crawl_item/H<br>\
-                [GET] : /item/H<br><br>"
+                [GET] : /item/H<br><br>\
+                <h3>Metrics</h3>\
+                [GET] : /metrics<br><br>"
 
     @app.route('/crawl_recipe/<source>', methods=['GET'])
     def crawl_recipe(source):
@@ -72,6 +91,70 @@ def main():
 
         return jsonify(result)
 
+    @app.route('/crawl_job', methods=['POST'])
+    def create_crawl_job():
+        """
+            crawl job runs in background, poll '/crawl_job/<job_id>' for its status
+        :return: jsonified job status
+        """
+        args = request.args
+        try:
+            source, str_num, end_num = args["source"], int(args["str_num"]), int(args["end_num"])
+            worker_num = int(args.get("worker_num", 1))
+        except (KeyError, ValueError):
+            return jsonify({
+                "error": "'source', 'str_num' and 'end_num' are required, 'str_num', 'end_num' and "
+                         "'worker_num' should be integer"
+            }), 400
+        if str_num >= end_num:
+            return jsonify({"error": "'end_num' should be greater than 'str_num'"}), 400
+        if worker_num < 1:
+            return jsonify({"error": "'worker_num' should be positive"}), 400
+
+        try:
+            job = CrawlJob(
+                source=source,
+                candidate_num=range(str_num, end_num),
+                bucket_name="production-bobsim",
+                field=['title', 'items', "duration", "tags"],
+                backend=args.get("backend", "selenium"),
+                worker_num=worker_num
+            )
+        except NotImplementedError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            job_queue.submit(job)
+        except JobConflictError as e:
+            return jsonify(dict(e.job.to_dict(), error=str(e))), 409
+        return jsonify(job.to_dict()), 202
+
+    @app.route('/crawl_job', methods=['GET'])
+    def list_crawl_jobs():
+        return jsonify(list(map(lambda j: j.to_dict(), job_queue.list_jobs())))
+
+    @app.route('/crawl_job/<job_id>', methods=['GET'])
+    def get_crawl_job(job_id):
+        """
+        :return: jsonified status, progress and throughput of job
+        """
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "there is no job '{id}'".format(id=job_id)}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/crawl_job/<job_id>/recipes', methods=['GET'])
+    def get_crawl_job_recipes(job_id):
+        """
+        :return: recipes of done job as JSON Lines streamed from s3 shards
+        """
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "there is no job '{id}'".format(id=job_id)}), 404
+        if job.status != "done":
+            return jsonify(job.to_dict()), 409
+        return Response(job.iter_recipes(), mimetype="application/x-ndjson")
+
     @app.route('/crawl_item/<source>', methods=['GET'])
     def crawl_item(source):
         """
@@ -104,13 +187,76 @@ def main():
 
     @app.route('/<prefix>/<source>', methods=['GET'])
     def get_recipes(prefix, source):
-        data = S3Manager("production-bobsim").fetch_dict_from_json(
-            key="crawled_{p}/{s}".format(p=prefix, s=source))
-        if data is None:
+        """
+            query string:
+                format:
+                    "json": [ { key: value ... } per file ] (default)
+                    "page": { "total", "offset", "limit", "data": [ { key: value } ... ] }
+                    "jsonl": { key: value } per line
+                offset, limit: (only for "page", "jsonl") pagination of records, no limit means all records from offset
+            records are not merged, a key crawled in many files is served once per file.
+        :return: streamed response served by in-process cache
+        """
+        args = request.args
+        response_format = args.get("format", "json")
+        if response_format not in ("json", "page", "jsonl"):
+            return jsonify({"error": "'format' should be 'json', 'page' or 'jsonl'"}), 400
+        if response_format == "json" and ("offset" in args or "limit" in args):
+            return jsonify({"error": "'offset' and 'limit' are only for 'page' or 'jsonl' format"}), 400
+
+        try:
+            offset = int(args.get("offset", 0))
+            limit = int(args["limit"]) if "limit" in args else None
+        except ValueError:
+            return jsonify({"error": "'offset' and 'limit' should be integer"}), 400
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({"error": "'offset' and 'limit' should not be negative"}), 400
+
+        catalog = catalog_cache.get(key="crawled_{p}/{s}".format(p=prefix, s=source))
+        if catalog is None:
             return 'there is no data'
-        return jsonify(data)
 
-    app.run(host='0.0.0.0', port=9000, debug=True)
+        headers = {"ETag": '"{e}"'.format(e=catalog.e_tag), "X-Total-Count": str(len(catalog))}
+        if catalog.e_tag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        def join(lines) -> bytes:
+            # b'{"key": value}' -> b'"key": value'
+            return b", ".join(map(lambda line: line[1:-1], lines))
+
+        if response_format == "json":
+            def generate_files():
+                yield b"["
+                for i, records in enumerate(catalog.objects):
+                    yield (b"{" if i == 0 else b", {") + join(records) + b"}"
+                yield b"]"
+
+            return Response(generate_files(), mimetype="application/json", headers=headers)
+
+        lines = catalog.lines[offset:None if limit is None else offset + limit]
+
+        if response_format == "jsonl":
+            return Response(
+                map(lambda line: line + b"\n", lines), mimetype="application/x-ndjson", headers=headers
+            )
+
+        def generate_page():
+            yield '{{"total": {t}, "offset": {o}, "limit": {l}, "data": ['.format(
+                t=len(catalog), o=offset, l="null" if limit is None else limit).encode('utf-8')
+            for i, line in enumerate(lines):
+                yield line if i == 0 else b", " + line
+            yield b"]}"
+
+        return Response(generate_page(), mimetype="application/json", headers=headers)
+
+    return app
+
+
+def main():
+    """
+        development server, use api.serve for production
+    """
+    create_app().run(host='0.0.0.0', port=9000, debug=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logging import init_logger
+from utils.s3_manager.manage import S3Manager, DEFAULT_MAX_WORKERS
+
+# seconds that cached catalog is served without asking s3
+DEFAULT_TTL = 60
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class Catalog:
+    """
+        json objects of one directory, kept as serialized JSON Lines records: b'{"key": value}'
+        records are grouped by object and never merged, so a key in many objects is kept in each of them.
+    """
+
+    def __init__(self, e_tag: str, objects: list):
+        """
+        :param objects: list of records (list of bytes) per object, in order of object keys
+        """
+        self.e_tag = e_tag
+        self.objects = objects
+        self.lines = [line for records in objects for line in records]
+        self.size = sum(map(len, self.lines))
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.lines)
+
+
+class CatalogCache:
+    """
+        in-process TTL/LRU cache of json directories in s3 (e.g. crawled_recipe/M)
+
+        - within ttl, catalog is served from memory without any request to s3.
+        - after ttl, objects are listed and downloaded again only if their ETags are changed.
+        - total size of cached catalogs is bounded by max_bytes (the least recently used one is evicted),
+          a catalog larger than max_bytes is not cached at all.
+    """
+
+    def __init__(self, bucket_name, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.logger = init_logger()
+
+        self.s3_manager = S3Manager(bucket_name=bucket_name)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.lock = threading.Lock()
+        self.catalogs = OrderedDict()
+
+    @staticmethod
+    def make_e_tag(objs: list) -> str:
+        """
+        :param objs: list of dict { "Key", "ETag" }
+        :return: ETag of directory, changed if any object is added, removed or changed
+        """
+        signature = "".join(map(lambda o: "{k}:{e};".format(k=o["Key"], e=o["ETag"]), objs))
+        return hashlib.sha256(signature.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Catalog or None:
+        """
+        :param key: directory in s3
+        :return: Catalog, None if there is no json
+        """
+        with self.lock:
+            catalog = self.catalogs.get(key)
+            if catalog is not None:
+                self.catalogs.move_to_end(key)
+                if time.monotonic() - catalog.checked_at < self.ttl:
+                    return catalog
+
+        objs = sorted(
+            filter(lambda o: o["Size"] > 0 and o["Key"].endswith(".json"), self.s3_manager.list_objects(prefix=key)),
+            key=lambda o: o["Key"]
+        )
+        if len(objs) == 0:
+            return None
+
+        e_tag = self.make_e_tag(objs)
+        if catalog is not None and catalog.e_tag == e_tag:
+            catalog.checked_at = time.monotonic()
+            return catalog
+
+        catalog = self.load(objs, e_tag)
+        with self.lock:
+            self.catalogs.pop(key, None)
+            if catalog.size > self.max_bytes:
+                # served once, caching it would evict every other catalog and still exceed max_bytes
+                self.logger.warning("'{key}' ({size} bytes) is larger than catalog cache".format(
+                    key=key, size=catalog.size))
+            else:
+                self.catalogs[key] = catalog
+                self.evict()
+        return catalog
+
+    def load(self, objs: list, e_tag: str) -> Catalog:
+        """
+            download objects concurrently and serialize their records (objects other than dict are skipped)
+        """
+        def fetch(obj):
+            body = self.s3_manager.fetch_body(key=obj["Key"])
+            try:
+                return self.s3_manager.parse_body(body, conversion_type="json")
+            finally:
+                body.close()
+
+        def to_records(obj, data) -> list:
+            if not isinstance(data, dict):
+                self.logger.warning("'{key}' is not a json object, it is not cached".format(key=obj["Key"]))
+                return []
+            return list(map(lambda i: json.dumps(dict([i]), ensure_ascii=False).encode('utf-8'), data.items()))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(DEFAULT_MAX_WORKERS, len(objs)))) as executor:
+            objects = list(map(to_records, objs, executor.map(fetch, objs)))
+
+        catalog = Catalog(e_tag=e_tag, objects=objects)
+        self.logger.info("{num} files ({records} records) are cached".format(num=len(objs), records=len(catalog)))
+        return catalog
+
+    def evict(self):
+        """
+            it should be called with self.lock, the least recently used catalogs are evicted first
+        """
+        total = sum(map(lambda c: c.size, self.catalogs.values()))
+        while total > self.max_bytes and len(self.catalogs) > 0:
+            key, catalog = self.catalogs.popitem(last=False)
+            total -= catalog.size
+            self.logger.debug("evict '{key}' from catalog cache".format(key=key))
+
+    def clear(self):
+        with self.lock:
+            self.catalogs.clear()
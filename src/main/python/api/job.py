@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from crawler.pool import RecipeCrawlerPool
+from crawler.recipe import MangaeRecipeCrawler, HaemukRecipeCrawler
+from utils.logging import init_logger
+from utils.s3_manager.manage import S3Manager
+
+# the number of crawl jobs running at once, the others wait in queue
+DEFAULT_JOB_WORKERS = 4
+
+RECIPE_CRAWLERS = {
+    "M": MangaeRecipeCrawler,
+    "H": HaemukRecipeCrawler,
+}
+
+
+class JobConflictError(Exception):
+    """
+        raised when a job overlaps the range of an active job of the same source
+    """
+
+    def __init__(self, job):
+        """
+        :param job: active CrawlJob in conflict
+        """
+        super().__init__("job '{id}' is {status} on the overlapping range".format(id=job.job_id, status=job.status))
+        self.job = job
+
+
+class CrawlJob:
+    """
+        recipe crawl job executed by CrawlJobQueue
+
+        status: "queued" -> "running" -> "done" or "failed"
+        result is saved as shards by ShardedRecipeSink, so the same range resumes from checkpoint.
+    """
+
+    def __init__(self, source, candidate_num, bucket_name, field=None, backend="selenium", worker_num=1):
+        """
+        :param source: "M"(Mangae), "H"(Haemuk)
+        :param candidate_num: range of recipe ids
+        :param backend: "selenium", "lxml" (see SeleniumCrawler)
+        :param worker_num: if greater than 1, crawl by RecipeCrawlerPool
+        """
+        if source not in RECIPE_CRAWLERS:
+            raise NotImplementedError("unknown source '{s}'".format(s=source))
+
+        self.logger = init_logger()
+
+        self.job_id = uuid.uuid4().hex
+        self.source = source
+        self.candidate_num = candidate_num
+        self.bucket_name = bucket_name
+        self.key = "crawled_recipe/{s}".format(s=source)
+        self.field = field
+        self.backend = backend
+        self.worker_num = worker_num
+
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        # crawler or pool of running job, it has the sink
+        self.runner = None
+        self.checkpoint = None
+
+    def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        self.logger.info("start crawl job '{id}'".format(id=self.job_id))
+        try:
+            kwargs = {"field": self.field} if self.field is not None else {}
+            if self.worker_num > 1:
+                self.runner = RecipeCrawlerPool(
+                    crawler=RECIPE_CRAWLERS[self.source], candidate_num=self.candidate_num,
+                    bucket_name=self.bucket_name, key=self.key, worker_num=self.worker_num,
+                    backend=self.backend, **kwargs
+                )
+            else:
+                self.runner = RECIPE_CRAWLERS[self.source](
+                    candidate_num=self.candidate_num, bucket_name=self.bucket_name, key=self.key,
+                    backend=self.backend, **kwargs
+                )
+            self.checkpoint = self.runner.process_job()
+            self.status = "done"
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+            self.status = "failed"
+            self.error = repr(e)
+        finally:
+            self.finished_at = time.time()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def overlaps(self, other) -> bool:
+        """
+            jobs on the same recipes would write them to s3 twice (and race on checkpoint of the same range)
+        """
+        return self.source == other.source and \
+            self.candidate_num[0] <= other.candidate_num[-1] and other.candidate_num[0] <= self.candidate_num[-1]
+
+    @property
+    def sink(self):
+        return None if self.runner is None else self.runner.sink
+
+    @property
+    def shards(self) -> list:
+        if self.checkpoint is not None:
+            return self.checkpoint["shards"]
+        return [] if self.sink is None else list(self.sink.shards)
+
+    def to_dict(self) -> dict:
+        """
+        :return: status, progress, the number of ids resumed from checkpoint and throughput (recipes/sec of this run)
+        """
+        total = len(self.candidate_num)
+        processed, resumed, throughput = 0, 0, None
+        if self.sink is not None and hasattr(self.sink, "processed"):
+            processed, resumed = self.sink.processed, self.sink.resumed
+            elapsed = (time.time() if self.finished_at is None else self.finished_at) - self.started_at
+            if elapsed > 0:
+                throughput = round((processed - resumed) / elapsed, 3)
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "source": self.source,
+            "str_num": self.candidate_num[0],
+            "end_num": self.candidate_num[-1] + 1,
+            "processed": processed,
+            "total": total,
+            "progress": round(processed / total, 4) if total > 0 else 1.0,
+            "resumed": resumed,
+            "throughput": throughput,
+            "shards": len(self.shards),
+            "error": self.error,
+        }
+
+    def iter_recipes(self):
+        """
+            stream recipes from s3 shards line by line
+            recipes crawled twice (i.e. redone after crash) are yielded once.
+        :return: generator of JSON Lines (bytes)
+        """
+        s3_manager = S3Manager(bucket_name=self.bucket_name)
+        seen = set()
+        for shard_key in self.shards:
+            body = s3_manager.fetch_body(key=shard_key)
+            try:
+                for line in body.iter_lines():
+                    if len(line.strip()) == 0:
+                        continue
+                    recipe_id = json.loads(line)["recipe_id"]
+                    if recipe_id in seen:
+                        continue
+                    seen.add(recipe_id)
+                    yield line + b"\n"
+            finally:
+                body.close()
+
+
+class CrawlJobQueue:
+    """
+        in-memory registry of crawl jobs with a bounded pool of background workers
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_JOB_WORKERS):
+        self.logger = init_logger()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl-job")
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, job: CrawlJob) -> CrawlJob:
+        """
+        :raise JobConflictError: if an active job of the same source overlaps the range of job
+        """
+        with self.lock:
+            conflict = next(filter(lambda j: j.is_active and j.overlaps(job), self.jobs.values()), None)
+            if conflict is not None:
+                raise JobConflictError(conflict)
+            self.jobs[job.job_id] = job
+        self.executor.submit(job.run)
+        self.logger.info("crawl job '{id}' is queued".format(id=job.job_id))
+        return job
+
+    def get(self, job_id) -> CrawlJob or None:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def shutdown(self, wait: bool = True, cancel_queued: bool = False):
+        """
+        :param cancel_queued: if True, jobs not started yet are cancelled
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_queued)
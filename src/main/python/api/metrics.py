@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request, Response
+
+# seconds, upper bounds of latency histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # the last one is for +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """
+        :return: list of (upper bound, the number of observations <= upper bound)
+        """
+        result, total = [], 0
+        for bound, count in zip(list(map(str, self.buckets)) + ["+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class RequestMetrics:
+    """
+        per route latency histogram, in-flight gauge and response counter of flask app
+        exposed in prometheus text format by '/metrics'.
+
+        - route is the url rule (e.g. /crawl_job/<job_id>), not the raw path, so the number of series is bounded.
+        - latency of streamed response is measured until the stream is closed.
+        - metrics are kept per process, each worker of serving mode reports its own (see api.serve).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.in_flight = {}
+        self.responses = {}
+
+    def init_app(self, app, path="/metrics"):
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.add_url_rule(path, "metrics", self.export, methods=['GET'])
+        app.extensions["request_metrics"] = self
+
+    @staticmethod
+    def make_label() -> tuple:
+        rule = "<unmatched>" if request.url_rule is None else request.url_rule.rule
+        return request.method, rule
+
+    def start(self, label: tuple):
+        with self.lock:
+            self.in_flight[label] = self.in_flight.get(label, 0) + 1
+
+    def finish(self, label: tuple, status: int, elapsed: float):
+        with self.lock:
+            self.in_flight[label] -= 1
+            if label not in self.histograms:
+                self.histograms[label] = Histogram(self.buckets)
+            self.histograms[label].observe(elapsed)
+            key = label + (status,)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def before_request(self):
+        g.metrics_label = self.make_label()
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_finished = False
+        self.start(g.metrics_label)
+
+    def after_request(self, response):
+        label, started_at, status = g.metrics_label, g.metrics_started_at, response.status_code
+        response.call_on_close(lambda: self.finish(label, status, time.perf_counter() - started_at))
+        g.metrics_finished = True
+        return response
+
+    def teardown_request(self, exc):
+        # response is not made (e.g. unhandled exception in after_request)
+        if "metrics_label" in g and not g.metrics_finished:
+            self.finish(g.metrics_label, 500, time.perf_counter() - g.metrics_started_at)
+
+    def render(self) -> str:
+        """
+        :return: prometheus text exposition format
+        """
+        def labels(method, route, **kwargs):
+            pairs = [("method", method), ("route", route)] + list(kwargs.items())
+            return ",".join(map(lambda p: '{k}="{v}"'.format(k=p[0], v=p[1]), pairs))
+
+        with self.lock:
+            lines = [
+                "# HELP http_requests_in_flight The number of requests being processed.",
+                "# TYPE http_requests_in_flight gauge",
+            ]
+            lines += list(map(
+                lambda i: "http_requests_in_flight{{{l}}} {v}".format(l=labels(*i[0]), v=i[1]),
+                sorted(self.in_flight.items())
+            ))
+
+            lines += [
+                "# HELP http_responses_total The number of responses by status.",
+                "# TYPE http_responses_total counter",
+            ]
+            lines += list(map(
+                lambda i: "http_responses_total{{{l}}} {v}".format(l=labels(*i[0][:2], status=i[0][2]), v=i[1]),
+                sorted(self.responses.items())
+            ))
+
+            lines += [
+                "# HELP http_request_duration_seconds Latency of requests.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for label, histogram in sorted(self.histograms.items()):
+                lines += list(map(
+                    lambda b: "http_request_duration_seconds_bucket{{{l}}} {v}".format(
+                        l=labels(*label, le=b[0]), v=b[1]),
+                    histogram.cumulative()
+                ))
+                lines.append("http_request_duration_seconds_sum{{{l}}} {v}".format(l=labels(*label), v=histogram.sum))
+                lines.append("http_request_duration_seconds_count{{{l}}} {v}".format(
+                    l=labels(*label), v=histogram.count))
+
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,87 @@
+import argparse
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+from api.app import create_app
+from utils.logging import init_logger
+
+# crawl jobs and metrics are kept in memory of a worker (see CrawlingApplication), scale by threads
+DEFAULT_WORKERS = 1
+DEFAULT_THREADS = 8
+# seconds, long enough for streamed responses of large catalogs
+DEFAULT_TIMEOUT = 120
+# seconds that workers are given to finish in-flight requests on SIGTERM
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+
+def worker_exit(server, worker):
+    """
+        gunicorn hook: queued crawl jobs are cancelled and running ones are left to stop with the worker.
+        their progress is kept by checkpoint, so posting the same range again resumes it.
+    """
+    app = worker.wsgi
+    job_queue = getattr(app, "extensions", {}).get("crawl_job_queue")
+    if job_queue is not None:
+        job_queue.shutdown(wait=False, cancel_queued=True)
+
+
+class CrawlingApplication(BaseApplication):
+    """
+        production serving mode of api.app
+
+        - pre-fork workers, each of them handles requests by a thread pool (gthread).
+        - SIGTERM stops accepting and waits graceful_timeout for in-flight requests.
+        - app is created in every worker (not preloaded), because thread pools of app do not survive fork.
+          (i.e. crawl jobs, cache and metrics are kept per worker)
+
+        with more than one worker, requests are balanced over workers which do not share that state:
+        '/crawl_job/<job_id>' of a job queued by another worker is 404, overlapping jobs are not detected
+        and '/metrics' reports only the worker serving it. so it runs one worker by default,
+        more workers need a shared job store and multiprocess metrics first.
+    """
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        list(map(lambda o: self.cfg.set(o[0], o[1]), self.options.items()))
+
+    def load(self):
+        return create_app()
+
+
+def parse_args(arg) -> dict:
+    parser = argparse.ArgumentParser("crawling api")
+    parser.add_argument('--host', default="0.0.0.0")
+    parser.add_argument('--port', default=9000, type=int)
+    parser.add_argument('--workers', default=DEFAULT_WORKERS, type=int,
+                        help="jobs and metrics are per worker, see CrawlingApplication before raising it")
+    parser.add_argument('--threads', default=DEFAULT_THREADS, type=int)
+    parser.add_argument('--timeout', default=DEFAULT_TIMEOUT, type=int)
+    parser.add_argument('--graceful_timeout', default=DEFAULT_GRACEFUL_TIMEOUT, type=int)
+    args = parser.parse_args(arg[1:])
+    if args.workers > 1:
+        init_logger().warning("{n} workers do not share crawl jobs and metrics".format(n=args.workers))
+
+    return {
+        "bind": "{host}:{port}".format(host=args.host, port=args.port),
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "worker_exit": worker_exit,
+    }
+
+
+def main(arg):
+    """
+        python -m api.serve --threads 8
+    """
+    CrawlingApplication(options=parse_args(arg)).run()
+
+
+if __name__ == '__main__':
+    main(arg=sys.argv)
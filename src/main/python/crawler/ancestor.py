@@ -1,11 +1,17 @@
 from selenium import webdriver
 
+from crawler.static import StaticDriver
 from utils.logging import init_logger
 from utils.s3_manager.manage import S3Manager
 
 
 class SeleniumCrawler:
-    def __init__(self, base_url, bucket_name, key, head=False):
+    def __init__(self, base_url, bucket_name, key, head=False, backend="selenium"):
+        """
+        :param backend:
+            "selenium": every page is rendered by headless chrome
+            "lxml": page is fetched by HTTP and parsed by lxml, chrome is opened only for pages needing JS
+        """
         self.logger = init_logger()
 
         self.bucket_name = bucket_name
@@ -13,14 +19,25 @@ class SeleniumCrawler:
         self.prefix = key
 
         self.chrome_path = "C:/chromedriver"
-        options = webdriver.ChromeOptions()
-        if head is False:
-            options.add_argument('headless')
+        self.head = head
 
-        self.driver = webdriver.Chrome(executable_path=self.chrome_path, chrome_options=options)
+        self.backend = backend
+        if backend == "selenium":
+            self.driver = self.open_browser()
+        elif backend == "lxml":
+            self.driver = StaticDriver(fallback=self.open_browser)
+        else:
+            raise NotImplementedError
 
         self.base_url = base_url
 
+    def open_browser(self):
+        options = webdriver.ChromeOptions()
+        if self.head is False:
+            options.add_argument('headless')
+
+        return webdriver.Chrome(executable_path=self.chrome_path, chrome_options=options)
+
     # TODO: click elements sequentially
     def click_element_by_xpath(self, xpath: str):
         ele = self.driver.find_element_by_xpath(xpath=xpath)
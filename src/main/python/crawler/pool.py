@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from crawler.sink import RecipeSink, ShardedRecipeSink, DEFAULT_SHARD_SIZE
+from utils.logging import init_logger
+from utils.s3_manager.manage import S3Manager
+
+
+class RecipeCrawlerPool:
+    """
+        worker pool mode of RecipeCrawler.process
+
+        - candidate_num is sharded over N crawlers, each owns its browser (driver).
+        - image download/upload is pipelined on a separate I/O pool,
+          so browsers do not wait for it.
+        - results of every worker are collected in a shared sink.
+    """
+
+    def __init__(self, crawler, candidate_num, bucket_name, key, worker_num=4, io_worker_num=8, **kwargs):
+        """
+        :param crawler: subclass of RecipeCrawler (e.g. MangaeRecipeCrawler)
+        :param candidate_num: range of recipe ids
+        :param worker_num: the number of browser instances
+        :param io_worker_num: the number of threads for image download/upload
+        :param kwargs: other arguments for crawler (e.g. base_url, field)
+        """
+        self.logger = init_logger()
+
+        self.crawler = crawler
+        self.candidate_num = candidate_num
+        self.bucket_name = bucket_name
+        self.prefix = key
+        self.worker_num = max(1, min(worker_num, len(candidate_num)))
+        self.io_worker_num = io_worker_num
+        self.kwargs = kwargs
+
+        self.sink = RecipeSink()
+
+    def split(self, candidate_num) -> list:
+        """
+            interleaved shards, so that every worker meets recent and old recipes evenly
+        :return: list of range (or list)
+        """
+        return list(filter(
+            lambda s: len(s) > 0, map(lambda i: candidate_num[i::self.worker_num], range(self.worker_num))
+        ))
+
+    def make_crawlers(self, shards: list) -> list:
+        """
+            crawlers are built on the calling thread, not on workers,
+            because boto3 (S3Manager of crawler) creates resources on a session which is not thread-safe.
+        :return: list of crawler per shard
+        """
+        crawlers = []
+        try:
+            for shard in shards:
+                crawlers.append(self.crawler(
+                    candidate_num=shard, bucket_name=self.bucket_name, key=self.prefix, **self.kwargs
+                ))
+        except Exception:
+            list(map(lambda c: c.driver.quit(), crawlers))
+            raise
+        return crawlers
+
+    def crawl_shard(self, crawler, io_pool: ThreadPoolExecutor) -> list:
+        """
+            run on a worker thread with its own browser
+        :param crawler: crawler of a shard (see make_crawlers)
+        :return: list of futures of image tasks
+        """
+        shard = crawler.candidate_num
+
+        def image_task(recipe_num, page):
+            try:
+                recipe = crawler.safe(
+                    lambda: crawler.attach_image(*page, recipe_id=recipe_num), recipe_num=recipe_num)
+            except Exception:
+                # e.g. ConnectionError of upload, raised again by crawl after the id is recorded
+                self.sink.put(recipe_num, False)
+                raise
+            self.sink.put(recipe_num, recipe)
+
+        futures = []
+        try:
+            for recipe_num in shard:
+                page = crawler.safe(lambda: crawler.crawl_page(recipe_num=recipe_num), recipe_num=recipe_num)
+                if page is False:
+                    self.sink.put(recipe_num, False)
+                else:
+                    futures.append(io_pool.submit(image_task, recipe_num, page))
+        finally:
+            crawler.driver.quit()
+        return futures
+
+    def crawl(self, candidate_num=None) -> dict:
+        """
+        :param candidate_num: recipe ids to be crawled, default is all of self.candidate_num
+        :return: result of sink (recipes: dict)
+        """
+        crawlers = self.make_crawlers(self.split(self.candidate_num if candidate_num is None else candidate_num))
+        with ThreadPoolExecutor(max_workers=self.io_worker_num) as io_pool:
+            with ThreadPoolExecutor(max_workers=self.worker_num) as pool:
+                shard_futures = list(map(lambda c: pool.submit(self.crawl_shard, c, io_pool), crawlers))
+                image_futures = sum(map(lambda f: f.result(), shard_futures), [])
+            # raise exception of image tasks if any
+            list(map(lambda f: f.result(), image_futures))
+
+        return self.sink.result()
+
+    def process(self) -> dict:
+        """
+            1. crawl recipes by workers
+            2. save to s3
+        :return: recipes: dict
+        """
+        recipes = self.crawl()
+        S3Manager(bucket_name=self.bucket_name).save_dict_to_json(
+            data=recipes,
+            key="{prefix}/{str}-{end}.json".format(
+                prefix=self.prefix, str=self.candidate_num[0], end=self.candidate_num[-1])
+        )
+
+        self.logger.info("success to save {n} recipes by {w} workers ({f} failed)".format(
+            n=len(recipes), w=self.worker_num, f=len(self.sink.failed)))
+        return recipes
+
+    def process_job(self, job_key=None, shard_size=DEFAULT_SHARD_SIZE, retry_failed=True) -> dict:
+        """
+            resumable mode of process (see RecipeCrawler.process_job)
+        :return: checkpoint: dict
+        """
+        if job_key is None:
+            job_key = "crawl_job/{prefix}/{str}-{end}".format(
+                prefix=self.prefix, str=self.candidate_num[0], end=self.candidate_num[-1])
+
+        self.sink = ShardedRecipeSink(
+            s3_manager=S3Manager(bucket_name=self.bucket_name), key=job_key, shard_size=shard_size
+        )
+        try:
+            self.crawl(candidate_num=self.sink.pending(self.candidate_num, retry_failed=retry_failed))
+        finally:
+            self.sink.close()
+
+        self.logger.info("success to crawl {n} recipes by {w} workers".format(n=len(self.sink), w=self.worker_num))
+        return self.sink.result()
@@ -1,22 +1,30 @@
+import asyncio
 import io
 import urllib.request
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from urllib.error import HTTPError
 
-import boto3
+import requests
 from selenium.common.exceptions import UnexpectedAlertPresentException, NoSuchElementException
 
 from crawler.ancestor import SeleniumCrawler
+from crawler.sink import ShardedRecipeSink, DEFAULT_SHARD_SIZE
 from utils.function import take, add
 from utils.string import get_digits_from_str, get_float_from_str
 
+DEFAULT_CONCURRENCY = 16
+
 
 class RecipeCrawler(SeleniumCrawler):
-    def __init__(self, base_url, candidate_num, field, bucket_name, key):
-        super().__init__(base_url, bucket_name, key)
+    def __init__(self, base_url, candidate_num, field, bucket_name, key, backend="selenium"):
+        super().__init__(base_url, bucket_name, key, backend=backend)
         self.candidate_num = candidate_num
         self.field = field
+        self._bucket_region = None
+        # sink of running job (see process_job)
+        self.sink = None
 
     def process(self) -> dict:
         """
@@ -28,7 +36,7 @@ class RecipeCrawler(SeleniumCrawler):
         """
         result = map(lambda n: (n, self.crawl(recipe_num=n)), self.candidate_num)
         recipes = dict(filter(lambda r: False not in r, result))
-        self.s3_manager.save_dict_to_s3(
+        self.s3_manager.save_dict_to_json(
             data=recipes,
             key="{prefix}/{str}-{end}.json".format(
                 prefix=self.prefix, str=self.candidate_num[0], end=self.candidate_num[-1])
@@ -38,29 +46,169 @@ class RecipeCrawler(SeleniumCrawler):
         self.driver.quit()
         return recipes
 
+    def make_job_key(self) -> str:
+        """
+            out of prefix of crawled recipes, so that shards are not mixed with '{str}-{end}.json'
+        """
+        return "crawl_job/{prefix}/{str}-{end}".format(
+            prefix=self.prefix, str=self.candidate_num[0], end=self.candidate_num[-1])
+
+    def process_job(self, job_key=None, shard_size=DEFAULT_SHARD_SIZE, retry_failed=True) -> dict:
+        """
+            resumable mode of process
+            recipes are flushed to s3 by shard and ids done in previous run of the same job are skipped.
+        :param job_key: directory of the job in s3, default is made from prefix and candidate_num
+        :param shard_size: the number of recipes per shard
+        :param retry_failed: if False, ids failed in previous run are skipped too
+        :return: checkpoint: dict
+        """
+        sink = ShardedRecipeSink(
+            s3_manager=self.s3_manager,
+            key=self.make_job_key() if job_key is None else job_key,
+            shard_size=shard_size
+        )
+        self.sink = sink
+        try:
+            for n in sink.pending(self.candidate_num, retry_failed=retry_failed):
+                sink.put(n, self.crawl(recipe_num=n))
+        finally:
+            # keep the progress even if crawling is stopped by unexpected error
+            sink.close()
+            self.driver.quit()
+
+        self.logger.info("success to crawl {n} recipes".format(n=len(sink)))
+        return sink.result()
+
+    def process_async(self, concurrency=DEFAULT_CONCURRENCY) -> dict:
+        """
+            same as process, but pages and images are fetched concurrently (only for "lxml" backend)
+        :return: recipes: dict
+        """
+        try:
+            recipes = asyncio.run(self.crawl_async(concurrency=concurrency))
+        finally:
+            self.driver.quit()
+
+        self.s3_manager.save_dict_to_json(
+            data=recipes,
+            key="{prefix}/{str}-{end}.json".format(
+                prefix=self.prefix, str=self.candidate_num[0], end=self.candidate_num[-1])
+        )
+
+        self.logger.info("success to save {n} recipes".format(n=len(recipes)))
+        return recipes
+
+    async def crawl_async(self, concurrency=DEFAULT_CONCURRENCY) -> dict:
+        """
+            HTTP requests (page, image) run on a thread pool as many as concurrency.
+            parsing runs on a single parser thread one page at a time, because getters share self.driver,
+            and a page rendered by browser (see parse_page) blocks that thread, not the event loop.
+        :return: recipes: dict
+        """
+        if self.backend != "lxml":
+            raise NotImplementedError("async crawling needs 'lxml' backend")
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor, ThreadPoolExecutor(max_workers=1) as parser:
+            def run(func, recipe_num, pool=executor):
+                return loop.run_in_executor(pool, self.safe, func, recipe_num)
+
+            async def crawl_one(recipe_num):
+                async with semaphore:
+                    url = self.make_url(recipe_id=recipe_num)
+                    source = await run(lambda: self.driver.fetch(url), recipe_num)
+                    if source is False:
+                        return recipe_num, False
+
+                    # load and parse of a page run in one task of parser, so that pages are never mixed up
+                    page = await run(lambda: self.parse_source(url, source), recipe_num, pool=parser)
+                    if page is False:
+                        return recipe_num, False
+
+                    recipe = await run(lambda: self.attach_image(*page, recipe_id=recipe_num), recipe_num)
+                    return recipe_num, recipe
+
+            result = await asyncio.gather(*map(crawl_one, self.candidate_num))
+
+        return dict(filter(lambda r: False not in r, result))
+
     def crawl(self, recipe_num) -> dict or bool:
         """
             1. connection
             2. get recipe -> dict
+            3. save image
         :return: recipe(Success) or False(Fail)
         """
+        return self.safe(
+            lambda: self.attach_image(*self.crawl_page(recipe_num=recipe_num), recipe_id=recipe_num),
+            recipe_num=recipe_num
+        )
+
+    def crawl_page(self, recipe_num) -> tuple:
+        """
+            1. connection
+            2. get recipe -> dict
+            it uses driver, so it should be called by the thread owning this crawler.
+        :return: recipe, url of main image
+        """
+        self.connection(recipe_id=recipe_num)
+        return self.parse_page()
+
+    def parse_source(self, url, source) -> tuple:
+        """
+            same as crawl_page with already fetched HTML (only for "lxml" backend)
+        :return: recipe, url of main image
+        """
+        self.driver.load(url, source)
+        return self.parse_page()
+
+    def parse_page(self) -> tuple:
+        """
+            get recipe from current page
+            with "lxml" backend, page is rendered by browser only if static HTML has no title or image
+        :return: recipe, url of main image
+        """
         try:
-            self.connection(recipe_id=recipe_num)
+            return self.get_recipe(), self.get_image_url()
+        except (UnexpectedAlertPresentException, NoSuchElementException):
+            if self.backend == "selenium" or not self.driver.can_render:
+                raise
+            self.driver.render()
+            return self.get_recipe(), self.get_image_url()
+
+    def attach_image(self, recipe, image_url, recipe_id) -> dict:
+        """
+            download image, upload it to s3 and attach s3 url to recipe
+            it does not use driver, so it can be called on I/O pool. (see crawler.pool)
+        :return: recipe
+        """
+        if self.save_image_to_s3(recipe_id=recipe_id, url=image_url):
+            recipe["image_url"] = self.get_s3_image_url(recipe_id=recipe_id)
+        else:
+            raise ConnectionError
 
-            recipe = self.get_recipe()
-            if self.save_image_to_s3(recipe_id=recipe_num):
-                recipe["image_url"] = self.get_s3_image_url(recipe_id=recipe_num)
-            else:
-                raise ConnectionError
+        # TODO: logging error (UnicodeEncodeError)
+        self.logger.info(recipe)
+        return recipe
 
-            # TODO: logging error (UnicodeEncodeError)
-            self.logger.info(recipe)
-            return recipe
+    def safe(self, func, recipe_num):
+        """
+        :param func: step of crawling a recipe
+        :return: result of func(Success) or False(Fail)
+        """
+        try:
+            return func()
 
         except HTTPError as e:
             self.logger.exception(e, exc_info=True)
             return False
 
+        except requests.RequestException as e:
+            self.logger.exception(e, exc_info=True)
+            return False
+
         except ValueError as e:
             self.logger.exception(e, exc_info=True)
             return False
@@ -81,8 +229,11 @@ class RecipeCrawler(SeleniumCrawler):
             self.logger.exception(e, exc_info=True)
             return False
 
+    def make_url(self, recipe_id) -> str:
+        return "{base_url}/{num}".format(base_url=self.base_url, num=str(recipe_id))
+
     def connection(self, recipe_id=6847470) -> None:
-        target_url = "{base_url}/{num}".format(base_url=self.base_url, num=str(recipe_id))
+        target_url = self.make_url(recipe_id=recipe_id)
         self.driver.get(target_url)
         self.logger.debug("success to connect with '{url}'".format(url=target_url))
 
@@ -117,8 +268,9 @@ class RecipeCrawler(SeleniumCrawler):
             "tags": self.get_tags,
         }[key]()
 
-    def save_image_to_s3(self, recipe_id) -> bool:
-        url = self.get_image_url()
+    def save_image_to_s3(self, recipe_id, url=None) -> bool:
+        if url is None:
+            url = self.get_image_url()
         with urllib.request.urlopen(url) as url:
             img = io.BytesIO(url.read())
         return self.s3_manager.save_img(
@@ -126,11 +278,20 @@ class RecipeCrawler(SeleniumCrawler):
             kwargs={"ACL": 'public-read', 'ContentType': 'image/jpg'}
         )
 
+    @property
+    def bucket_region(self) -> str:
+        # requested once per crawler, not per recipe
+        # through the client of s3_manager, because creating a client (boto3.client) is not thread-safe
+        if self._bucket_region is None:
+            self._bucket_region = self.s3_manager.s3.meta.client.get_bucket_location(
+                Bucket=self.bucket_name)['LocationConstraint']
+        return self._bucket_region
+
     def get_s3_image_url(self, recipe_id) -> str:
         # get s3 url of main img
         return "https:/{bucket}.s3.{region}.amazonaws.com/{key}".format(
             bucket=self.bucket_name,
-            region=boto3.client('s3').get_bucket_location(Bucket=self.bucket_name)['LocationConstraint'],
+            region=self.bucket_region,
             key="{prefix}/images/{recipe_id}.jpg".format(prefix=self.prefix, recipe_id=recipe_id)
         )
 
@@ -167,7 +328,7 @@ class RecipeCrawler(SeleniumCrawler):
 
 class MangaeRecipeCrawler(RecipeCrawler):
     def __init__(self, base_url="https://www.10000recipe.com/recipe", candidate_num=range(6828809, 6828811), field=None,
-                 bucket_name="production-bobsim", key="crawled_recipe/mangae"):
+                 bucket_name="production-bobsim", key="crawled_recipe/mangae", backend="selenium"):
         """
             https://www.10000recipe.com/recipe/
             recipe_num: about 6828805 ~ 6935000
@@ -184,7 +345,8 @@ class MangaeRecipeCrawler(RecipeCrawler):
             candidate_num=candidate_num,
             field=field,
             bucket_name=bucket_name,
-            key=key
+            key=key,
+            backend=backend
         )
 
     def get_title(self) -> str:
@@ -226,7 +388,7 @@ class MangaeRecipeCrawler(RecipeCrawler):
 
 class HaemukRecipeCrawler(RecipeCrawler):
     def __init__(self, base_url="https://www.haemukja.com/recipes", candidate_num=range(5000, 5001), field=None,
-                 bucket_name="production_bobsim", key="crawled_recipe/haemuk"):
+                 bucket_name="production_bobsim", key="crawled_recipe/haemuk", backend="selenium"):
         """
             https://www.haemukja.com/recipes
             recipe_num: about ? ~ ?
@@ -243,7 +405,8 @@ class HaemukRecipeCrawler(RecipeCrawler):
             candidate_num=candidate_num,
             field=field,
             bucket_name=bucket_name,
-            key=key
+            key=key,
+            backend=backend
         )
 
     def get_title(self) -> str:
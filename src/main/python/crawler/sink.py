@@ -0,0 +1,183 @@
+import threading
+
+from utils.logging import init_logger
+
+DEFAULT_SHARD_SIZE = 500
+
+
+class RecipeSink:
+    """
+        thread-safe results sink shared by crawler workers
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recipes = {}
+        # ids failed at any step (page or image)
+        self.failed = set()
+
+    def put(self, recipe_id, recipe) -> None:
+        """
+        :param recipe: crawled recipe(dict) or False(Fail)
+        """
+        with self.lock:
+            if recipe is False:
+                self.failed.add(recipe_id)
+                return
+            self.recipes[recipe_id] = recipe
+
+    def __len__(self):
+        with self.lock:
+            return len(self.recipes)
+
+    def pending(self, candidate_num, retry_failed: bool = True) -> list:
+        """
+        :return: recipe ids not crawled yet
+        """
+        return list(candidate_num)
+
+    def close(self) -> None:
+        pass
+
+    def result(self) -> dict:
+        """
+        :return: recipes ordered by recipe id
+        """
+        with self.lock:
+            return dict(sorted(self.recipes.items()))
+
+
+def to_ranges(ids) -> list:
+    """
+        [1, 2, 3, 5] -> [[1, 3], [5, 5]], checkpoint of consecutive ids is kept small
+    """
+    ranges = []
+    for i in sorted(ids):
+        if len(ranges) > 0 and ranges[-1][1] + 1 == i:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def from_ranges(ranges) -> set:
+    return set(i for start, end in ranges for i in range(start, end + 1))
+
+
+class ShardedRecipeSink(RecipeSink):
+    """
+        sink of resumable crawl job
+
+        - every shard_size recipes are flushed to s3 as a JSON Lines shard: {key}/shard-{n}.jsonl
+        - checkpoint ({key}/checkpoint.json) of done/failed ids is saved right after each shard,
+          so that restarted job skips them. (it is saved after shard, so a shard is never lost,
+          but recipes of a shard saved just before crash can be crawled again: readers dedup by recipe_id)
+        - only one shard is kept in memory.
+    """
+
+    def __init__(self, s3_manager, key, shard_size: int = DEFAULT_SHARD_SIZE):
+        """
+        :param s3_manager: S3Manager
+        :param key: directory of the job in s3, the same key resumes the job
+        :param shard_size: the number of recipes per shard
+        """
+        super().__init__()
+        self.logger = init_logger()
+
+        self.s3_manager = s3_manager
+        self.key = key
+        self.shard_size = shard_size
+
+        checkpoint = self.load_checkpoint()
+        self.done = from_ranges(checkpoint["done"])
+        self.failed = from_ranges(checkpoint["failed"])
+        self.shards = checkpoint["shards"]
+        # the number of ids processed before this run
+        self.resumed = len(self.done | self.failed)
+        if len(self.shards) > 0:
+            self.logger.info("resume job '{key}': {done} done, {failed} failed".format(
+                key=key, done=len(self.done), failed=len(self.failed)))
+
+    @property
+    def checkpoint_key(self) -> str:
+        return "{key}/checkpoint.json".format(key=self.key)
+
+    @property
+    def checkpoint(self) -> dict:
+        return {
+            "done": to_ranges(self.done),
+            "failed": to_ranges(self.failed - self.done),
+            "shards": self.shards,
+        }
+
+    def load_checkpoint(self) -> dict:
+        checkpoints = self.s3_manager.fetch_dict_from_json(key=self.checkpoint_key)
+        if checkpoints is None:
+            return {"done": [], "failed": [], "shards": []}
+        return checkpoints[0]
+
+    def pending(self, candidate_num, retry_failed: bool = True) -> list:
+        """
+        :param retry_failed: if False, ids failed in previous run are skipped too
+        :return: recipe ids not crawled yet
+        """
+        skipped = self.done if retry_failed else self.done | self.failed
+        return list(filter(lambda n: n not in skipped, candidate_num))
+
+    def put(self, recipe_id, recipe) -> None:
+        with self.lock:
+            if recipe is False:
+                self.failed.add(recipe_id)
+                return
+            self.recipes[recipe_id] = recipe
+            if len(self.recipes) >= self.shard_size:
+                self.flush()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.done) + len(self.recipes)
+
+    @property
+    def processed(self) -> int:
+        """
+        :return: the number of ids crawled (success or fail) including previous runs
+        """
+        with self.lock:
+            return len(self.done | self.failed | self.recipes.keys())
+
+    def flush(self) -> None:
+        """
+            save buffered recipes as a shard and update checkpoint, it should be called with self.lock
+        """
+        if len(self.recipes) == 0:
+            return
+
+        shard_key = "{key}/shard-{n:05d}.jsonl".format(key=self.key, n=len(self.shards))
+        # save_object raises on failure, then buffer is kept and checkpoint is not updated
+        self.s3_manager.save_dicts_to_jsonl(
+            data=list(map(lambda r: dict(recipe_id=r[0], **r[1]), sorted(self.recipes.items()))),
+            key=shard_key
+        )
+        self.shards.append(shard_key)
+        self.done.update(self.recipes.keys())
+        self.recipes = {}
+
+        self.s3_manager.save_dict_to_json(data=self.checkpoint, key=self.checkpoint_key)
+        self.logger.info("flush '{key}': {done} recipes are done".format(key=shard_key, done=len(self.done)))
+
+    def close(self) -> None:
+        """
+            flush the last partial shard and save checkpoint (with ids failed after the last shard)
+        """
+        with self.lock:
+            if len(self.recipes) > 0:
+                self.flush()
+            else:
+                self.s3_manager.save_dict_to_json(data=self.checkpoint, key=self.checkpoint_key)
+
+    def result(self) -> dict:
+        """
+        :return: checkpoint, recipes are in shards
+        """
+        with self.lock:
+            return self.checkpoint
@@ -0,0 +1,166 @@
+import re
+
+import requests
+from lxml import html
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import NoSuchElementException
+
+from utils.logging import init_logger
+
+DEFAULT_POOL_SIZE = 16
+# seconds
+DEFAULT_TIMEOUT = 10
+
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+        HTTP session whose connections are kept alive and shared by threads
+    :param pool_size: the maximum number of connections per host
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class StaticElement:
+    """
+        lxml element wrapped with the subset of selenium WebElement API used by crawlers,
+        so that the same getters (e.g. MangaeRecipeCrawler.get_title) work on static HTML.
+    """
+
+    def __init__(self, element):
+        self.element = element
+
+    @staticmethod
+    def class_xpath(name: str) -> str:
+        return './/*[contains(concat(" ", normalize-space(@class), " "), " {name} ")]'.format(name=name)
+
+    def find_elements_by_xpath(self, xpath: str) -> list:
+        # selenium evaluates absolute xpath against the whole document even on element
+        return list(map(StaticElement, filter(
+            lambda e: isinstance(e, html.HtmlElement), self.element.xpath(xpath)
+        )))
+
+    def find_element_by_xpath(self, xpath: str):
+        elements = self.find_elements_by_xpath(xpath)
+        if len(elements) == 0:
+            raise NoSuchElementException("Unable to locate element: '{xpath}'".format(xpath=xpath))
+        return elements[0]
+
+    def find_elements_by_class_name(self, name: str) -> list:
+        return self.find_elements_by_xpath(self.class_xpath(name))
+
+    def find_element_by_class_name(self, name: str):
+        return self.find_element_by_xpath(self.class_xpath(name))
+
+    def find_elements_by_tag_name(self, name: str) -> list:
+        return self.find_elements_by_xpath('.//{name}'.format(name=name))
+
+    def find_element_by_tag_name(self, name: str):
+        return self.find_element_by_xpath('.//{name}'.format(name=name))
+
+    def get_attribute(self, name: str) -> str or None:
+        return self.element.get(name)
+
+    @property
+    def text(self) -> str:
+        """
+            approximation of rendered text: text nodes are stripped and joined by new line
+            (i.e. "<h1><span>a</span> b</h1>" -> "a\\nb")
+        """
+        chunks = map(lambda t: re.sub(r'\s+', ' ', t).strip(), self.element.itertext())
+        return "\n".join(filter(lambda t: t != "", chunks))
+
+
+class StaticDriver:
+    """
+        drop-in replacement of selenium driver for pages which do not need JS
+
+        - HTML is fetched by a pooled HTTP session and parsed by lxml.
+        - render() falls back to selenium for the current page, the browser is opened only when it is needed.
+        - pages saved as files can be crawled by pointing base_url of crawler at a local HTTP server
+          (e.g. python -m http.server), so getters can be checked without network.
+    """
+
+    def __init__(self, fallback=None, session: requests.Session = None, timeout: float = DEFAULT_TIMEOUT):
+        """
+        :param fallback: function to open a selenium driver, None means no fallback
+        :param session: HTTP session, it can be shared by drivers
+        :param timeout: seconds to wait for response
+        """
+        self.logger = init_logger()
+
+        self.fallback = fallback
+        self.session = make_session() if session is None else session
+        self.timeout = timeout
+
+        self.browser = None
+        self.current_url = None
+        self.document = None
+        # True while current page is served by browser
+        self.rendered = False
+
+    @property
+    def can_render(self) -> bool:
+        return self.fallback is not None
+
+    def fetch(self, url: str) -> str:
+        """
+            thread-safe, it does not touch the state of driver
+        :return: HTML
+        """
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def load(self, url: str, source: str) -> None:
+        """
+            set already fetched HTML as current page
+        """
+        self.current_url = url
+        self.document = StaticElement(html.document_fromstring(source, base_url=url))
+        self.rendered = False
+
+    def get(self, url: str) -> None:
+        self.load(url, self.fetch(url))
+
+    def render(self) -> None:
+        """
+            load current page in browser, so that elements made by JS can be found
+        """
+        if not self.can_render:
+            raise NotImplementedError("no fallback driver for '{url}'".format(url=self.current_url))
+        if self.browser is None:
+            self.browser = self.fallback()
+        self.logger.debug("render '{url}' with browser".format(url=self.current_url))
+        self.browser.get(self.current_url)
+        self.rendered = True
+
+    @property
+    def page(self):
+        return self.browser if self.rendered else self.document
+
+    def find_element_by_xpath(self, xpath: str):
+        return self.page.find_element_by_xpath(xpath)
+
+    def find_elements_by_xpath(self, xpath: str) -> list:
+        return self.page.find_elements_by_xpath(xpath)
+
+    def find_element_by_class_name(self, name: str):
+        return self.page.find_element_by_class_name(name)
+
+    def find_elements_by_class_name(self, name: str) -> list:
+        return self.page.find_elements_by_class_name(name)
+
+    def find_element_by_tag_name(self, name: str):
+        return self.page.find_element_by_tag_name(name)
+
+    def find_elements_by_tag_name(self, name: str) -> list:
+        return self.page.find_elements_by_tag_name(name)
+
+    def quit(self) -> None:
+        self.session.close()
+        if self.browser is not None:
+            self.browser.quit()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from utils.handle_null import NullHandler
+
+
+def aggregate_by_key(df: pd.DataFrame, columns_with_drop: list, columns_with_zero: list, columns_with_linear: list,
+                     key: str = "date") -> pd.DataFrame:
+    """
+        mean by key in a single grouped reduction, with null strategies applied on the way:
+            drop: rows with null in these columns are not aggregated (for zero columns)
+            zero: null is counted as 0 (fillna -> groupby)
+            linear: null is skipped, then means are interpolated by key (groupby -> fillna)
+
+        rows are grouped once (one-hot matrix of key codes), and sums/counts of every column are
+        reduced by the matrix product over a NumPy array, without intermediate DataFrames per strategy.
+    :param df: pd DataFrame which has key and numeric columns
+    :return: pd DataFrame [key, columns_with_zero, columns_with_linear] sorted by key
+    """
+    # code -1: null key is not aggregated as groupby does
+    codes, keys = pd.factorize(df[key], sort=True)
+    grouped = codes >= 0
+    codes = codes[grouped]
+    group = csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(len(keys), len(codes))
+    )
+
+    columns = columns_with_zero + columns_with_linear
+    values = df[columns].to_numpy(dtype="float64")[grouped]
+    not_null = ~np.isnan(values)
+    np.nan_to_num(values, copy=False, nan=0.0)
+
+    # zero: fillna(0) after drop, so mean is sum / the number of rows not dropped
+    kept = df[columns_with_drop].notna().all(axis=1).to_numpy()[grouped].astype("float64")
+    zero = len(columns_with_zero)
+    zero_sums = group @ (values[:, :zero] * kept[:, None])
+    zero_sizes = group @ kept
+
+    # linear: mean skips null, so mean is sum / the number of non-null values
+    linear_sums = group @ values[:, zero:]
+    linear_counts = group @ not_null[:, zero:].astype("float64")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.hstack([zero_sums / zero_sizes[:, None], linear_sums / linear_counts])
+
+    aggregated = pd.DataFrame(means, columns=columns).astype(df[columns].dtypes.to_dict())
+    aggregated[columns_with_linear] = NullHandler.fillna_with_linear(aggregated[columns_with_linear])
+    aggregated.insert(0, key, keys)
+    return aggregated
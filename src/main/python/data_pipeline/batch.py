@@ -0,0 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from utils.logging import init_logger
+
+
+def partition_by_month(df: pd.DataFrame, column: str = "date") -> dict:
+    """
+        partition DataFrame by month in a single groupby pass, rows without date (NaT) are dropped
+    :param df: pd DataFrame which has datetime64 column
+    :param column: name of datetime column
+    :return: dict { "YYYYMM": pd DataFrame }
+    """
+    dated = df[column].notna()
+    if not dated.all():
+        init_logger().warning("{num} rows without '{column}' are dropped".format(
+            num=int((~dated).sum()), column=column))
+        df = df[dated]
+
+    return dict(list(df.groupby(df[column].dt.strftime("%Y%m"))))
+
+
+def pick_month(column: str, term: datetime):
+    """
+        row filter of S3Manager.iter_chunks, rows in the month of term
+    :param column: name of date column in origin csv (not parsed yet)
+    :param term: datetime of the month
+    :return: function (pd DataFrame) -> boolean mask
+    """
+    def picker(df: pd.DataFrame):
+        date = pd.to_datetime(df[column])
+        return (date.dt.year == term.year) & (date.dt.month == term.month)
+    return picker
+
+
+def month_range(column: str, term: datetime) -> tuple:
+    """
+        predicate of S3Manager.fetch_df_from_csv_select, rows in the month of term
+        (date in origin csv is assumed to start with "YYYY-MM")
+    :param column: name of date column in origin csv
+    :param term: datetime of the month
+    :return: (column, "YYYY-MM" of term, "YYYY-MM" of the next month)
+    """
+    upper = datetime(term.year + term.month // 12, term.month % 12 + 1, 1)
+    return column, term.strftime("%Y-%m"), upper.strftime("%Y-%m")
+
+
+def process_partition(processor, bucket_name: str, date: str, df: pd.DataFrame, kwargs: dict):
+    """
+        module level function, so that it can be pickled to process pool
+    :param processor: processor class which accepts 'origin_df' (e.g. OpenDataTerrestrialWeather)
+    :return: exit code (bool)  0:success 1:fail
+    """
+    return processor(bucket_name=bucket_name, date=date, origin_df=df, **kwargs).process()
+
+
+def process_by_month(processor, bucket_name: str, origin_df: pd.DataFrame, dates: list = None,
+                     max_workers: int = None, **kwargs) -> dict:
+    """
+        run clean/transform/save of processor per month partition of already loaded origin DataFrame
+    :param processor: processor class which accepts 'origin_df' (e.g. OpenDataTerrestrialWeather)
+    :param origin_df: origin DataFrame loaded once
+    :param dates: list of str "YYYYMM" to be processed, None means every month in origin_df
+    :param max_workers:
+        None: process partitions sequentially
+        int: process partitions in a process pool
+    :param kwargs: other arguments for processor (e.g. file_format)
+    :return: dict { "YYYYMM": exit code }
+    """
+    logger = init_logger()
+
+    partitions = partition_by_month(origin_df)
+    if dates is None:
+        dates = sorted(partitions.keys())
+
+    missing = list(filter(lambda d: d not in partitions, dates))
+    if len(missing) > 0:
+        logger.warning("there is no data for {dates}".format(dates=missing))
+    targets = list(filter(lambda d: d in partitions, dates))
+
+    logger.info("start batch processing {num} months with {processor}".format(
+        num=len(targets), processor=processor.__name__))
+
+    if max_workers is None:
+        codes = list(map(
+            lambda d: process_partition(processor, bucket_name, d, partitions[d], kwargs), targets
+        ))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = list(map(
+                lambda d: executor.submit(process_partition, processor, bucket_name, d, partitions[d], kwargs),
+                targets
+            ))
+            codes = list(map(lambda f: f.result(), futures))
+
+    # month without data is regarded as fail
+    result = {**dict.fromkeys(missing, 1), **dict(zip(targets, codes))}
+    logger.info("{success}/{num} months are processed".format(
+        success=list(result.values()).count(0), num=len(result)))
+    return result
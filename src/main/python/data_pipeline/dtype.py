@@ -1,36 +1,60 @@
 """
     dtypes for each open data.
 
+    reduction_dtype: compact dtypes parsed directly from csv (compact mode of loaders)
+        - repeated strings (region, unit, item, location ...) are categorical
+        - numerics are the smallest type holding values, means are accumulated in float64
+          (i.e. int32 price is divided by float64 unit, float32 weather is aggregated by aggregate_by_key)
+
     # TODO: float 16 causes overflow?(inf) when aggregating mean
 """
 
+
+def parse_dtype(dtypes: dict) -> dict:
+    """
+        dtypes which can be given to read_csv, datetime columns are converted after parsing
+    :param dtypes: one of dtype or reduction_dtype
+    :return: dict { column: dtype } without datetime64
+    """
+    return {column: t for column, t in dtypes.items() if t != "datetime64"}
+
+
 reduction_dtype = {
     "raw_material_price": {
         "조사일자": "datetime64",
-        "조사지역명": "object", "조사단위명": "object",
-        "조사등급명": "object", "조사구분명": "object",
-        "표준품목명": "object",  # "조사가격품목명": "object", "표준품종명": "object", "조사가격품종명": "object",
-        # TODO: type casting error btw UInt and float while aggregate mean
-        "당일조사가격": "int",
+        "조사지역명": "category", "조사단위명": "category",
+        "조사등급명": "category", "조사구분명": "category",
+        "표준품목명": "category",
+        # signed, UInt is cast to float while aggregating mean
+        "당일조사가격": "int32",
     },
-    # TODO: Find reasons not applicable
     "terrestrial_weather": {
         "일시": "datetime64",
-        "지점": "object",
+        "지점": "category",
+        "평균기온(°C)": "float32",
         "최저기온(°C)": "float32",
+        "최고기온(°C)": "float32",
+        "강수 계속시간(hr)": "float32",
         "일강수량(mm)": "float32",
-        "최소 상대습도(pct)": "float32"
+        "최대 풍속(m/s)": "float32",
+        "평균 풍속(m/s)": "float32",
+        "최소 상대습도(pct)": "float32",
+        "평균 상대습도(pct)": "float32"
     },
     "marine_weather": {
         "일시": "datetime64",
-        "지점": "object",
+        "지점": "category",
+        "평균 풍속(m/s)": "float32",
         "평균기압(hPa)": "float32",
         "평균 상대습도(pct)": "float32",
         "평균 기온(°C)": "float32",
         "평균 수온(°C)": "float32",
         "평균 최대 파고(m)": "float32",
+        "평균 유의 파고(m)": "float32",
+        "최고 유의 파고(m)": "float32",
         "최고 최대 파고(m)": "float32",
         "평균 파주기(sec)": "float32",
+        "최고 파주기(sec)": "float32",
     }
 }
 
@@ -1,8 +1,12 @@
+from functools import reduce
+from itertools import chain
+
 import pandas as pd
 
-from data_pipeline.dtype import dtype, reduction_dtype
+from data_pipeline.dtype import dtype, reduction_dtype, parse_dtype
 from data_pipeline.translate import translation
-from data_pipeline.unit import get_unit
+from data_pipeline.unit import get_units
+from utils.function import add
 from utils.handle_null import NullHandler
 from utils.logging import init_logger
 from utils.s3_manager.manage import S3Manager
@@ -12,10 +16,21 @@ from utils.visualize import draw_hist
 
 class OpenDataRawMaterialPrice:
 
-    def __init__(self, bucket_name: str, date: str):
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv", incremental: bool = False,
+                 compact: bool = False):
+        """
+        :param file_format: format of processed data, "csv" or "parquet"
+        :param incremental:
+            True: only new/changed origin objects are loaded and only their new/changed days are processed
+                  and merged into the existing partition (see process_incremental)
+            False: whole month is processed
+        :param compact: if True, origin csv is parsed with reduction_dtype (only used columns, categorical strings)
+        """
         self.logger = init_logger()
 
         self.date = date
+        self.incremental = incremental
+        self.compact = compact
 
         # s3
         # TODO: bucket_name -> parameterized
@@ -23,15 +38,42 @@ class OpenDataRawMaterialPrice:
         self.load_key = "public_data/open_data_raw_material_price/origin/csv/{filename}.csv".format(
             filename=self.date
         )
-        self.save_key = "public_data/open_data_raw_material_price/process/csv/{filename}.csv".format(
+        # origin objects of this month (e.g. origin/csv/201908.csv, origin/csv/20190801.csv)
+        self.origin_prefix = "public_data/open_data_raw_material_price/origin/csv/{filename}".format(
+            filename=self.date
+        )
+        # origin objects (key: ETag), days of each object (key: [date]) and days (date: digest)
+        # already processed into save_key
+        self.manifest_key = "public_data/open_data_raw_material_price/process/manifest/{filename}.json".format(
             filename=self.date
         )
+        self.file_format = file_format
+        self.save_key = "public_data/open_data_raw_material_price/process/{fmt}/{filename}.{fmt}".format(
+            fmt=self.file_format, filename=self.date
+        )
 
-        self.dtypes = dtype["raw_material_price"]
+        self.dtypes = reduction_dtype["raw_material_price"] if compact else dtype["raw_material_price"]
         self.translate = translation["raw_material_price"]
 
-        # load filtered df
-        self.input_df = self.load()
+        # load filtered df, incremental mode loads only changed objects in process_incremental
+        self.input_df = None if incremental else self.load()
+
+    def validate(self, df: pd.DataFrame):
+        """
+            filter by column and check types
+        """
+        return df[self.dtypes.keys()].astype(dtype=self.dtypes).rename(columns=self.translate, inplace=False)
+
+    @property
+    def read_options(self) -> dict:
+        """
+            compact mode projects and types columns while parsing csv,
+            so that unused columns and repeated strings are never materialised as objects
+        :return: kwargs of S3Manager.fetch_df_from_csv, convert
+        """
+        if not self.compact:
+            return {}
+        return {"columns": list(self.dtypes.keys()), "dtype": parse_dtype(self.dtypes)}
 
     def load(self):
         """
@@ -39,29 +81,106 @@ class OpenDataRawMaterialPrice:
         :return: pd DataFrame
         """
         # fetch
-        df = self.s3_manager.fetch_df_from_csv(key=self.load_key)
+        df = self.s3_manager.fetch_df_from_csv(key=self.load_key, **self.read_options)
 
         # TODO: no use index to get first element.
-        # validate (filter by column and check types)
-        return df[0][self.dtypes.keys()].astype(dtype=self.dtypes).rename(columns=self.translate, inplace=False)
+        return self.validate(df[0])
 
     def save(self, df: pd.DataFrame):
-        self.s3_manager.save_df_to_csv(df=df, key=self.save_key)
+        self.s3_manager.save_df(df=df, key=self.save_key, file_format=self.file_format)
+
+    def load_manifest(self) -> dict:
+        manifests = self.s3_manager.fetch_dict_from_json(key=self.manifest_key)
+        if manifests is None:
+            return {"objects": {}, "object_days": {}, "days": {}}
+        # manifest written before days of objects were recorded
+        return {"object_days": {}, **manifests[0]}
+
+    def save_manifest(self, objects: dict, object_days: dict, days: dict):
+        self.s3_manager.save_dict_to_json(
+            data={"objects": objects, "object_days": object_days, "days": days}, key=self.manifest_key
+        )
+
+    def load_objects(self, objs: list) -> dict:
+        """
+        :param objs: list of s3.ObjectSummary of origin csv
+        :return: dict { key: validated pd DataFrame }
+        """
+        return dict(map(
+            lambda o: (o.key, self.validate(self.s3_manager.convert(o, conversion_type="csv", **self.read_options))),
+            objs
+        ))
+
+    @staticmethod
+    def days_of(df: pd.DataFrame) -> list:
+        """
+        :return: sorted list of str "YYYY-MM-DD" in df
+        """
+        return sorted(df["date"].dropna().dt.strftime("%Y-%m-%d").unique().tolist())
+
+    @staticmethod
+    def normalize(df: pd.DataFrame) -> pd.DataFrame:
+        """
+            the same rows have the same values and dtypes whether they are loaded by dtype or reduction_dtype
+            (categorical -> object, int32 -> int64, float32 -> float64), columns in order of names
+        """
+        def normalize_column(column: pd.Series) -> pd.Series:
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                return column.astype(object)
+            if column.dtype.kind in "iu":
+                return column.astype("int64")
+            if column.dtype.kind == "f":
+                return column.astype("float64")
+            return column
+
+        return pd.DataFrame(dict(map(lambda c: (c, normalize_column(df[c])), sorted(df.columns))))
+
+    @staticmethod
+    def digest_by_day(df: pd.DataFrame) -> dict:
+        """
+            order-insensitive digest of origin rows per day, so that a re-uploaded month file
+            only costs the days actually changed.
+            rows are normalized, so that digests in manifest do not depend on compact mode.
+        :param df: validated origin DataFrame
+        :return: dict { "YYYY-MM-DD": digest }
+        """
+        hashed = pd.util.hash_pandas_object(OpenDataRawMaterialPrice.normalize(df), index=False)
+        digests = hashed.groupby(df["date"].dt.strftime("%Y-%m-%d")).sum()
+        return dict(map(lambda d: (d[0], str(d[1])), digests.items()))
+
+    def load_process(self):
+        """
+        :return: existing processed partition, None if there is not
+        """
+        df = self.s3_manager.fetch_df(key=self.save_key, file_format=self.file_format)
+        if df is None:
+            return None
+        # TODO: no use index to get first element.
+        return df[0].assign(date=lambda x: pd.to_datetime(x["date"]))
+
+    @staticmethod
+    def merge(existing: pd.DataFrame, processed: pd.DataFrame, days: list):
+        """
+            replace rows of days in existing partition with newly processed rows
+        :param days: list of str "YYYY-MM-DD" reprocessed
+        """
+        if existing is None:
+            return processed
+        kept = existing[~existing["date"].dt.strftime("%Y-%m-%d").isin(days)]
+        return pd.concat([kept, processed], ignore_index=True).sort_values(
+            ["date", "region", "standard_item_name"]
+        ).reset_index(drop=True)
 
     def clean(self, df: pd.DataFrame):
         """
             clean null value
         :return: cleaned DataFrame
         """
-        # pd Series represents the number of null values by column
-        nh = NullHandler()
-        df_null = nh.missing_values(df)
-        self.logger.info("missing values: \n {}".format(df_null))
-
-        if df_null is None:
-            return df
-        else:
-            return df.dropna(axis=0)
+        # drop rows with null, the number of null values by column is counted in the same scan
+        nh = NullHandler(strategy={"drop": list(df.columns)}, df=df)
+        cleaned = nh.process()
+        self.logger.info("missing values: \n {}".format(nh.missing))
+        return cleaned
 
     def standardize(self, s: pd.Series):
         mean, std = s.mean(), s.std()
@@ -97,26 +216,35 @@ class OpenDataRawMaterialPrice:
     def combine_categories(df: pd.DataFrame):
         """
             combine 4 categories into one category 'item name'
-        :return: combined pd DataFrame
+            strings are concatenated only once per distinct combination, not per row.
+            not used by filter yet, partition is still grouped by 'standard_item_name' (see filter)
+        :return: combined pd DataFrame ('item_name' is categorical)
         """
-        return df.assign(
-            item_name=lambda
-                x: x.standard_item_name + x.survey_price_item_name + x.standard_breed_name + x.survey_price_type_name
-        ).drop(
-            columns=["standard_item_name", "survey_price_item_name", "standard_breed_name", "survey_price_type_name"],
-            axis=1
-        )
+        columns = ["standard_item_name", "survey_price_item_name", "standard_breed_name", "survey_price_type_name"]
+
+        # code of each distinct combination
+        codes, combinations = pd.MultiIndex.from_frame(df[columns].astype("object")).factorize()
+        combined = reduce(add, map(
+            lambda i: pd.Series(combinations.get_level_values(i), dtype="object"), range(len(columns))
+        ))
+
+        # different combinations can make the same name (e.g. "ab" + "c", "a" + "bc"),
+        # combination with missing value makes missing name (code -1)
+        name_codes, names = pd.factorize(combined)
+        item_name = pd.Categorical.from_codes(name_codes[codes], categories=names.astype("object"))
+        return df.assign(item_name=item_name).drop(columns=columns)
 
     @staticmethod
     def convert_by_unit(df: pd.DataFrame):
         """
             transform unit
+            unit is looked up once per category and broadcast by categorical codes.
         :return: transformed pd DataFrame
         """
-        return df.assign(unit=lambda r: r.unit_name.map(
-            lambda x: get_unit(x)
-            # TODO: not unit but stardard unit name
-        )).assign(price=lambda x: x.price / x.unit).drop(columns=["unit_name", "unit"], axis=1)
+        # TODO: not unit but stardard unit name
+        unit_name = df["unit_name"].astype("category")
+        unit = get_units(unit_name.cat.categories)[unit_name.cat.codes.to_numpy()]
+        return df.assign(price=df["price"].to_numpy() / unit).drop(columns=["unit_name"])
 
     def filter(self, df):
         """
@@ -141,9 +269,11 @@ class OpenDataRawMaterialPrice:
         # combined = self.combine_categories(retail)
 
         # prices divided by 'material grade'(grade) will be used on average.
+        # observed: categorical keys do not make empty groups of every combination,
+        # but groups of observed categorical keys are not sorted, so aggregated index is sorted instead
         return replaced.drop(["grade"], axis=1).groupby(
-            ["date", "region", "standard_item_name"]  # "item_name"]
-        ).mean().reset_index()
+            ["date", "region", "standard_item_name"], observed=True  # "item_name"]
+        ).mean().sort_index().reset_index()
 
     def process(self):
         """
@@ -157,6 +287,9 @@ class OpenDataRawMaterialPrice:
             TODO: save to rdb
         :return: exit code (bool)  0:success 1:fail
         """
+        if self.incremental:
+            return self.process_incremental()
+
         try:
             filtered = self.filter(self.input_df)
             cleaned = self.clean(filtered)
@@ -165,6 +298,13 @@ class OpenDataRawMaterialPrice:
             # decomposed = self.decompose_date(transformed)
 
             self.save(cleaned)
+            # record processed objects, so that following incremental runs skip them
+            objs = self.s3_manager.filter_objects(key=self.load_key, conversion_type="csv")
+            self.save_manifest(
+                objects=dict(map(lambda o: (o.key, o.e_tag), objs)),
+                object_days=dict(map(lambda o: (o.key, self.days_of(self.input_df)), objs)),
+                days=self.digest_by_day(self.input_df)
+            )
         except IOError as e:
             # TODO: consider that it can repeat to save one more time
             self.logger.critical(e, exc_info=True)
@@ -173,6 +313,65 @@ class OpenDataRawMaterialPrice:
         self.logger.info("success to process raw material price")
         return 0
 
+    def process_incremental(self):
+        """
+            process only new/changed days and merge them into existing partition
+                1. compare origin objects (key, ETag) with manifest
+                2. load new/changed objects, and unchanged objects sharing their days (e.g. a daily object
+                   uploaded after the month object), so that a day is always processed with all of its rows
+                3. find new/changed/removed days by digest
+                4. filter, clean the days (every step is separable by day)
+                5. merge into existing partition and save with manifest
+        :return: exit code (bool)  0:success 1:fail
+        """
+        try:
+            manifest = self.load_manifest()
+            object_days = manifest["object_days"]
+            objs = self.s3_manager.filter_objects(key=self.origin_prefix, conversion_type="csv")
+            changed = list(filter(lambda o: manifest["objects"].get(o.key) != o.e_tag, objs))
+            if len(changed) == 0:
+                self.logger.info("raw material price of {date} is up to date".format(date=self.date))
+                return 0
+
+            loaded = self.load_objects(changed)
+            # days of changed objects before and after the change
+            affected = set(chain(
+                *map(self.days_of, loaded.values()), *map(lambda o: object_days.get(o.key, []), changed)
+            ))
+            # days of objects are unknown (older manifest), every object is reloaded
+            unknown = any(map(lambda o: o.key not in object_days, objs))
+            shared = list(filter(
+                lambda o: o.key not in loaded and (unknown or not affected.isdisjoint(object_days[o.key])), objs
+            ))
+            loaded.update(self.load_objects(shared))
+            if unknown:
+                affected.update(chain(*map(self.days_of, loaded.values())))
+
+            origin = pd.concat(loaded.values(), ignore_index=True)
+            origin = origin[origin["date"].dt.strftime("%Y-%m-%d").isin(affected)]
+            digests = self.digest_by_day(origin)
+            days = sorted(filter(lambda d: manifest["days"].get(d) != digests.get(d), affected))
+            self.logger.info("{objs} origin objects are changed, {shared} reloaded, {days} days to be processed".format(
+                objs=len(changed), shared=len(shared), days=len(days)))
+
+            if len(days) > 0:
+                self.input_df = origin[origin["date"].dt.strftime("%Y-%m-%d").isin(days)]
+                # days only removed from origin have no rows to process
+                cleaned = self.clean(self.filter(self.input_df)) if len(self.input_df) > 0 else None
+                self.save(self.merge(self.load_process(), cleaned, days))
+
+            self.save_manifest(
+                objects={**manifest["objects"], **dict(map(lambda o: (o.key, o.e_tag), changed))},
+                object_days={**object_days, **dict(map(lambda i: (i[0], self.days_of(i[1])), loaded.items()))},
+                days={**dict(filter(lambda d: d[0] not in affected, manifest["days"].items())), **digests}
+            )
+        except IOError as e:
+            self.logger.critical(e, exc_info=True)
+            return 1
+
+        self.logger.info("success to process raw material price incrementally")
+        return 0
+
     @staticmethod
     def decompose_date(df: pd.DataFrame):
         # TODO: do by argument
@@ -5,16 +5,34 @@ import numpy as np
 import pandas as pd
 from scipy.stats import skew
 
-from data_pipeline.dtype import dtype, reduction_dtype
+from data_pipeline.aggregate import aggregate_by_key
+from data_pipeline.batch import process_by_month, pick_month, month_range
+from data_pipeline.dtype import dtype, reduction_dtype, parse_dtype
 from data_pipeline.translate import translation
-from utils.handle_null import NullHandler
 from utils.logging import init_logger
+from utils.s3_manager.cache import S3Cache
 from utils.s3_manager.manage import S3Manager
 
 
 class OpenDataTerrestrialWeather:
+    # origin file covers every month, so it can be loaded once and shared (see process_batch)
+    file_name = "2014-2020.csv"
+    load_key = "public_data/open_data_terrestrial_weather/origin/csv/{filename}".format(filename=file_name)
 
-    def __init__(self, bucket_name: str, date: str):
+    # type
+    dtypes = dtype["terrestrial_weather"]
+    reduction_dtypes = reduction_dtype["terrestrial_weather"]
+    translate = translation["terrestrial_weather"]
+
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv", cache: S3Cache = None,
+                 origin_df: pd.DataFrame = None, compact: bool = False, select: bool = False):
+        """
+        :param file_format: format of processed data, "csv" or "parquet"
+        :param cache: (opt-in) local disk cache for the origin file shared by every month
+        :param origin_df: already loaded origin DataFrame (or its partition), not to load origin file again
+        :param compact: if True, origin csv is parsed with reduction_dtype (see load)
+        :param select: if True, columns and rows of the term are selected by S3 Select (see load)
+        """
         self.logger = init_logger()
 
         # TODO: how to handle datetime?
@@ -22,18 +40,12 @@ class OpenDataTerrestrialWeather:
 
         # s3
         self.bucket_name = bucket_name
-        self.file_name = "2014-2020.csv"
-        self.load_key = "public_data/open_data_terrestrial_weather/origin/csv/{filename}".format(
-            filename=self.file_name
-        )
-        self.save_key = "public_data/open_data_terrestrial_weather/process/csv/{filename}.csv".format(
-            filename=date
+        self.cache = cache
+        self.file_format = file_format
+        self.save_key = "public_data/open_data_terrestrial_weather/process/{fmt}/{filename}.{fmt}".format(
+            fmt=self.file_format, filename=date
         )
 
-        # type
-        self.dtypes = dtype["terrestrial_weather"]
-        self.translate = translation["terrestrial_weather"]
-
         # fillna
 
         self.columns_with_linear = ['t_temper_avg', 't_temper_lowest', 't_temper_high', 't_wind_spd_max',
@@ -45,48 +57,70 @@ class OpenDataTerrestrialWeather:
         """
         self.columns_with_drop = ["date"]
 
-        # load filtered df and take certain term
-        df = self.load()
+        # load filtered df and take certain term, only rows of the term are kept while streaming origin file
+        df = self.load(
+            bucket_name=self.bucket_name, cache=self.cache, compact=compact, term=self.term, select=select
+        ) if origin_df is None else origin_df
         # TODO: make function
         date_picker = (df['date'].dt.year == self.term.year) & (df['date'].dt.month == self.term.month)
         self.input_df = df[date_picker]
 
-    def load(self):
+    @classmethod
+    def load(cls, bucket_name: str, cache: S3Cache = None, compact: bool = False, term: datetime = None,
+             select: bool = False):
         """
             fetch DataFrame and astype and filter by columns
+        :param compact: if True, only used columns are parsed with reduction_dtype (e.g. categorical location)
+        :param term: if it is given, origin file is streamed by chunk and only rows in the month of term are kept
+        :param select:
+            True: (with term) projection and predicate of the term are pushed down to S3 Select,
+                  it falls back to streaming if S3 Select is not supported
+            False: whole origin file is transferred
         :return: pd DataFrame
         """
-        manager = S3Manager(bucket_name=self.bucket_name)
-        df = manager.fetch_df_from_csv(key=self.load_key)
+        manager = S3Manager(bucket_name=bucket_name, cache=cache)
+        dtypes = cls.reduction_dtypes if compact else cls.dtypes
+        options = {"columns": list(dtypes.keys()), "dtype": parse_dtype(dtypes)} if compact else {}
+        if term is None:
+            df = manager.fetch_df_from_csv(key=cls.load_key, **options)
+        elif select:
+            df = manager.fetch_df_from_csv_select(
+                key=cls.load_key, columns=list(dtypes.keys()), where=month_range("일시", term),
+                dtype=options.get("dtype")
+            )
+        else:
+            df = manager.fetch_df_from_csv_chunks(key=cls.load_key, row_filter=pick_month("일시", term), **options)
 
         # TODO: no use index to get first element.
         # filter by column and check types
-        return df[0][self.dtypes.keys()].astype(dtype=self.dtypes).rename(columns=self.translate, inplace=False)
+        return df[0][dtypes.keys()].astype(dtype=dtypes).rename(columns=cls.translate, inplace=False)
 
-    @staticmethod
-    def groupby_date(df: pd.DataFrame):
-        # weather by divided 'region' (t_location) will be used on average
-        return df.groupby(["date"]).mean().reset_index()
+    @classmethod
+    def process_batch(cls, bucket_name: str, dates: list = None, file_format: str = "csv", cache: S3Cache = None,
+                      max_workers: int = None, compact: bool = False):
+        """
+            load origin file once, partition it by month and process each partition
+        :param dates: list of str "YYYYMM", None means every month in origin file
+        :param max_workers: if it is given, partitions are processed in a process pool
+        :param compact: if True, origin file is loaded with reduction_dtype
+        :return: dict { "YYYYMM": exit code }
+        """
+        return process_by_month(
+            processor=cls, bucket_name=bucket_name,
+            origin_df=cls.load(bucket_name=bucket_name, cache=cache, compact=compact),
+            dates=dates, max_workers=max_workers, file_format=file_format
+        )
 
     def clean(self, df: pd.DataFrame):
         """
+            fillna (drop, zero) -> groupby and groupby -> fillna (linear) in a single pass
         :return: cleaned DataFrame
         """
-        # null handler (drop, zero)
-        nh = NullHandler(
-            strategy={"drop": self.columns_with_drop, "zero": self.columns_with_zero},
-            df=df[self.columns_with_drop + self.columns_with_zero]
+        return aggregate_by_key(
+            df, columns_with_drop=self.columns_with_drop, columns_with_zero=self.columns_with_zero,
+            columns_with_linear=self.columns_with_linear, key="date"
         )
 
-        # groupby -> fillna (linear)
-        linear = nh.fillna_with_linear(
-            self.groupby_date(df)[self.columns_with_linear]
-        )
-        # fillna -> groupby (drop, zero)
-        drop_and_zero = self.groupby_date(nh.process())
-
-        return pd.concat([drop_and_zero, linear], axis=1)
-
     @staticmethod
     def transform(df: pd.DataFrame):
         # columns_with_log = ['t_daily_preci', 't_temper_avg', 't_temper_high']
@@ -121,7 +155,7 @@ class OpenDataTerrestrialWeather:
 
     def save(self, df: pd.DataFrame):
         manager = S3Manager(bucket_name=self.bucket_name)
-        manager.save_df_to_csv(df=df, key=self.save_key)
+        manager.save_df(df=df, key=self.save_key, file_format=self.file_format)
 
     @staticmethod
     def decompose_precipitation(df: pd.DataFrame):
@@ -5,9 +5,10 @@ import pandas as pd
 import pymysql
 
 from data_pipeline.dtype import dtype
-from query_builder.core import InsertBuilder
+from query_builder.core import BulkInsertBuilder
+from utils.db import DEFAULT_CHUNK_SIZE
 from utils.logging import init_logger
-from utils.s3_manager.manage import S3Manager
+from utils.s3_manager.manage import S3Manager, DEFAULT_MAX_WORKERS
 
 
 class Processor:
@@ -41,7 +42,7 @@ class Processor:
         :return: list of pd DataFrame (origin)
         """
         manager = S3Manager(bucket_name=self.bucket_name)
-        df_list = manager.fetch_df_from_csv(key=self.s3_key)
+        df_list = manager.fetch_df_from_csv(key=self.s3_key, max_workers=DEFAULT_MAX_WORKERS)
 
         self.logger.info("{num} files is loaded".format(num=len(df_list)))
         self.logger.info("load df from origin bucket")
@@ -62,25 +63,26 @@ class Processor:
         tmp_df = reduce(combine, df_list)
         self.df = tmp_df.astype(dtype=self.dtypes)
 
-    def save(self):
+    def save(self, chunk_size: int = DEFAULT_CHUNK_SIZE, local_infile: bool = False, ignore: bool = False):
         """
             # TODO: catch error that query_builder raise
-                    ask how to handle pymysql.err.OperationalError by input_value size
-            save validated data to RDS
-        :return: success or fail (bool)
+            save validated data to RDS chunk by chunk
+        :param chunk_size: the number of rows committed at once
+        :param local_infile: use 'LOAD DATA LOCAL INFILE' instead of 'INSERT'
+        :param ignore: (only for local_infile) skip rows with duplicate key or integrity error instead of raising
+        :return: the number of affected rows
         """
-        # replace pd.NA to None in order to save NULL to rds.
-        tmp_df = self.df.replace({pd.NA: None}, inplace=False)
-
-        # temporary head(2)
-        input_value = tmp_df.apply(lambda x: tuple(x.values), axis=1)
-
-        qb = InsertBuilder(
+        qb = BulkInsertBuilder(
             schema_name=self.schema_name,
             table_name=self.table_name,
-            value=tuple(input_value) if len(input_value) > 1 else input_value[0]
+            value=self.df,
+            chunk_size=chunk_size,
+            local_infile=local_infile,
+            ignore=ignore
         )
-        qb.execute()
+        affected = qb.execute()
+        self.logger.info("{num} rows are saved to '{table}'".format(num=affected, table=self.table_name))
+        return affected
 
     def execute(self):
         """
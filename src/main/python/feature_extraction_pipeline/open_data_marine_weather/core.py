@@ -3,13 +3,17 @@ from utils.s3_manager.manage import S3Manager
 
 
 class MarineWeatherExtractor:
-    def __init__(self, bucket_name: str, date: str):
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv"):
+        """
+        :param file_format: format of processed data, "csv" or "parquet"
+        """
         self.logger = init_logger()
 
         # s3
         self.bucket_name = bucket_name
-        self.load_key = "public_data/open_data_marine_weather/process/csv/{filename}.csv".format(
-            filename=date
+        self.file_format = file_format
+        self.load_key = "public_data/open_data_marine_weather/process/{fmt}/{filename}.{fmt}".format(
+            fmt=self.file_format, filename=date
         )
 
         self.input_df = self.load()
@@ -21,7 +25,7 @@ class MarineWeatherExtractor:
         :return: pd DataFrame
         """
         manager = S3Manager(bucket_name=self.bucket_name)
-        df = manager.fetch_df_from_csv(key=self.load_key)
+        df = manager.fetch_df(key=self.load_key, file_format=self.file_format)
 
         # TODO: no use index to get first element.
         return df[0]
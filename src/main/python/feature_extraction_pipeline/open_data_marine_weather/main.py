@@ -3,24 +3,33 @@ import sys
 from data_pipeline.open_data_marine_weather.core import OpenDataMarineWeather
 from feature_extraction_pipeline.open_data_marine_weather.core import MarineWeatherExtractor
 from utils.logging import init_logger
+from utils.s3_manager.cache import S3Cache
 
 
 class MarineWeatherExtractionPipeline:
-    def __init__(self, bucket_name: str, date: str):
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv", cache: S3Cache = None):
+        """
+        :param file_format: format of processed data between data pipeline and extractor, "csv" or "parquet"
+        :param cache: (opt-in) local disk cache for origin data
+        """
         self.bucket_name = bucket_name
         self.date = date
+        self.file_format = file_format
+        self.cache = cache
 
         self.logger = init_logger()
 
     @property
     def feature_extractor(self):
-        return MarineWeatherExtractor(bucket_name=self.bucket_name, date=self.date)
+        return MarineWeatherExtractor(bucket_name=self.bucket_name, date=self.date, file_format=self.file_format)
 
     def bridge(self):
         """
             bridge btw data_pipeline & feature_extractor
         """
-        data_pipeline = OpenDataMarineWeather(bucket_name=self.bucket_name, date=self.date)
+        data_pipeline = OpenDataMarineWeather(
+            bucket_name=self.bucket_name, date=self.date, file_format=self.file_format, cache=self.cache
+        )
 
         if data_pipeline.process():
             # TODO: handle exit code is 1 (fail)
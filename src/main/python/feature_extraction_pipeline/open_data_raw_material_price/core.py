@@ -6,13 +6,17 @@ from utils.transform import CustomTransformer
 
 
 class RawMaterialPriceExtractor:
-    def __init__(self, bucket_name: str, date: str):
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv"):
+        """
+        :param file_format: format of processed data, "csv" or "parquet"
+        """
         self.logger = init_logger()
 
         # s3
         self.bucket_name = bucket_name
-        self.load_key = "public_data/open_data_raw_material_price/process/csv/{filename}.csv".format(
-            filename=date
+        self.file_format = file_format
+        self.load_key = "public_data/open_data_raw_material_price/process/{fmt}/{filename}.{fmt}".format(
+            fmt=self.file_format, filename=date
         )
 
         # TODO: not loaded here. extractor just do preprocess data
@@ -24,7 +28,7 @@ class RawMaterialPriceExtractor:
         :return: pd DataFrame
         """
         manager = S3Manager(bucket_name=self.bucket_name)
-        df = manager.fetch_df_from_csv(key=self.load_key)
+        df = manager.fetch_df(key=self.load_key, file_format=self.file_format)
 
         # TODO: no use index to get first element.
         return df[0]
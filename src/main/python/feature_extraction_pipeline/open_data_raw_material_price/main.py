@@ -6,21 +6,29 @@ from utils.logging import init_logger
 
 
 class RawMaterialPriceExtractionPipeline:
-    def __init__(self, bucket_name: str, date: str):
+    def __init__(self, bucket_name: str, date: str, file_format: str = "csv", incremental: bool = False):
+        """
+        :param file_format: format of processed data between data pipeline and extractor, "csv" or "parquet"
+        :param incremental: if True, data pipeline processes only new/changed days of origin data
+        """
         self.bucket_name = bucket_name
         self.date = date
+        self.file_format = file_format
+        self.incremental = incremental
 
         self.logger = init_logger()
 
     @property
     def feature_extractor(self):
-        return RawMaterialPriceExtractor(bucket_name=self.bucket_name, date=self.date)
+        return RawMaterialPriceExtractor(bucket_name=self.bucket_name, date=self.date, file_format=self.file_format)
 
     def bridge(self):
         """
             bridge btw data_pipeline & feature_extractor
         """
-        data_pipeline = OpenDataRawMaterialPrice(bucket_name=self.bucket_name, date=self.date)
+        data_pipeline = OpenDataRawMaterialPrice(
+            bucket_name=self.bucket_name, date=self.date, file_format=self.file_format, incremental=self.incremental
+        )
 
         if data_pipeline.process():
             # TODO: handle exit code is 1 (fail)
@@ -33,8 +41,12 @@ class RawMaterialPriceExtractionPipeline:
         :param data_process:
             True: force to do data pipeline.
             False: directly do feature extraction from process data.
+            (incremental mode always does data pipeline, it is no-op if origin data is not changed)
         :return: df, key
         """
+        if self.incremental is True:
+            return self.bridge()
+
         if data_process is True:
             self.logger.info("force to do data pipeline for raw material price")
             return self.bridge()
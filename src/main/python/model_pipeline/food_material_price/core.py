@@ -7,6 +7,7 @@ from analysis.train_test_volume import train_test_timeseries
 from model.elastic_net import ElasticNetModel
 from utils.build_dataset import build_master
 from utils.logging import init_logger
+from utils.s3_manager.cache import S3Cache
 from utils.s3_manager.manage import S3Manager
 
 border = '-' * 50
@@ -14,7 +15,10 @@ border = '-' * 50
 
 class PricePredictModelPipeline:
 
-    def __init__(self, bucket_name: str, logger_name: str, date: str):
+    def __init__(self, bucket_name: str, logger_name: str, date: str, cache: S3Cache = None):
+        """
+        :param cache: (opt-in) local disk cache, so repeat runs reuse origin files
+        """
         self.logger = init_logger()
         self.date = date
         # TODO: now -> term of dataset
@@ -22,6 +26,7 @@ class PricePredictModelPipeline:
 
         # s3
         self.bucket_name = bucket_name
+        self.cache = cache
 
     def build_dataset(self, train_size=5, test_size=1, pipe_data: bool = False):
         """
@@ -34,7 +39,7 @@ class PricePredictModelPipeline:
         # build dataset
         dataset = build_master(
             dataset="process_fmp", bucket_name=self.bucket_name,
-            date=self.date, pipe_data=pipe_data
+            date=self.date, pipe_data=pipe_data, cache=self.cache
         )
 
         # set train, test dataset
@@ -1,10 +1,33 @@
+from functools import lru_cache
+
 from utils.alter import *
-from utils.db import exec_return_query, exec_void_query, load_query
+import pandas as pd
+
+from utils.db import exec_return_query, exec_void_query, load_query, exec_bulk_query, exec_load_data, \
+    exec_stream_query, DEFAULT_CHUNK_SIZE
+from utils.logging import init_logger
 from utils.s3 import list_bucket_contents
 
 from abc import *
 
 
+@lru_cache(maxsize=256)
+def compile_query(sql_filename: str, head: tuple, clauses: tuple) -> str:
+    """
+        compile a sql template once per clause shape,
+        values in clauses are expected as placeholders (%s) and bound by 'params' on execution.
+    :param sql_filename: e.g. 'select.sql'
+    :param head: arguments for template, e.g. (att_name, table_name)
+    :param clauses: (where_clause, group_by, having, order_by, limit, offset)
+    :return: completed query
+    """
+    first_mani_query = load_query(sql_filename) % head
+
+    str_rest_data = alter_type_list_to_str(remove_none(list(clauses)))
+
+    return combine_sentence(first_mani_query, str_rest_data)
+
+
 class QueryBuilder(metaclass=ABCMeta):
 
     # def __init__(self, table_name):
@@ -12,7 +35,11 @@ class QueryBuilder(metaclass=ABCMeta):
                  value=None, where_clause: str = None,
                  group_by=None,
                  having=None, order_by: str = None,
-                 limit: str = None, offset: int = None):
+                 limit: str = None, offset: int = None, params: tuple = None):
+        """
+        :param params: values bound to placeholders (%s) in clauses,
+            e.g. where_clause="WHERE id = %s", params=(3,)
+        """
         self.init_dict = {"TABLE_NAME": table_name,
                           "ATT_NAME": att_name,
                           "VALUE": value,
@@ -30,11 +57,23 @@ class QueryBuilder(metaclass=ABCMeta):
         
         """
         self.schema_name = schema_name
+        self.params = params
         self.query = None
 
+        self.logger = init_logger()
+
     def store_query(self, sql_filename):
         self.query = load_query(sql_filename)
 
+    def compile(self, sql_filename, head: tuple):
+        """
+            store and manipulate sql at once, cached by template and clause shape (see compile_query)
+        """
+        self.query = compile_query(
+            sql_filename, head, tuple(alter_type_dict_to_list(self.init_dict, 3, len(self.init_dict)))
+        )
+        return self.query
+
     @abstractmethod
     def exec_query(self, query):
         pass
@@ -52,7 +91,10 @@ class VoidQueryBuilder(QueryBuilder):
 class ReturnQueryBuilder(QueryBuilder):
 
     def exec_query(self, query):
-        exec_return_query(query=query, schema_name=self.schema_name)
+        return exec_return_query(query=query, schema_name=self.schema_name, params=self.params)
+
+    def exec_stream_query(self, query, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        return exec_stream_query(query=query, schema_name=self.schema_name, chunk_size=chunk_size, params=self.params)
 
 
 # QueryBuilder-VoidQueryBuilder-CreateBuilder
@@ -112,6 +154,63 @@ class InsertBuilder(VoidQueryBuilder):
         return mani_query
 
 
+# QueryBuilder-VoidQueryBuilder-InsertBuilder-BulkInsertBuilder
+class BulkInsertBuilder(InsertBuilder):
+    # BulkInsertBuilder('table_name', pd.DataFrame)
+
+    def __init__(self, schema_name='bobsim_schema', table_name=None, value: pd.DataFrame = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, local_infile: bool = False, ignore: bool = False):
+        """
+        :param value: pd DataFrame to be inserted (columns should be ordered as insert sql)
+        :param chunk_size: the number of rows committed at once
+        :param local_infile: use 'LOAD DATA LOCAL INFILE' instead of 'INSERT'
+        :param ignore: (only for local_infile) skip rows with duplicate key or integrity error instead of raising
+        """
+        super().__init__(schema_name=schema_name, table_name=table_name, value=value)
+        self.chunk_size = chunk_size
+        self.local_infile = local_infile
+        self.ignore = ignore
+
+    @staticmethod
+    def to_column(s: pd.Series) -> list:
+        """
+            NA is replaced to None in order to save NULL to rds.
+        """
+        values = s.to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        return values.tolist()
+
+    @classmethod
+    def to_batches(cls, df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+            without row-wise apply, rows are made column by column and only for one chunk at once,
+            so python objects of the whole DataFrame are never held.
+        :return: generator of list of tuple (rows of executemany)
+        """
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            yield list(zip(*map(lambda i: cls.to_column(chunk.iloc[:, i]), range(chunk.shape[1]))))
+
+    def process(self):
+        #  1. Store sql 2. exec sql by chunk
+
+        if self.local_infile:
+            return exec_load_data(
+                df=self.init_dict["VALUE"], table_name=self.init_dict["TABLE_NAME"],
+                schema_name=self.schema_name, chunk_size=self.chunk_size, ignore=self.ignore
+            )
+
+        self.store_query('insert_{}.sql'.format(self.init_dict["TABLE_NAME"]))  # 1
+
+        return exec_bulk_query(
+            batches=self.to_batches(self.init_dict["VALUE"], chunk_size=self.chunk_size), query=self.query,
+            schema_name=self.schema_name
+        )
+
+    def execute(self):
+        return self.process()
+
+
 # QueryBuilder-VoidQueryBuilder-InsertBuilder
 class DeleteBuilder(VoidQueryBuilder):
     # value = (v1,v2,....,vn) tuple type
@@ -120,29 +219,17 @@ class DeleteBuilder(VoidQueryBuilder):
 
     def process(self):
         # TODO: 1. Store sql 2. manipulate sql 3. exec sql 4. check
-        self.store_query('delete.sql')  # 1
-
-        query = self.manipulate(self.query)  # 2
+        query = self.manipulate()  # 1, 2
 
         self.exec_query(query)  # 3
 
         return self.check_delete()  # 4
 
-    def manipulate(self, query):
-        first_mani_query = query % self.init_dict["TABLE_NAME"]
-
-        list_rest_data = alter_type_dict_to_list(self.init_dict, 3, len(self.init_dict))
-
-        clean_rest_data = remove_none(list_rest_data)
-
-        str_rest_data = alter_type_list_to_str(clean_rest_data)
-
-        second_mani_query = combine_sentence(first_mani_query, str_rest_data)
-
-        return second_mani_query
+    def manipulate(self):
+        return self.compile('delete.sql', (self.init_dict["TABLE_NAME"],))
 
     def exec_query(self, query):
-        exec_void_query(query)
+        exec_void_query(args=self.params, query=query, schema_name=self.schema_name)
 
     def check_delete(self):
         check_delete_query = SelectBuilder(self.init_dict["TABLE_NAME"], ' * ')
@@ -164,43 +251,49 @@ class UpdateBuilder(VoidQueryBuilder):
                 4. check data in db
         """
 
-        self.store_query('update.sql')  # 1
-
-        completed_query = self.manipulate(self.query)  # 2
+        completed_query = self.manipulate()  # 1, 2
 
         self.exec_query(completed_query)  # 3
 
         return self.check_update()  # 4
 
-    def manipulate(self, query):
+    def manipulate(self):
         """
             TODO: 1. update {table_name} set {update_value} % merge
                   2. clean
 
         """
-        first_mani_query = query % (self.init_dict["TABLE_NAME"], self.init_dict["VALUE"])
-
-        list_rest_data = alter_type_dict_to_list(self.init_dict, 3, len(self.init_dict))
-
-        clean_rest_data = remove_none(list_rest_data)
-
-        str_rest_data = alter_type_list_to_str(clean_rest_data)
-
-        second_mani_query = combine_sentence(first_mani_query, str_rest_data)
-
-        return second_mani_query
+        return self.compile('update.sql', (self.init_dict["TABLE_NAME"], self.init_dict["VALUE"]))
 
     def exec_query(self, query):
-        exec_void_query(query)
+        exec_void_query(args=self.params, query=query, schema_name=self.schema_name)
+
+    def check_params(self):
+        """
+            params are bound in order of 'UPDATE ... SET {VALUE} {WHERE}',
+            but check query is 'SELECT ... {WHERE} AND {VALUE}', so they are reordered.
+        :return: params of check query, None if params are not used
+        """
+        if self.params is None:
+            return None
+        params = tuple(self.params)
+        value_num = self.init_dict["VALUE"].count("%s")
+        return params[value_num:] + params[:value_num]
 
     def check_update(self):
         if bool(self.init_dict.get("WHERE")) == 1:
-            check_update_query = SelectBuilder(self.init_dict["TABLE_NAME"], '*',
-                                               where_clause=self.init_dict["WHERE"] + " AND " + self.init_dict["VALUE"])
+            where_clause = self.init_dict["WHERE"] + " AND " + self.init_dict["VALUE"]
         else:
-            check_update_query = SelectBuilder(self.init_dict["TABLE_NAME"], '*',
-                                               where_clause="WHERE " + self.init_dict["VALUE"])
-        print(check_update_query.execute())
+            where_clause = "WHERE " + self.init_dict["VALUE"]
+
+        check_update_query = SelectBuilder(
+            schema_name=self.schema_name, table_name=self.init_dict["TABLE_NAME"], att_name='*',
+            where_clause=where_clause, params=self.check_params()
+        )
+        updated = check_update_query.execute()
+        self.logger.info("updated rows in '{table}': \n {rows}".format(
+            table=self.init_dict["TABLE_NAME"], rows=updated))
+        return updated
 
 
 class SelectBuilder(ReturnQueryBuilder):
@@ -214,31 +307,26 @@ class SelectBuilder(ReturnQueryBuilder):
                  2. manipulate sql
                  3. exec sql
         """
-        self.store_query('select.sql')  # 1
-
-        query = self.manipulate(self.query)  # 2
+        query = self.manipulate()  # 1, 2
 
         return self.exec_query(query)
 
-    def manipulate(self, query):  # extract from where_clause to offset
+    def execute_stream(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+            streaming variant of execute for large table, memory is bounded by chunk_size
+        :param chunk_size: the number of rows per DataFrame
+        :return: generator of pd DataFrame
+        """
+        return self.exec_stream_query(self.manipulate(), chunk_size=chunk_size)
+
+    def manipulate(self):  # extract from where_clause to offset
         """
             1.dict -> list
             2.add att,table name to 'SELECT {} FROM {}' sql file
             3.remove None & list -> str
             4.combine
         """
-
-        rest_data = alter_type_dict_to_list(self.init_dict, 3, len(self.init_dict))
-
-        first_mani_query = query % (self.init_dict["ATT_NAME"], self.init_dict["TABLE_NAME"])
-
-        clean_data = remove_none(rest_data)
-
-        str_rest_data = alter_type_list_to_str(clean_data)
-
-        second_mani_query = combine_sentence(first_mani_query, str_rest_data)
-
-        return second_mani_query
+        return self.compile('select.sql', (self.init_dict["ATT_NAME"], self.init_dict["TABLE_NAME"]))
 
 
 class DropBuilder(VoidQueryBuilder):
@@ -1,15 +1,21 @@
 import datetime
 import json
+import time
 
+import numpy as np
 import pandas as pd
 
 from query_builder.core import SelectBuilder
-from simulator.menu import cost_menu
-from simulator.price import price
-from simulator.quantity import quantify
-from simulator.user import User
+from simulator.menu import load_recipe_item_matrix, DEFAULT_TOP_K
+from simulator.price import price, price_matrix
+from simulator.quantity import quantify, quantify_matrix
+from simulator.user import User, UserGroup
 from utils.db import load_query, exec_return_query
-from utils.s3_manager import save_json
+from utils.logging import init_logger
+from utils.s3 import save_json
+
+# the number of users sampled at once, it bounds temporary memory of sampling
+DEFAULT_USER_CHUNK_SIZE = 1000
 
 
 class Simulator:
@@ -85,24 +91,16 @@ class Simulator:
         self.get_timestamp()
         return fridge
 
-    def probable_menus(self, fridge):
+    def probable_menus(self, fridge, k=DEFAULT_TOP_K):
         """
-            TODO: find probables menu for each user.
+            menus of user's fridge are kept by user.menu_index,
+            so recaptured fridge only updates recipes which contain changed items.
         :param fridge: group's total fridge
-        :return: list of probable menu(DataFrame) for each user.
-        """
-        # user_list = list(range(self.user_num))
-        #
-        # def func(user_id):
-        #     cost_menu()
-        #     pass
-        #
-        # m = list(map(func, user_list))
-        # print(m[0])
-
-        menu = cost_menu(fridge, self.user_num)
+        :return: pd DataFrame (id, name, season_id, user_id, item_count, cost) of k cheapest menus for each user
+        """
+        menu = self.user.menu_index.update(fridge).top_k(k=k)
         print(menu)
-        pass
+        return menu
 
     def raw_data_dic(self):
         """
@@ -139,4 +137,94 @@ class Simulator:
         """
         now = datetime.datetime.now()
         filename = str(now.day) + str(now.month) + str(now.year)
-        save_json(directory="recommender/raw-data/" + str(self.user.b_type), filename=filename, data=dict_data)
\ No newline at end of file
+        save_json(directory="recommender/raw-data/" + str(self.user.b_type), filename=filename, data=dict_data)
+
+
+class BatchSimulator:
+    """
+        multi user mode of Simulator
+
+        N virtual users are represented as columnar arrays (UserGroup) not objects,
+        and their fridges are sampled as matrices (items x users) chunk by chunk.
+    """
+
+    def __init__(self, user_num: int, chunk_size: int = DEFAULT_USER_CHUNK_SIZE, random_state=None,
+                 schema_name: str = "bobsim_schema"):
+        """
+        :param user_num: How many active user is simulated from one call
+        :param chunk_size: the number of users sampled (and costed) at once
+        :param random_state: seed or np.random.Generator
+        """
+        self.logger = init_logger()
+
+        self.sql_filename = 'item_distribution.sql'
+        self.schema_name = schema_name
+
+        self.user_num = user_num
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(random_state)
+
+        self.users = UserGroup(user_num, random_state=self.rng)
+        self.timestamp = datetime.datetime.now()
+
+    def execute(self):
+        return self.process()
+
+    def process(self):
+        """
+            1. load item distribution once
+            2. sample fridges of all users
+            3. find probable menus of all users
+        :return: UserGroup
+        """
+        start = time.perf_counter()
+
+        self.users.items = self.load_items()
+        self.users.quantity, self.users.price = self.fridge_image(self.users.items)
+        self.users.menu = self.probable_menus(self.users)
+        self.timestamp = datetime.datetime.now()
+
+        elapsed = time.perf_counter() - start
+        self.logger.info("{n} users are simulated in {t:.3f} sec ({tp:.1f} users/sec)".format(
+            n=self.user_num, t=elapsed, tp=self.user_num / elapsed if elapsed > 0 else float("inf")))
+        return self.users
+
+    def load_items(self):
+        """
+            load data and filter dirty data.
+        :return: pd DataFrame of item distribution
+        """
+        td = exec_return_query(load_query(self.sql_filename), schema_name=self.schema_name)
+        return td[(td.average != 0) & (td.delta != 0)].reset_index(drop=True)
+
+    def fridge_image(self, items: pd.DataFrame):
+        """
+            GENERATE VIRTUAL IMAGES OF USERS' FRIDGE
+        :param items: pd DataFrame of item distribution
+        :return: quantity, price matrices (items x users)
+        """
+        quantity = np.zeros((len(items), self.user_num), dtype=np.int8)
+        prices = np.zeros((len(items), self.user_num), dtype=np.int32)
+
+        for start in range(0, self.user_num, self.chunk_size):
+            end = min(start + self.chunk_size, self.user_num)
+            q = quantify_matrix(items, num=end - start, random_state=self.rng)
+            quantity[:, start:end] = q
+            prices[:, start:end] = price_matrix(items, quantity=q, random_state=self.rng)
+
+        return quantity, prices
+
+    def probable_menus(self, users: UserGroup):
+        """
+            menus are costed by sparse matrix products chunk by chunk of users
+        :return: pd DataFrame (user_id, recipe_id, item_count, cost)
+        """
+        recipe_item = load_recipe_item_matrix(tuple(users.items.id))
+
+        return pd.concat(list(map(
+            lambda start: recipe_item.cost_menus(
+                quantity=users.quantity[:, start:start + self.chunk_size],
+                price=users.price[:, start:start + self.chunk_size],
+                user_ids=users.ids[start:start + self.chunk_size]
+            ), range(0, self.user_num, self.chunk_size)
+        )), ignore_index=True)
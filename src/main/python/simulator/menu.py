@@ -1,46 +1,36 @@
+import heapq
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 
 from query_builder.core import SelectBuilder
+from utils.db import DEFAULT_CHUNK_SIZE
 
+# the number of menus recommended for each user
+DEFAULT_TOP_K = 10
 
-def mask_by_count(item_count, recipe_cost, threshold=5):
-    """
-        TODO:
-            ABOUT THRESHOLD
-            for user's convenience,
-            the number of ingredients that user doesn't have
-            for recipe's diversity,
-            proportion of ingredients that user doesn't have
 
-            Q) which will affect users more.
+def iter_recipe_item(chunk_size: int = DEFAULT_CHUNK_SIZE):
     """
-    rcc = pd.merge(item_count, recipe_cost)
-    mask = rcc.apply(lambda x: x.item_count < threshold, axis=1)
-    return rcc[mask]
+        stream recipe_item table by chunk, not to hold whole table in memory
+    :return: generator of pd DataFrame
+    """
+    sqb = SelectBuilder(table_name="recipe_item", att_name="recipe_id, item_id", where_clause="")
+    return sqb.execute_stream(chunk_size=chunk_size)
 
 
-def join_query(recipe_item, user_item):
+def load_recipe_item(chunk_size: int = DEFAULT_CHUNK_SIZE):
     """
-        TODO: if we store virtual user's data in db, this is replaced by queryBuilder
-
-        SELECT *
-        FROM recipe_item
-        LEFT JOIN user_item
-        ON recipe_item.item_id = user_item.item_id
+        rows are streamed by chunk (see iter_recipe_item),
+        so that the whole result set is never buffered as tuples in client memory.
+    :return: pd DataFrame (recipe_id, item_id)
     """
-    print(pd.merge(
-        left=recipe_item, right=user_item,
-        how='left', left_on='item_id', right_on='id'
-    ))
-    return pd.merge(
-        left=recipe_item, right=user_item,
-        how='left', left_on='item_id', right_on='id'
-    )
-
-
-def load_recipe_item():
-    sqb = SelectBuilder(table_name="recipe_item", att_name="recipe_id, item_id", where_clause="")
-    return sqb.execute()
+    chunks = list(iter_recipe_item(chunk_size=chunk_size))
+    if len(chunks) == 0:
+        return pd.DataFrame({"recipe_id": pd.Series(dtype="int64"), "item_id": pd.Series(dtype="int64")})
+    return pd.concat(chunks, ignore_index=True)
 
 
 def load_recipe():
@@ -51,32 +41,284 @@ def load_recipe():
     return sqb.execute()
 
 
+def fridge_matrices(fridge: pd.DataFrame):
+    """
+        item without price (e.g. not priced in image) is regarded as missing
+    :param fridge: pd DataFrame (id, quantity, price), quantity and price of an item are
+        a scalar (one fridge) or an array of users (fridge image of user group)
+    :return: quantity, price np.ndarray (items x users)
+    """
+    quantity = np.stack(fridge.quantity.to_numpy()).reshape(len(fridge), -1).astype(float)
+    price = np.stack(fridge.price.to_numpy()).reshape(len(fridge), -1).astype(float)
+
+    priced = ~np.isnan(price)
+    return np.where(priced, np.nan_to_num(quantity), 0), np.where(priced & (quantity > 0), price, 0)
+
+
 # core function
-def cost_menu(fridge: pd.core.frame.DataFrame, user):
+def cost_menu(fridge: pd.core.frame.DataFrame, user, threshold=5):
     """
-        TODO: After we implement queryBuilder, code will be more cleaned
-            0. split user fridge
-            1. load recipe_item table
-            2. select possible menu from recipe_item table.
-            3. calculate menu's cost
-            2&3 is mixed
+        missing items and cost of every recipe are products of cached RecipeItemMatrix,
+        instead of joining whole recipe_item table to fridge.
 
         regard 'recipe' as 'menu'
+    :param fridge: pd DataFrame (id, quantity, price), see fridge_matrices
+    :param user: the number of users, columns of fridge matrices are users
+    :param threshold: menu is probable if the number of missing items is less than threshold
+    :return: pd DataFrame (id, name, season_id, user_id, item_count, cost) of probable menus for each user
+    """
+    recipe_item = load_recipe_item_matrix(tuple(fridge.id))
+    quantity, price = fridge_matrices(fridge)
+
+    menus = recipe_item.cost_menus(quantity, price, threshold=threshold)
+    return pd.merge(load_recipe(), menus, how="inner", left_on="id", right_on="recipe_id").drop(['recipe_id'], axis=1)
+
+
+class RecipeItemMatrix:
+    """
+        recipe x item sparse incidence matrix (CSR)
+
+        for fridges given as matrices (items x users),
+        the number of missing items and the cost of every recipe are sparse matrix products.
+            missing = item_count - A @ quantity
+            cost = A @ price
+    """
+
+    def __init__(self, recipe_item: pd.DataFrame, item_ids):
+        """
+        :param recipe_item: pd DataFrame (recipe_id, item_id)
+        :param item_ids: ids of items, in order of rows of fridge matrices
+        """
+        self.item_ids = np.asarray(item_ids)
+
+        self.recipe_ids, recipe_pos = np.unique(recipe_item.recipe_id.to_numpy(), return_inverse=True)
+        item_pos = pd.Index(self.item_ids).get_indexer(recipe_item.item_id)
+
+        # items which are not in item_ids are always missing
+        self.item_count = np.bincount(recipe_pos, minlength=len(self.recipe_ids))
+
+        known = item_pos >= 0
+        self.matrix = csr_matrix(
+            (np.ones(known.sum(), dtype=np.int64), (recipe_pos[known], item_pos[known])),
+            shape=(len(self.recipe_ids), len(self.item_ids))
+        )
+
+    def missing_count(self, quantity: np.ndarray):
+        """
+        :param quantity: np.ndarray (items,) or (items x users)
+        :return: np.ndarray (recipes,) or (recipes x users)
+        """
+        have = self.matrix @ (np.asarray(quantity) > 0).astype(np.int64)
+        return (self.item_count.reshape((-1,) + (1,) * (have.ndim - 1))) - have
+
+    def cost(self, price: np.ndarray):
+        """
+        :param price: np.ndarray (items,) or (items x users), 0 for items not in fridge
+        :return: np.ndarray (recipes,) or (recipes x users)
+        """
+        return self.matrix @ np.asarray(price, dtype=np.int64)
+
+    def cost_menus(self, quantity: np.ndarray, price: np.ndarray, user_ids=None, threshold=5):
+        """
+            batched cost_menu for many fridges
+        :param quantity: np.ndarray (items x users)
+        :param price: np.ndarray (items x users)
+        :param user_ids: ids of users in order of columns, default is index of column
+        :return: pd DataFrame (user_id, recipe_id, item_count, cost) of probable menus
+        """
+        missing, cost = self.missing_count(quantity), self.cost(price)
+        recipe_idx, user_idx = np.nonzero(missing < threshold)
+        user_ids = np.arange(missing.shape[1]) if user_ids is None else np.asarray(user_ids)
+
+        return pd.DataFrame({
+            "user_id": user_ids[user_idx],
+            "recipe_id": self.recipe_ids[recipe_idx],
+            "item_count": missing[recipe_idx, user_idx],
+            "cost": cost[recipe_idx, user_idx]
+        })
+
+
+class MenuIndex:
+    """
+        top-k probable menu index of one user's fridge
+
+        - inverted lists (item -> recipes) are columns of CSC form of RecipeItemMatrix
+        - missing count and cost of every recipe are kept running,
+          so a fridge change updates only recipes that contain the changed item.
+        - cheapest feasible menus are served by a lazy heap,
+          entries are validated by version of recipe when they are popped.
+    """
+
+    def __init__(self, recipe_item: RecipeItemMatrix, quantity: np.ndarray, price: np.ndarray, threshold=5):
+        """
+        :param recipe_item: RecipeItemMatrix
+        :param quantity: np.ndarray (items,) quantity of user's fridge
+        :param price: np.ndarray (items,) price of user's fridge
+        :param threshold: menu is feasible if the number of missing items is less than threshold
+        """
+        self.recipe_item = recipe_item
+        self.threshold = threshold
+
+        self.item_pos = pd.Index(recipe_item.item_ids)
+        self.inverted = recipe_item.matrix.tocsc()
+
+        self.quantity = (np.asarray(quantity) > 0).astype(np.int64)
+        self.price = np.where(self.quantity > 0, np.asarray(price, dtype=np.int64), 0)
+
+        self.missing = recipe_item.missing_count(self.quantity)
+        self.cost = recipe_item.cost(self.price)
+
+        self.version = np.zeros(len(recipe_item.recipe_ids), dtype=np.int64)
+        self.heap = []
+        self.rebuild()
+
+    def rebuild(self):
+        """
+            heap only with valid entries (also used to compact stale entries)
+        """
+        feasible = np.flatnonzero(self.missing < self.threshold)
+        self.heap = list(zip(self.cost[feasible].tolist(), feasible.tolist(), self.version[feasible].tolist()))
+        heapq.heapify(self.heap)
+
+    def is_valid(self, entry) -> bool:
+        _, recipe, version = entry
+        return version == self.version[recipe] and self.missing[recipe] < self.threshold
+
+    def recipes_of(self, item_idx: int):
+        """
+        :return: recipes (index) containing the item, and weights
+        """
+        start, end = self.inverted.indptr[item_idx], self.inverted.indptr[item_idx + 1]
+        return self.inverted.indices[start:end], self.inverted.data[start:end]
+
+    def update(self, item_id, quantity, price=0):
+        """
+            reflect one changed item of fridge
+        :param item_id: id of item
+        :param quantity: new quantity (0 means the item is removed)
+        :param price: new price of the item
+        """
+        item_idx = self.item_pos.get_loc(item_id)
+        new_q = 1 if quantity > 0 else 0
+        new_p = int(price) if new_q else 0
+
+        dq, dp = new_q - self.quantity[item_idx], new_p - self.price[item_idx]
+        self.quantity[item_idx], self.price[item_idx] = new_q, new_p
+        if dq == 0 and dp == 0:
+            return
+
+        recipes, weights = self.recipes_of(item_idx)
+        self.missing[recipes] -= weights * dq
+        self.cost[recipes] += weights * dp
+        self.version[recipes] += 1
+
+        feasible = recipes[self.missing[recipes] < self.threshold]
+        list(map(
+            lambda r: heapq.heappush(self.heap, (int(self.cost[r]), int(r), int(self.version[r]))),
+            feasible
+        ))
+
+        # stale entries are popped lazily, compact when they dominate the heap
+        if len(self.heap) > 4 * len(self.version):
+            self.rebuild()
+
+    def sync(self, quantity: np.ndarray, price: np.ndarray):
+        """
+            reflect a recaptured fridge, only items changed from the current one are updated
+        :param quantity: np.ndarray (items,) new quantity of user's fridge
+        :param price: np.ndarray (items,) new price of user's fridge
+        """
+        quantity = (np.asarray(quantity) > 0).astype(np.int64)
+        price = np.where(quantity > 0, np.asarray(price, dtype=np.int64), 0)
+
+        changed = np.flatnonzero((quantity != self.quantity) | (price != self.price))
+        list(map(lambda i: self.update(self.recipe_item.item_ids[i], quantity[i], price[i]), changed))
+
+    def update_many(self, items: dict):
+        """
+        :param items: { item_id: (quantity, price) }
+        """
+        list(map(lambda i: self.update(i[0], *i[1]), items.items()))
+
+    def top_k(self, k=DEFAULT_TOP_K) -> pd.DataFrame:
+        """
+        :return: pd DataFrame (recipe_id, item_count, cost) of k cheapest feasible menus
+        """
+        selected = []
+        while len(self.heap) > 0 and len(selected) < k:
+            entry = heapq.heappop(self.heap)
+            if self.is_valid(entry):
+                selected.append(entry)
+
+        # selected entries are still valid, push them back
+        list(map(lambda e: heapq.heappush(self.heap, e), selected))
+
+        recipes = np.array(list(map(lambda e: e[1], selected)), dtype=np.int64)
+        return pd.DataFrame({
+            "recipe_id": self.recipe_item.recipe_ids[recipes],
+            "item_count": self.missing[recipes],
+            "cost": self.cost[recipes]
+        })
+
+
+class FridgeMenuIndex:
+    """
+        probable menus of the users sharing a fridge image (see fridge_matrices), a MenuIndex per user.
+        the first capture builds indexes, a recaptured fridge only updates recipes containing changed items.
     """
-    recipe_corpus = load_recipe_item()
 
-    recipe_group = join_query(recipe_corpus, fridge).groupby("recipe_id")
+    def __init__(self, threshold=5):
+        self.threshold = threshold
+        # MenuIndex per user (column of fridge matrices)
+        self.indexes = None
 
-    # a = fridge.apply(lambda x: x.quantity, axis=1, result_type='expand')
-    # print(a)
+    def update(self, fridge: pd.DataFrame):
+        """
+        :param fridge: pd DataFrame (id, quantity, price), see fridge_matrices
+        :return: self
+        """
+        recipe_item = load_recipe_item_matrix(tuple(fridge.id))
+        quantity, price = fridge_matrices(fridge)
 
-    # TODO: mask after cost vs cost after mask(current)
-    item_count = recipe_group.apply(lambda x: x.price.isnull().sum()).reset_index(name="item_count")
-    recipe_cost = recipe_group.apply(lambda x: x.price.sum()).reset_index(name="cost")
+        if self.indexes is None or len(self.indexes) != quantity.shape[1] or \
+                self.indexes[0].recipe_item is not recipe_item:
+            # new item catalog (or reloaded recipes), build from scratch
+            self.indexes = list(map(
+                lambda u: MenuIndex(recipe_item, quantity[:, u], price[:, u], threshold=self.threshold),
+                range(quantity.shape[1])
+            ))
+        else:
+            list(map(lambda u: self.indexes[u].sync(quantity[:, u], price[:, u]), range(quantity.shape[1])))
+        return self
 
-    # TODO: Using queryBuilder, make code more clean.
-    return pd.merge(load_recipe(),
-                    mask_by_count(item_count, recipe_cost),
-                    how="inner", left_on="id", right_on="recipe_id"
-                    ) \
-        .drop(['recipe_id'], axis=1)
+    def top_k(self, k=DEFAULT_TOP_K) -> pd.DataFrame:
+        """
+        :return: pd DataFrame (id, name, season_id, user_id, item_count, cost) of k cheapest menus for each user,
+            in order of user and cost
+        """
+        menus = pd.concat(list(map(
+            lambda u: self.indexes[u].top_k(k).assign(user_id=u), range(len(self.indexes))
+        )), ignore_index=True)
+        recipe = load_recipe()
+        # inner merge groups same recipes of users together, left merge keeps order of menus
+        menus = menus[menus.recipe_id.isin(recipe.id)]
+        merged = pd.merge(menus, recipe, how="left", left_on="recipe_id", right_on="id")
+        return merged[list(recipe.columns) + ["user_id", "item_count", "cost"]]
+
+
+@lru_cache(maxsize=4)
+def load_recipe_item_matrix(item_ids: tuple):
+    """
+        built once per item catalog and cached, from recipe_item table streamed by chunk (see load_recipe_item)
+    :param item_ids: tuple of item ids (hashable)
+    :return: RecipeItemMatrix
+    """
+    return RecipeItemMatrix(recipe_item=load_recipe_item(), item_ids=item_ids)
+
+
+def clear_recipe_item_matrix():
+    """
+        cached matrices are built from recipe_item table at that time,
+        call it when recipe or recipe_item table is reloaded (e.g. after crawled recipes are inserted)
+    """
+    load_recipe_item_matrix.cache_clear()
@@ -39,20 +39,50 @@ def analyze(num, exist, avg, delta, d_type=None):
     return x_rounded*exist
 
 
+def sample_price(avg: np.ndarray, delta: np.ndarray, exist: np.ndarray, random_state=None):
+    """
+        vectorized analyze: draw all items x users in one call with array-valued bounds
+    :param avg: 1-d np.ndarray, average price of each item
+    :param delta: 1-d np.ndarray, delta of price of each item
+    :param exist: 2-d np.ndarray (items x users) quantity matrix
+    :param random_state: seed or np.random.Generator
+    :return: 2-d np.ndarray (items x users) price matrix
+    """
+    avg, delta = np.asarray(avg, dtype=float)[:, np.newaxis], np.asarray(delta, dtype=float)[:, np.newaxis]
+    mean, sigma = avg.astype(int), delta*0.5
+    low, upp = avg - delta, avg + delta
+
+    x = truncnorm.rvs(
+        (low - mean) / sigma, (upp - mean) / sigma, loc=mean, scale=sigma,
+        size=exist.shape, random_state=np.random.default_rng(random_state)
+    )
+
+    # In Korean, there is a currency from 10 digits.
+    return np.round(x.astype(int), -1) * exist
+
+
+def price_matrix(data: pd.DataFrame, quantity: np.ndarray, random_state=None):
+    """
+    :param data: items DataFrame which has 'average', 'delta'
+    :param quantity: 2-d np.ndarray (items x users) quantity matrix
+    :return: 2-d np.ndarray (items x users) price matrix
+    """
+    return sample_price(
+        avg=data.average.to_numpy(), delta=data.delta.to_numpy(), exist=quantity, random_state=random_state
+    )
+
+
 # core function
-def price(data, num=1):
+def price(data, num=1, random_state=None):
     """
         TODO:
             1. generate data from statistic (analyze)
             2. filter
     """
-    p_data = data.apply(lambda x: pd.Series({'price': analyze(
-        num=num,
-        exist=x.quantity,
-        avg=x.average,
-        delta=x.delta,
-        d_type=x.distr_type
-    )}), axis=1)
+    quantity = np.stack(data.quantity.to_numpy()).reshape(len(data), num)
+    p_data = pd.DataFrame(
+        {'price': list(price_matrix(data, quantity=quantity, random_state=random_state))}, index=data.index
+    )
     # for checking
 
     # attr: id, name, quantity, price
@@ -34,7 +34,7 @@ def get_truncated_normal(mean=0, sd=1, low=0, upp=10):
 
 
 def binarize(input_arr: np.ndarray,  threshold: float):
-    output_arr = np.array([(1 if e > threshold else 0) for e in input_arr])
+    output_arr = (input_arr > threshold).astype(int)
     return output_arr
 
 
@@ -61,18 +61,41 @@ def analyze(num, freq, d_type=0):
     return x_binarized
 
 
+def sample_quantity(freq: np.ndarray, num: int, random_state=None):
+    """
+        vectorized analyze: draw all items x users in one call with array-valued bounds
+    :param freq: 1-d np.ndarray, item_frequency of each item
+    :param num: the number of users
+    :param random_state: seed or np.random.Generator
+    :return: 2-d np.ndarray (items x users) binarized quantity
+    """
+    avg, delta = np.asarray(freq, dtype=float), 0.5
+    mean, sigma = avg[:, np.newaxis], delta*0.8
+
+    x = truncnorm.rvs(
+        (0 - mean) / sigma, (1 - mean) / sigma, loc=mean, scale=sigma,
+        size=(len(avg), num), random_state=np.random.default_rng(random_state)
+    )
+    return binarize(input_arr=x, threshold=0.5)
+
+
+def quantify_matrix(data: pd.DataFrame, num=1, random_state=None):
+    """
+    :param data: items DataFrame which has 'item_frequency'
+    :return: 2-d np.ndarray (items x users) quantity matrix
+    """
+    return sample_quantity(freq=data.item_frequency.to_numpy(), num=num, random_state=random_state)
+
+
 # core function
-def quantify(data, num=1):
+def quantify(data, num=1, random_state=None):
     """
         TODO:
             1. generate data from statistic (analyze)
             2. filter by quantity (True)
     """
-    q_data = data.apply(lambda x: pd.Series({'quantity': analyze(
-        num=num,
-        freq=x.item_frequency,
-        d_type=0,
-    )}), axis=1)
+    q_matrix = quantify_matrix(data, num=num, random_state=random_state)
+    q_data = pd.DataFrame({'quantity': list(q_matrix)}, index=data.index)
 
     return mask_by_quantity(data, q_data)
 
@@ -1,5 +1,8 @@
+import numpy as np
+import pandas as pd
+
 from query_builder.core import InsertBuilder
-from simulator.menu import cost_menu
+from simulator.menu import FridgeMenuIndex, MenuIndex, load_recipe_item_matrix
 
 
 # TODO: class name will be group not one user.
@@ -41,6 +44,8 @@ class User:
         self.b_type = 2  # type of behavior
         self.fridge = None
         self.menu = None
+        # probable menus are updated incrementally as fridge is recaptured
+        self.menu_index = FridgeMenuIndex()
         # TODO: diversify static features.
         # static is declared before dynamic
         self.record = dict({
@@ -64,14 +69,14 @@ class User:
 
     def capture_fridge(self, fridge_image, probable_menus):
         """
+            only a few items are changed between captures,
+            so probable_menus updates menus of them by self.menu_index (see Simulator.probable_menus)
         TODO:
             update or insert virtual in user_item table
-            change location of cost_menu function.
         """
         self.fridge = fridge_image()
         self.menu = probable_menus(self.fridge)
 
-        # self.menu = cost_menu(self.fridge, self.user_num)
         # iqb = InsertBuilder('user_table', fridge)
         # iqb.execute()
 
@@ -93,5 +98,57 @@ class User:
         pass
 
 
+class UserGroup:
+    """
+        columnar form of N virtual users instead of N User instances.
+        static features are arrays of length N and fridge is a matrix (items x users),
+        so memory scales linearly with the number of users.
+    """
 
+    def __init__(self, user_num: int, random_state=None):
+        """
+            TODO:
+                decide distribution of static features
+        :param user_num: the number of virtual users
+        :param random_state: seed or np.random.Generator
+        """
+        rng = np.random.default_rng(random_state)
 
+        self.user_num = user_num
+        self.ids = np.arange(1, user_num + 1)
+        self.gender = rng.integers(1, 4, size=user_num, dtype=np.int8)
+        # type of behavior (check comments in User class)
+        self.b_type = rng.integers(0, 5, size=user_num, dtype=np.int8)
+
+        # items x users
+        self.items = None
+        self.quantity = None
+        self.price = None
+        # probable menus (user_id, recipe_id, item_count, cost)
+        self.menu = None
+
+    @property
+    def record(self) -> pd.DataFrame:
+        return pd.DataFrame({"id": self.ids, "gender": self.gender, "driven": self.b_type})
+
+    def fridge(self, user_idx: int) -> pd.DataFrame:
+        """
+            same form as User.fridge for one user
+        :param user_idx: index of user (not id)
+        :return: pd DataFrame (id, name, quantity, price) of items in user's fridge
+        """
+        fridge = self.items[['id', 'name']].assign(
+            quantity=self.quantity[:, user_idx], price=self.price[:, user_idx]
+        )
+        return fridge[fridge.quantity > 0]
+
+    def menu_index(self, user_idx: int, threshold=5) -> MenuIndex:
+        """
+            index of probable menus for one user, it is updated incrementally as fridge changes
+        :param user_idx: index of user (not id)
+        :return: MenuIndex
+        """
+        return MenuIndex(
+            recipe_item=load_recipe_item_matrix(tuple(self.items.id)),
+            quantity=self.quantity[:, user_idx], price=self.price[:, user_idx], threshold=threshold
+        )
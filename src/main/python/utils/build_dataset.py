@@ -6,6 +6,7 @@ from data_pipeline.open_data_terrestrial_weather.core import OpenDataTerrestrial
 from feature_extraction_pipeline.open_data_marine_weather.main import MarineWeatherExtractionPipeline
 from feature_extraction_pipeline.open_data_raw_material_price.main import RawMaterialPriceExtractionPipeline
 from feature_extraction_pipeline.open_data_terrestrial_weather.main import TerrestrialWeatherExtractionPipeline
+from utils.s3_manager.cache import S3Cache
 
 
 # TODO: consider of classification
@@ -46,34 +47,50 @@ def build_origin_weather(bucket_name, date, prefix=None):
         ), "date"
 
 
-def build_process_fmp(bucket_name, date, process: bool = False):
+def build_process_fmp(bucket_name, date, process: bool = False, file_format: str = "csv", cache: S3Cache = None,
+                      incremental: bool = False):
     """
         after build price and weather, join them
+    :param file_format: format of processed data, "csv" or "parquet"
+    :param cache: (opt-in) local disk cache for origin weather file
+    :param incremental: if True, only new/changed days of origin price are processed
     :return: combined pd DataFrame
     """
-    price, p_key = build_process_price(bucket_name=bucket_name, date=date, process=process)
-    weather, w_key = build_process_weather(bucket_name=bucket_name, date=date, process=process)
+    price, p_key = build_process_price(
+        bucket_name=bucket_name, date=date, process=process, file_format=file_format, incremental=incremental
+    )
+    weather, w_key = build_process_weather(
+        bucket_name=bucket_name, date=date, process=process, file_format=file_format, cache=cache
+    )
     return pd.merge(
         price, weather, how="inner", left_on=p_key, right_on=w_key
     ).astype(dtype={"date": "datetime64"})
 
 
-def build_process_price(bucket_name, date, process: bool = False):
+def build_process_price(bucket_name, date, process: bool = False, file_format: str = "csv",
+                        incremental: bool = False):
     """
+    :param incremental: if True, only new/changed days of origin price are processed
     :return: price DataFrame and key
     """
     # extract features
-    price, key = RawMaterialPriceExtractionPipeline(bucket_name=bucket_name, date=date).process(data_process=process)
+    price, key = RawMaterialPriceExtractionPipeline(
+        bucket_name=bucket_name, date=date, file_format=file_format, incremental=incremental
+    ).process(data_process=process)
     return price, key
 
 
-def build_process_weather(bucket_name, date, process: bool = False):
+def build_process_weather(bucket_name, date, process: bool = False, file_format: str = "csv", cache: S3Cache = None):
     """
     :return: weather DataFrame and key
     """
     # extract weather features
-    t_weather, t_key = TerrestrialWeatherExtractionPipeline(bucket_name=bucket_name, date=date).process(data_process=process)
-    m_weather, m_key = MarineWeatherExtractionPipeline(bucket_name=bucket_name, date=date).process(data_process=process)
+    t_weather, t_key = TerrestrialWeatherExtractionPipeline(
+        bucket_name=bucket_name, date=date, file_format=file_format, cache=cache
+    ).process(data_process=process)
+    m_weather, m_key = MarineWeatherExtractionPipeline(
+        bucket_name=bucket_name, date=date, file_format=file_format, cache=cache
+    ).process(data_process=process)
 
     # combine marine and terrestrial weather
     weather = pd.merge(
@@ -84,10 +101,14 @@ def build_process_weather(bucket_name, date, process: bool = False):
 
 
 # core
-def build_master(dataset="origin_fmp", bucket_name="production-bobsim", date="201908", pipe_data=False):
+def build_master(dataset="origin_fmp", bucket_name="production-bobsim", date="201908", pipe_data=False,
+                 file_format="csv", cache: S3Cache = None, incremental: bool = False):
     """
     :param bucket_name:
     :param pipe_data:
+    :param file_format: format of processed data, "csv" or "parquet" (only for 'process_fmp')
+    :param cache: (opt-in) local disk cache for origin weather file (only for 'process_fmp')
+    :param incremental: if True, only new/changed days of origin price are processed (only for 'process_fmp')
     :param dataset:
         - food material price predict model
         'origin_fmp': origin
@@ -104,7 +125,10 @@ def build_master(dataset="origin_fmp", bucket_name="production-bobsim", date="20
         return build_origin_fmp(bucket_name=bucket_name, date=date)
     elif dataset == "process_fmp":
         # df combined with p_df, t_df, m_df
-        return build_process_fmp(bucket_name=bucket_name, date=date, process=pipe_data)
+        return build_process_fmp(
+            bucket_name=bucket_name, date=date, process=pipe_data, file_format=file_format, cache=cache,
+            incremental=incremental
+        )
     else:
         raise Exception("not supported")
 
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils.logging import init_logger
+
+DEFAULT_MAX_SIZE = 8
+# seconds, shorter than 'wait_timeout' of MySQL in order not to reuse connection closed by server
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class ConnectionPool:
+    """
+        thread-safe pool of DB-API connections (e.g. pymysql) for one schema
+
+        - at most max_size connections are opened at once, acquire blocks until one is released.
+        - idle connection is closed after idle_timeout.
+        - connection is checked by ping before it is handed out again.
+    """
+
+    def __init__(self, connect, max_size: int = DEFAULT_MAX_SIZE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        :param connect: function to open a new connection
+        :param max_size: the maximum number of opened connections
+        :param idle_timeout: seconds that idle connection is kept
+        """
+        self.logger = init_logger()
+
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        # (connection, released time), the last released one is reused first
+        self.idle = deque()
+        # the number of opened connections (idle + in use)
+        self.size = 0
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_alive(conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def discard_expired(self):
+        """
+            close idle connections over idle_timeout, it should be called with self.condition
+        """
+        now = time.monotonic()
+        while len(self.idle) > 0 and now - self.idle[0][1] > self.idle_timeout:
+            conn, _ = self.idle.popleft()
+            self.size -= 1
+            self.close_quietly(conn)
+
+    def acquire(self, timeout: float = None):
+        """
+        :param timeout: seconds to wait for released connection, None means forever
+        :return: connection
+        """
+        with self.condition:
+            while True:
+                self.discard_expired()
+                if len(self.idle) > 0:
+                    conn, _ = self.idle.pop()
+                    break
+                if self.size < self.max_size:
+                    # reserve a slot and open outside of lock
+                    self.size += 1
+                    conn = None
+                    break
+                if not self.condition.wait(timeout=timeout):
+                    raise TimeoutError("no connection is released in {t} seconds".format(t=timeout))
+
+        if conn is not None and self.is_alive(conn):
+            return conn
+
+        if conn is not None:
+            self.logger.debug("connection is broken, reconnect")
+            self.close_quietly(conn)
+        try:
+            return self.connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        """
+        :param broken: if True, connection is closed instead of being reused
+        """
+        with self.condition:
+            if broken:
+                self.size -= 1
+                self.close_quietly(conn)
+            else:
+                self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+            with pool.connection() as conn:
+                ...
+        transaction is always ended by rollback before the connection is reused (autocommit is off),
+        so the next borrower neither reads from a stale (REPEATABLE READ) snapshot of a previous read
+        nor inherits uncommitted writes. commit what should be kept before exit.
+        """
+        conn = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+            except Exception:
+                self.release(conn, broken=True)
+            else:
+                self.release(conn)
+
+    def close(self):
+        """
+            close idle connections, e.g. at exit of process
+        """
+        with self.condition:
+            while len(self.idle) > 0:
+                conn, _ = self.idle.popleft()
+                self.size -= 1
+                self.close_quietly(conn)
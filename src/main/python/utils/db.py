@@ -1,18 +1,38 @@
 import logging
+import os
 import sys
+import tempfile
+import threading
+from functools import lru_cache
 
 import pandas as pd
 import pymysql
+import pymysql.cursors
 import pymysql.err
 import yaml
 
+from utils.connection_pool import ConnectionPool
 from utils.executable import get_destination
 
+# rows per executemany/commit, large one statement causes pymysql.err.OperationalError
+DEFAULT_CHUNK_SIZE = 5000
 
-def get_connection(schema_name: str = "bobsim_schema"):
+
+# pool per (schema_name, local_infile)
+pools = {}
+pools_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def load_credentials():
+    # read and parse only once per process
     credentials_path = 'config/credentials.yaml'
     with open(get_destination(credentials_path)) as file:
-        credentials = yaml.load(file, Loader=yaml.FullLoader)
+        return yaml.load(file, Loader=yaml.FullLoader)
+
+
+def get_connection(schema_name: str = "bobsim_schema", local_infile: bool = False):
+    credentials = load_credentials()
 
     db_config = {
         'host': credentials['rds'][schema_name]['url'],
@@ -20,7 +40,9 @@ def get_connection(schema_name: str = "bobsim_schema"):
         'passwd': credentials['rds'][schema_name]['password'],
         'db': schema_name,
         'connect_timeout': 5,
-        'charset': 'utf8'
+        'charset': 'utf8',
+        # for LOAD DATA LOCAL INFILE
+        'local_infile': local_infile
     }
 
     logging.basicConfig()
@@ -36,7 +58,37 @@ def get_connection(schema_name: str = "bobsim_schema"):
         sys.exit()
 
 
+def get_pool(schema_name: str = "bobsim_schema", local_infile: bool = False) -> ConnectionPool:
+    """
+        connection pool is created once per schema
+    :return: ConnectionPool
+    """
+    with pools_lock:
+        key = (schema_name, local_infile)
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                connect=lambda: get_connection(schema_name=schema_name, local_infile=local_infile)
+            )
+        return pools[key]
+
+
+def pooled_connection(schema_name: str = "bobsim_schema", local_infile: bool = False):
+    """
+        with pooled_connection(schema_name) as conn:
+            ...
+    :return: context manager of connection borrowed from pool
+    """
+    return get_pool(schema_name=schema_name, local_infile=local_infile).connection()
+
+
+def close_pools():
+    with pools_lock:
+        list(map(lambda pool: pool.close(), pools.values()))
+
+
+@lru_cache(maxsize=None)
 def load_query(filename, prefix=''):
+    # sql templates are read from disk only once per process
     destination_path = 'sql/' + prefix + filename
     # For read KOR , add encoding='utf-8'
     with open(get_destination(destination_path), encoding='utf-8') as file:
@@ -44,29 +96,111 @@ def load_query(filename, prefix=''):
         return query
 
 
-def exec_return_query(query, schema_name):
-    return pd.read_sql_query(query, get_connection(schema_name))
+def exec_return_query(query, schema_name, params=None):
+    with pooled_connection(schema_name) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def exec_stream_query(query, schema_name, chunk_size: int = DEFAULT_CHUNK_SIZE, params=None):
+    """
+        unbuffered (server-side) cursor does not hold whole result set in client memory
+    :param chunk_size: the number of rows per DataFrame
+    :param params: values bound to placeholders in query
+    :return: generator of pd DataFrame
+    """
+    with pooled_connection(schema_name) as conn:
+        with conn.cursor(pymysql.cursors.SSCursor) as cur:
+            cur.execute(query, args=params)
+            columns = list(map(lambda d: d[0], cur.description))
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if len(rows) == 0:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
 
 
 def exec_void_query(args, query, schema_name):
-    conn = get_connection(schema_name)
-    try:
+    with pooled_connection(schema_name) as conn:
         with conn.cursor() as cur:
-            if type(args[0]) is tuple and len(args) > 1:
+            if args is not None and type(args[0]) is tuple and len(args) > 1:
                 cur.executemany(query=query, args=args)
             else:
                 cur.execute(query=query, args=args)
         conn.commit()
 
-    finally:
-        conn.close()
+
+def exec_bulk_query(batches, query, schema_name):
+    """
+        insert rows batch by batch through one connection and commit per batch
+    :param batches: iterable of list of tuple (NULL as None), e.g. BulkInsertBuilder.to_batches
+    :param query: parameterized insert query
+    :return: the number of affected rows
+    """
+    affected = 0
+    with pooled_connection(schema_name) as conn:
+        with conn.cursor() as cur:
+            for batch in batches:
+                affected += cur.executemany(query=query, args=batch)
+                conn.commit()
+    return affected
+
+
+def escape_backslash(value):
+    return value.replace('\\', '\\\\') if isinstance(value, str) else value
+
+
+def write_load_data(df: pd.DataFrame, fp):
+    """
+        write rows as csv read by load_data_local_infile.sql
+            - NULL is \\N
+            - backslash is the escape character (ESCAPED BY '\\'), so it is doubled in string values.
+              (escapechar of to_csv is not used, it also escapes na_rep '\\N')
+            - quote in enclosed value is doubled ("")
+    :param fp: binary file object
+    """
+    strings = df.select_dtypes(include=["object"]).columns
+    escaped = df.assign(**dict(map(lambda c: (c, df[c].map(escape_backslash)), strings)))
+    escaped.to_csv(fp, index=False, header=False, na_rep='\\N', encoding='utf-8')
+
+
+def exec_load_data(df: pd.DataFrame, table_name, schema_name, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   ignore: bool = False):
+    """
+        bulk load by 'LOAD DATA LOCAL INFILE' chunk by chunk through one connection.
+        pymysql reads a local infile by its path, so each chunk written in memory is spilled to temporary file.
+    :param df: pd DataFrame whose columns are same as columns of table
+    :param ignore:
+        True: rows with duplicate key or integrity error are skipped (with warnings)
+        False: they raise error, the same as INSERT
+    :return: the number of affected rows
+    """
+    query = load_query('load_data_local_infile.sql').format(
+        ignore="IGNORE " if ignore else "",
+        table_name=table_name, columns=",".join(map(lambda c: "`{c}`".format(c=c), df.columns)),
+        # pandas writes csv with os.linesep
+        line_terminator=os.linesep.encode('unicode_escape').decode()
+    )
+
+    affected = 0
+    with pooled_connection(schema_name, local_infile=True) as conn:
+        with conn.cursor() as cur:
+            for start in range(0, len(df), chunk_size):
+                # closed before loading, because opened temporary file can not be reopened on Windows
+                fd, path = tempfile.mkstemp(suffix=".csv")
+                try:
+                    with os.fdopen(fd, 'wb') as fp:
+                        write_load_data(df.iloc[start:start + chunk_size], fp)
+                    affected += cur.execute(query=query, args=(path,))
+                finally:
+                    os.remove(path)
+                conn.commit()
+    return affected
 
 
 def show_columns(query):  # get list(column_name) without id
 
     column = []
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query)
             rows = cur.fetchall()
@@ -75,18 +209,14 @@ def show_columns(query):  # get list(column_name) without id
             column.append(rows[i][0])
 
         conn.commit()
-
-    finally:
-        conn.close()
-        return column
+    return column
 
 
 def show_data(query, schema_name):
     column = []
     column1 = []
 
-    conn = get_connection(schema_name)
-    try:
+    with pooled_connection(schema_name) as conn:
         with conn.cursor() as cur:
             cur.execute(query)
             rows = cur.fetchall()
@@ -98,7 +228,4 @@ def show_data(query, schema_name):
         column2 = list(map(append_to_column, rows[1:]))
 
         conn.commit()
-
-    finally:
-        conn.close()
-        return column2
+    return column2
@@ -1,6 +1,7 @@
 import sys
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from utils.logging import init_logger
@@ -13,6 +14,8 @@ class NullHandler:
 
         self.input_df = df
         self.strategy = strategy
+        # the number of null by column, it is set by process
+        self.missing = None
 
         self.fillna_method = {
             "drop": self.fillna_with_drop,
@@ -47,45 +50,106 @@ class NullHandler:
 
 
     def get_columns_list(self):
-        # TODO: in order not to scan df twice, combine this method with fillnan
-        if len(self.strategy.values()) is 1:
-            return list(self.strategy.values())[0]
-        else:
-            return reduce(
-                lambda x, y: x + y,
-                self.strategy.values()
-            )
+        return [column for columns in self.strategy.values() for column in columns]
+
+    @property
+    def column_strategy(self) -> dict:
+        """
+        :return: dict { column: name of strategy }
+        """
+        return dict((column, name) for name, columns in self.strategy.items() for column in columns)
 
     @staticmethod
-    def fill_by_method(method, df):
-        filled = method(df)
-        if isinstance(filled, pd.Series):
-            return filled.to_frame()
+    def summarize(null_counts: dict):
+        """
+        :return: pd Series of columns which have null (same as missing_values), None if there is not
+        """
+        s = pd.Series(null_counts, dtype="int64")
+        return s[s > 0] if s.sum() > 0 else None
+
+    @staticmethod
+    def fill_array(values: np.ndarray, is_null: np.ndarray, method: str) -> np.ndarray:
+        """
+            same as fillna_with_zero / fillna_with_linear for a float column,
+            with temporaries of a few times one column instead of pandas interpolate
+        :return: filled copy of values
+        """
+        filled = values.copy()
+        if method == "zero":
+            filled[is_null] = 0
+        elif not is_null.all():
+            # np.interp holds the first/last valid value at both ends, as limit_direction='both'
+            filled[is_null] = np.interp(np.flatnonzero(is_null), np.flatnonzero(~is_null), values[~is_null])
         return filled
 
-    def fill_nan(self):
+    def scan_column(self, name):
         """
-        :return: list of pd DataFrame filled nan by each method
+            count null and fill by strategy in the same scan of one column
+        :return: name, the number of null, filled np.ndarray (None if not changed)
         """
-        method_list = self.strategy.keys()
+        column = self.input_df[name]
+        method = self.column_strategy.get(name)
+        if method is None:
+            return name, int(column.isna().sum()), None
+
+        if column.dtype.kind == "f":
+            values = column.to_numpy()
+            is_null = np.isnan(values)
+            count = int(is_null.sum())
+            return name, count, self.fill_array(values, is_null, method) if count > 0 else None
 
-        return list(map(
-            lambda name: self.fill_by_method(
-                self.fillna_method[name], self.input_df.filter(items=self.strategy[name])
-            ), method_list
-        ))
+        count = int(column.isna().sum())
+        return name, count, self.fillna_method[method](column).to_numpy() if count > 0 else None
 
-    def process(self):
+    def process(self, max_workers: int = None):
         """
-            by strategy, fill nan in df at once
-        :return: pd DataFrame after fill nan
+            by strategy, fill nan in df at once on a single owned copy
+                1. drop: rows with null in drop columns are excluded when the copy is made
+                2. zero, linear: each column is filled on the whole rows (as before drop) and written into the copy
+            the number of null by column is kept in self.missing (see missing_values) from the same scan.
+        :param max_workers: if it is given, columns are scanned and filled by a thread pool
+        :return: pd DataFrame after fill nan (strategy columns first, then the others)
         """
-        df_list = self.fill_nan()
+        df = self.input_df
+        columns = self.get_columns_list()
+        ordered = columns + list(filter(lambda c: c not in self.column_strategy, df.columns))
+        drop_columns = self.strategy.get("drop", [])
+
+        null_counts = {}
+        keep = np.ones(len(df), dtype=bool)
+        for name in drop_columns:
+            is_null = df[name].isna().to_numpy()
+            null_counts[name] = int(is_null.sum())
+            keep &= ~is_null
+
+        # the only copy of input (column indexing copies), rows are taken only if some are dropped
+        if keep.all():
+            owned, keep = df[ordered], None
+        else:
+            owned = df.iloc[np.flatnonzero(keep), list(map(df.columns.get_loc, ordered))]
+
+        targets = list(filter(lambda c: c not in drop_columns, df.columns))
+        if max_workers is None:
+            self.write_back(owned, map(self.scan_column, targets), keep, null_counts)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # at most max_workers filled columns are held before they are written back by this thread
+                for i in range(0, len(targets), max_workers):
+                    chunk = targets[i:i + max_workers]
+                    self.write_back(owned, executor.map(self.scan_column, chunk), keep, null_counts)
 
-        return pd.concat(
-            df_list + [self.input_df.drop(columns=self.get_columns_list(), axis=1)],
-            axis=1, join="inner"
-        )
+        self.missing = self.summarize(dict(map(lambda c: (c, null_counts[c]), df.columns)))
+        return owned
+
+    @staticmethod
+    def write_back(owned: pd.DataFrame, results, keep, null_counts: dict):
+        """
+        :param keep: row mask of drop strategy, None means every row is kept
+        """
+        for name, count, filled in results:
+            null_counts[name] = count
+            if filled is not None:
+                owned.loc[:, name] = filled if keep is None else filled[keep]
 
 
 def load(filename="2014-2020"):
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from utils.logging import init_logger
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "bobsim-s3-cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class S3Cache:
+    """
+        local content-addressed disk cache in front of S3Manager reads
+
+        entry is keyed by bucket/key/ETag, so a changed object is never served from stale cache.
+        size is bounded by LRU eviction (the last access time is kept as mtime of entry file).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir: directory where cached objects are stored
+        :param max_bytes: upper bound of total size of cached objects
+        """
+        self.logger = init_logger()
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        # counters are shared by the workers of S3Manager.iter_objects
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_name(bucket_name: str, key: str, e_tag: str) -> str:
+        return hashlib.sha256("{b}/{k}/{e}".format(b=bucket_name, k=key, e=e_tag).encode('utf-8')).hexdigest()
+
+    @property
+    def entries(self) -> list:
+        """
+        :return: list of cached files (not including the files being written)
+        """
+        return list(filter(lambda p: p.is_file() and p.suffix != ".tmp", self.cache_dir.iterdir()))
+
+    @property
+    def size(self) -> int:
+        return sum(map(lambda p: p.stat().st_size, self.entries))
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": self.size}
+
+    def count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, bucket_name: str, key: str, e_tag: str):
+        """
+        :return: opened file (binary) if cached, else None
+        """
+        path = self.cache_dir / self.make_name(bucket_name, key, e_tag)
+        try:
+            fp = open(path, 'rb')
+        except FileNotFoundError:
+            # not cached or evicted by other worker
+            return None
+
+        # touch for LRU
+        os.utime(path)
+        return fp
+
+    def put(self, bucket_name: str, key: str, e_tag: str, body):
+        """
+            copy a streaming body into the cache without holding whole object in memory
+        :param body: file-like object
+        :return: opened file (binary)
+        """
+        path = self.cache_dir / self.make_name(bucket_name, key, e_tag)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                shutil.copyfileobj(body, fp)
+            # atomic, so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except BaseException:
+            # e.g. connection reset while streaming, partial file is not left in cache dir
+            os.unlink(tmp_path)
+            raise
+
+        fp = open(path, 'rb')
+        self.evict(keep=path)
+        return fp
+
+    def evict(self, keep: Path = None):
+        """
+            remove the least recently used entries until total size is under max_bytes
+        :param keep: entry not to be removed (i.e. just written)
+        """
+        with self.lock:
+            entries = sorted(
+                map(lambda p: (p.stat().st_mtime, p.stat().st_size, p), self.entries),
+                key=lambda e: e[0]
+            )
+            total = sum(map(lambda e: e[1], entries))
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    path.unlink()
+                    total -= size
+                    self.logger.debug("evict '{path}' from s3 cache".format(path=path.name))
+                except FileNotFoundError:
+                    pass
+
+    def open(self, bucket_name: str, key: str, e_tag: str, fetch):
+        """
+        :param fetch: function to fetch a streaming body from s3 when cache misses
+        :return: opened file (binary)
+        """
+        fp = self.get(bucket_name, key, e_tag)
+        if fp is not None:
+            self.count(hit=True)
+            self.logger.debug("s3 cache hit: '{key}'".format(key=key))
+            return fp
+
+        self.count(hit=False)
+        self.logger.debug("s3 cache miss: '{key}'".format(key=key))
+        body = fetch()
+        try:
+            return self.put(bucket_name, key, e_tag, body)
+        finally:
+            body.close()
+
+    def clear(self):
+        with self.lock:
+            list(map(lambda p: p.unlink(), self.entries))
+            self.hits, self.misses = 0, 0
@@ -1,27 +1,47 @@
+import codecs
+import csv
 import json
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from io import StringIO, BytesIO
 
 import boto3
 import matplotlib.pyplot as plt
 import pandas as pd
+from botocore.exceptions import ClientError
 from joblib import dump, load
+from pandas.api.types import union_categoricals
 
 from utils.logging import init_logger
+from utils.s3_manager.cache import S3Cache
+
+# bounded concurrency for fetching many objects (e.g. backfill of origin csv)
+DEFAULT_MAX_WORKERS = 8
+# rows per chunk of streamed csv (see iter_chunks)
+DEFAULT_CHUNKSIZE = 100000
+# bytes fetched to read the header of csv (see read_header)
+DEFAULT_HEADER_RANGE = 65536
+# boto3 default session is not thread-safe, resources are created one at a time (e.g. by threads of crawl jobs)
+SESSION_LOCK = threading.Lock()
 
 
 class S3Manager:
-    def __init__(self, bucket_name):
+    def __init__(self, bucket_name, cache: S3Cache = None):
         """
         TODO:
-            Add capability to process other formats (i.e. json, text, avro, parquet, etc.)
+            Add capability to process other formats (i.e. text, avro, etc.)
         :param bucket_name: AWS S3 bucket name
+        :param cache: (opt-in) local disk cache in front of reads
         """
         self.logger = init_logger()
 
         self.bucket_name = bucket_name
+        self.cache = cache
 
-        self.s3 = boto3.resource('s3')
+        with SESSION_LOCK:
+            self.s3 = boto3.resource('s3')
         self.s3_bucket = self.s3.Bucket(bucket_name)
 
     def fetch_objs_list(self, prefix):
@@ -31,56 +51,369 @@ class S3Manager:
         """
         return list(self.s3_bucket.objects.filter(Prefix=prefix))
 
-    def fetch_objects(self, key, conversion_type):
+    @staticmethod
+    def parse_body(body, conversion_type, columns=None, dtype=None):
+        """
+            parse a streaming body as it arrives, without materialising the whole decoded text first
+        :param body: botocore StreamingBody (file-like)
+        :param conversion_type: "csv", "json", "jsonl", "parquet"
+        :param columns: list of columns to be projected (only for "csv", "parquet")
+        :param dtype: dict { column: dtype } parsed directly (only for "csv", e.g. "category", "int32")
+        :return: pd DataFrame or dict or list of dict(jsonl)
+        """
+        return {
+            # botocore StreamingBody is not io.IOBase, so read_csv decodes it as utf-8 unless it is wrapped
+            "csv": lambda b: pd.read_csv(codecs.getreader('euc-kr')(b), header=0, usecols=columns, dtype=dtype),
+            "json": lambda b: json.load(codecs.getreader('utf-8')(b)),
+            "jsonl": lambda b: list(map(json.loads, filter(str.strip, codecs.getreader('utf-8')(b)))),
+            # parquet footer is at the end of file, so it needs a seekable buffer
+            "parquet": lambda b: pd.read_parquet(BytesIO(b.read()), columns=columns)
+        }[conversion_type](body)
+
+    def fetch_body(self, key):
+        """
+            boto3 resources are not thread-safe but the low level client is,
+            so workers fetch a body through the shared client.
+        :param key: object key in s3_bucket
+        :return: botocore StreamingBody
+        """
+        return self.s3.meta.client.get_object(Bucket=self.bucket_name, Key=key)['Body']
+
+    def list_objects(self, prefix) -> list:
+        """
+            same as fetch_objs_list through the shared (thread-safe) client
+        :return: list of dict { "Key", "ETag", "Size", ... }
+        """
+        paginator = self.s3.meta.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        return [obj for page in pages for obj in page.get('Contents', [])]
+
+    def open_body(self, obj):
+        """
+            serve a body from local cache if it is enabled
+        :param obj: s3.ObjectSummary
+        :return: file-like object
+        """
+        if self.cache is None:
+            return self.fetch_body(key=obj.key)
+        return self.cache.open(
+            bucket_name=self.bucket_name, key=obj.key, e_tag=obj.e_tag,
+            fetch=lambda: self.fetch_body(key=obj.key)
+        )
+
+    def convert(self, obj, conversion_type, columns=None, dtype=None):
+        """
+        :param obj: s3.ObjectSummary
+        :return: pd DataFrame or dict
+        """
+        body = self.open_body(obj)
+        try:
+            return self.parse_body(body, conversion_type=conversion_type, columns=columns, dtype=dtype)
+        finally:
+            body.close()
+
+    def log_cache_stats(self):
+        if self.cache is not None:
+            self.logger.info("s3 cache hits/misses: {hits}/{misses}".format(
+                hits=self.cache.hits, misses=self.cache.misses))
+
+    def filter_objects(self, key, conversion_type):
+        """
+        :return: list of non-empty s3.ObjectSummary whose key contains conversion_type
+        """
+        objs_list = self.fetch_objs_list(prefix=key)
+        return list(filter(lambda o: o.size > 0 and conversion_type in o.key, objs_list))
+
+    def iter_objects(self, key, conversion_type, max_workers: int = DEFAULT_MAX_WORKERS, ordered: bool = False,
+                     columns=None, dtype=None):
+        """
+            fetch objects concurrently by a bounded thread pool and parse each body as it arrives
+        :param key: directory in s3_bucket
+        :param conversion_type: "csv", "json", "parquet"
+        :param max_workers: the number of concurrent downloads
+        :param ordered:
+            True: yield in order of object keys
+            False: yield as soon as each object is parsed
+        :param columns: list of columns to be projected
+        :param dtype: dict { column: dtype } parsed directly (only for csv)
+        :return: generator of converted objects
+        """
+        filtered = self.filter_objects(key=key, conversion_type=conversion_type)
+        if len(filtered) == 0:
+            self.logger.debug("nothing to be loaded in '{dir}'".format(dir=key))
+            return
+
+        convert = partial(self.convert, conversion_type=conversion_type, columns=columns, dtype=dtype)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(filtered)))) as executor:
+            if ordered:
+                yield from executor.map(convert, filtered)
+            else:
+                futures = [executor.submit(convert, obj) for obj in filtered]
+                for future in as_completed(futures):
+                    yield future.result()
+
+        self.logger.info("{num} files is loaded from {dir} in s3 '{bucket_name}'".format(
+            num=len(filtered), dir=key, bucket_name=self.bucket_name))
+        self.log_cache_stats()
+
+    def fetch_objects(self, key, conversion_type, max_workers: int = 1, columns=None, dtype=None):
         """
             # TODO: consideration about one df OR empty list return
         :param key: directory in s3_bucket
         :param conversion_type:
-                        "df_from_csv", "dict_from_json"
+                        "df_from_csv", "dict_from_json", "df_from_parquet"
+        :param max_workers: if greater than 1, fetch objects concurrently (see iter_objects)
+        :param columns: list of columns to be projected (only for DataFrame)
+        :param dtype: dict { column: dtype } parsed directly (only for csv)
         :return:
         """
-        # filter
-        objs_list = self.fetch_objs_list(prefix=key)
-        filtered = list(filter(lambda o: o.size > 0 and conversion_type in o.key, objs_list))
+        if max_workers > 1:
+            data_list = list(self.iter_objects(
+                key=key, conversion_type=conversion_type, max_workers=max_workers, ordered=True, columns=columns,
+                dtype=dtype
+            ))
+            return data_list if len(data_list) > 0 else None
 
-        def convert(c_type):
-            return{
-                "csv": lambda obj: pd.read_csv(StringIO(obj.get()['Body'].read().decode('euc-kr')), header=0),
-                "json": lambda obj: json.loads(obj.get()['Body'].read().decode('utf-8'))
-            }[c_type]
+        # filter
+        filtered = self.filter_objects(key=key, conversion_type=conversion_type)
 
         f_num = len(filtered)
         if f_num > 0:
             # test partial filtered by index slicing
-            data_list = list(map(convert(c_type=conversion_type), filtered))
+            data_list = list(map(
+                lambda obj: self.convert(obj, conversion_type=conversion_type, columns=columns, dtype=dtype),
+                filtered
+            ))
 
             self.logger.info("{num} files is loaded from {dir} in s3 '{bucket_name}'".format(
                 num=f_num, dir=key, bucket_name=self.bucket_name))
+            self.log_cache_stats()
             return data_list
         else:
             # TODO: error handling
             self.logger.debug("nothing to be loaded in '{dir}'".format(dir=key))
             return None
 
-    def fetch_dict_from_json(self, key):
-        return self.fetch_objects(key=key, conversion_type="json")
+    def fetch_dict_from_json(self, key, max_workers: int = 1):
+        return self.fetch_objects(key=key, conversion_type="json", max_workers=max_workers)
 
-    def fetch_df_from_csv(self, key):
-        return self.fetch_objects(key=key, conversion_type="csv")
+    def fetch_dicts_from_jsonl(self, key, max_workers: int = 1):
+        return self.fetch_objects(key=key, conversion_type="jsonl", max_workers=max_workers)
+
+    def fetch_df_from_csv(self, key, max_workers: int = 1, columns=None, dtype=None):
+        return self.fetch_objects(
+            key=key, conversion_type="csv", max_workers=max_workers, columns=columns, dtype=dtype
+        )
+
+    def fetch_df_from_parquet(self, key, max_workers: int = 1, columns=None):
+        return self.fetch_objects(key=key, conversion_type="parquet", max_workers=max_workers, columns=columns)
+
+    def iter_chunks(self, obj, chunksize: int = DEFAULT_CHUNKSIZE, row_filter=None, columns=None, dtype=None):
+        """
+            stream a csv object chunk by chunk, its body is decoded as it arrives
+            and only rows selected by row_filter are kept from each chunk.
+        :param obj: s3.ObjectSummary
+        :param chunksize: the number of rows parsed at once
+        :param row_filter: function (pd DataFrame) -> boolean mask of rows to be kept, None means every row
+        :param columns: list of columns to be projected
+        :param dtype: dict { column: dtype } parsed directly
+        :return: generator of pd DataFrame (index is row number in the object)
+        """
+        body = self.open_body(obj)
+        try:
+            reader = pd.read_csv(
+                codecs.getreader('euc-kr')(body), header=0, usecols=columns, dtype=dtype, chunksize=chunksize
+            )
+            for chunk in reader:
+                yield chunk if row_filter is None else chunk[row_filter(chunk)]
+        finally:
+            body.close()
+
+    @staticmethod
+    def concat_chunks(chunks: list, ignore_index: bool = False) -> pd.DataFrame:
+        """
+            chunks of read_csv have categories of their own rows only, and pd.concat turns a category column
+            with different categories into object. so chunks are recoded to the union of categories first.
+        :param chunks: list of pd DataFrame with the same columns
+        :return: pd DataFrame
+        """
+        categorical = list(filter(lambda c: isinstance(chunks[0][c].dtype, pd.CategoricalDtype), chunks[0].columns))
+        categories = dict(map(lambda c: (c, union_categoricals(
+            list(map(lambda chunk: chunk[c], chunks)), sort_categories=True
+        ).categories), categorical))
+        return pd.concat(list(map(
+            lambda chunk: chunk.assign(**dict(map(
+                lambda c: (c, chunk[c].cat.set_categories(categories[c])), categorical
+            ))), chunks
+        )), ignore_index=ignore_index)
+
+    def iter_csv_chunks(self, key, chunksize: int = DEFAULT_CHUNKSIZE, row_filter=None, columns=None, dtype=None):
+        """
+            stream csv objects in key one after another (see iter_chunks)
+        :param key: directory in s3_bucket
+        :return: generator of pd DataFrame
+        """
+        for obj in self.filter_objects(key=key, conversion_type="csv"):
+            yield from self.iter_chunks(
+                obj, chunksize=chunksize, row_filter=row_filter, columns=columns, dtype=dtype
+            )
+
+    def fetch_df_from_csv_chunks(self, key, chunksize: int = DEFAULT_CHUNKSIZE, row_filter=None, columns=None,
+                                 dtype=None):
+        """
+            same as fetch_df_from_csv, but peak memory is bounded by a chunk and the rows kept,
+            not by the whole object (e.g. a month of multi-year origin file)
+        :param row_filter: function (pd DataFrame) -> boolean mask of rows to be kept, None means every row
+        :return: list of pd DataFrame (a DataFrame of kept rows per object, index is reset as fetch_df_from_csv_select)
+        """
+        filtered = self.filter_objects(key=key, conversion_type="csv")
+        if len(filtered) == 0:
+            self.logger.debug("nothing to be loaded in '{dir}'".format(dir=key))
+            return None
+
+        data_list = list(map(lambda obj: self.concat_chunks(list(self.iter_chunks(
+            obj, chunksize=chunksize, row_filter=row_filter, columns=columns, dtype=dtype
+        )), ignore_index=True), filtered))
+
+        self.logger.info("{num} files is streamed from {dir} in s3 '{bucket_name}'".format(
+            num=len(filtered), dir=key, bucket_name=self.bucket_name))
+        self.log_cache_stats()
+        return data_list
+
+    def read_header(self, obj) -> list:
+        """
+            read only the first line of csv by a range request
+        :param obj: s3.ObjectSummary
+        :return: list of column names
+        """
+        body = self.s3.meta.client.get_object(
+            Bucket=self.bucket_name, Key=obj.key, Range="bytes=0-{end}".format(end=DEFAULT_HEADER_RANGE - 1)
+        )['Body']
+        try:
+            line = body.read().split(b"\n", 1)[0].decode('euc-kr')
+        finally:
+            body.close()
+        return next(csv.reader([line.rstrip("\r")]))
+
+    @staticmethod
+    def make_row_filter(where: tuple):
+        """
+            local equivalent of the predicate of make_expression
+        :param where: (column, lower, upper), lower <= value < upper compared as strings
+        :return: function (pd DataFrame) -> boolean mask
+        """
+        column, lower, upper = where
+
+        def row_filter(df: pd.DataFrame):
+            value = df[column].astype(str)
+            return (value >= lower) & (value < upper)
+        return row_filter
+
+    @staticmethod
+    def make_expression(header: list, columns: list, where: tuple = None) -> str:
+        """
+            columns are referred by position (e.g. s._1), because header of origin csv is not utf-8
+        :param header: list of column names in csv
+        :param columns: list of columns to be projected
+        :param where: (column, lower, upper), lower <= value < upper compared as strings
+        :return: SQL expression of S3 Select
+        """
+        def position(column):
+            return "s._{i}".format(i=header.index(column) + 1)
+
+        def quote(value):
+            return "'{v}'".format(v=str(value).replace("'", "''"))
+
+        expression = "SELECT {projection} FROM S3Object s".format(projection=", ".join(map(position, columns)))
+        if where is None:
+            return expression
+        column, lower, upper = where
+        return "{e} WHERE {c} >= {l} AND {c} < {u}".format(
+            e=expression, c=position(column), l=quote(lower), u=quote(upper)
+        )
+
+    def select_csv(self, obj, columns: list, where: tuple = None, dtype=None) -> pd.DataFrame:
+        """
+            projection and predicate are pushed down to S3 Select, only selected columns of selected rows
+            are transferred. (local cache is not used)
+        :param obj: s3.ObjectSummary
+        :param columns: list of columns to be projected
+        :param where: (column, lower, upper), lower <= value < upper compared as strings
+        :param dtype: dict { column: dtype } parsed directly
+        :return: pd DataFrame
+        """
+        expression = self.make_expression(header=self.read_header(obj), columns=columns, where=where)
+        response = self.s3.meta.client.select_object_content(
+            Bucket=self.bucket_name, Key=obj.key, ExpressionType='SQL', Expression=expression,
+            # IGNORE: the first line is header, but it is not used for column names
+            InputSerialization={'CSV': {'FileHeaderInfo': 'IGNORE'}, 'CompressionType': 'NONE'},
+            OutputSerialization={'CSV': {}}
+        )
+        records = b"".join(event['Records']['Payload'] for event in response['Payload'] if 'Records' in event)
+        if len(records) == 0:
+            # no row is selected, empty DataFrame with the same columns and types
+            return pd.read_csv(StringIO(",".join(columns)), dtype=dtype)
+        # output of S3 Select is always utf-8 whatever the encoding of object is
+        return pd.read_csv(BytesIO(records), header=None, names=columns, encoding='utf-8', dtype=dtype)
+
+    def fetch_df_from_csv_select(self, key, columns: list, where: tuple = None, dtype=None):
+        """
+            query mode of fetch_df_from_csv (see select_csv)
+            if S3 Select is not supported (e.g. account, storage class, encoding of values, S3 compatible storage),
+            the object is streamed and filtered locally with the same projection and predicate instead.
+        :param columns: list of columns to be projected
+        :param where: (column, lower, upper), lower <= value < upper compared as strings
+        :param dtype: dict { column: dtype } parsed directly
+        :return: list of pd DataFrame (index is reset as fetch_df_from_csv_chunks)
+        """
+        filtered = self.filter_objects(key=key, conversion_type="csv")
+        if len(filtered) == 0:
+            self.logger.debug("nothing to be loaded in '{dir}'".format(dir=key))
+            return None
+
+        def fetch(obj):
+            try:
+                return self.select_csv(obj, columns=columns, where=where, dtype=dtype)
+            # unsupported select is an error response or an error event of the stream (EventStreamError)
+            except ClientError as e:
+                self.logger.warning("fail to select '{key}', filter it locally: {e}".format(key=obj.key, e=e))
+                return self.concat_chunks(list(self.iter_chunks(
+                    obj, row_filter=None if where is None else self.make_row_filter(where),
+                    columns=columns, dtype=dtype
+                )), ignore_index=True)[columns]
+
+        data_list = list(map(fetch, filtered))
+        self.logger.info("{num} files is selected from {dir} in s3 '{bucket_name}'".format(
+            num=len(filtered), dir=key, bucket_name=self.bucket_name))
+        return data_list
+
+    def fetch_df(self, key, file_format: str = "csv", columns=None):
+        """
+        :param key: directory in s3_bucket
+        :param file_format: "csv", "parquet"
+        :param columns: list of columns to be projected
+        :return: list of pd DataFrame
+        """
+        return {
+            "csv": self.fetch_df_from_csv,
+            "parquet": self.fetch_df_from_parquet,
+        }[file_format](key=key, columns=columns)
 
     def save_object(self, body, key, kwargs=None):
         """
+            put through the shared client like fetch_body,
+            so that one S3Manager can be used by many threads (e.g. image upload on I/O pool of crawler)
         :param body: data
         :param key: directory in s3
         :param kwargs: other arguments ex. 'ACL', 'ContentType'
         :return: success code
         """
         if kwargs is None:
-            self.s3.Object(bucket_name=self.bucket_name, key=key).put(Body=body)
-        else:
-            self.s3.Object(bucket_name=self.bucket_name, key=key).put(**kwargs, Body=body)
+            kwargs = {}
+        self.s3.meta.client.put_object(Bucket=self.bucket_name, Key=key, Body=body, **kwargs)
 
-        if len(self.fetch_objs_list(prefix=key)) is not 1:
+        if len(self.list_objects(prefix=key)) != 1:
             # if there is no saved file in s3, raise exception
             return False
         else:
@@ -93,11 +426,35 @@ class S3Manager:
         serialized_data = json.dumps(data, ensure_ascii=False)
         return self.save_object(key=key, body=serialized_data)
 
+    def save_dicts_to_jsonl(self, data: list, key: str):
+        """
+            JSON Lines, one dict per line, so that it can be read line by line
+        """
+        serialized_data = "".join(map(lambda d: json.dumps(d, ensure_ascii=False) + "\n", data))
+        return self.save_object(key=key, body=serialized_data.encode('utf-8'))
+
     def save_df_to_csv(self, df: pd.DataFrame, key: str):
         csv_buffer = StringIO()
         df.to_csv(csv_buffer, index=False)
         return self.save_object(body=csv_buffer.getvalue().encode('euc-kr'), key=key)
 
+    def save_df_to_parquet(self, df: pd.DataFrame, key: str):
+        """
+            columnar format keeps dtypes (e.g. datetime64, float32, category) between pipelines
+        """
+        parquet_buffer = BytesIO()
+        df.to_parquet(parquet_buffer, index=False)
+        return self.save_object(body=parquet_buffer.getvalue(), key=key)
+
+    def save_df(self, df: pd.DataFrame, key: str, file_format: str = "csv"):
+        """
+        :param file_format: "csv", "parquet"
+        """
+        return {
+            "csv": self.save_df_to_csv,
+            "parquet": self.save_df_to_parquet,
+        }[file_format](df=df, key=key)
+
     def save_img(self, data, key, kwargs):
         return self.save_object(body=data, key=key, kwargs=kwargs)
 
@@ -2,5 +2,13 @@ import pandas as pd
 
 
 def filter_sparse(column: pd.Series, std_list: list):
-    sparse_list = list(filter(lambda x: x not in std_list, column.unique()))
-    return column.replace(sparse_list, "others")
+    """
+        replace values not in std_list with "others" (missing value is also "others")
+        categorical column is handled by its categories, not by its values.
+        (categories are kept sorted, so that sorting by the column is the same as sorting by values)
+    :return: pd Series (categorical if column is categorical)
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        kept = list(filter(lambda c: c != "others", column.cat.categories[column.cat.categories.isin(std_list)]))
+        return column.cat.set_categories(sorted(kept + ["others"])).fillna("others")
+    return column.where(column.isin(std_list), "others")
@@ -0,0 +1,60 @@
+import logging
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, os.path.join(ROOT, "src", "main", "python"))
+
+import utils.executable  # noqa: E402
+import utils.logging  # noqa: E402
+
+# source root is the path of deployment (e.g. sql templates), tests use this repository instead
+utils.executable.get_source_root = lambda: ROOT
+# logging config writes a file in the working directory, so tests log to root logger
+utils.logging.init_logger = lambda name='__main__': logging.getLogger(name)
+
+import pytest  # noqa: E402
+
+BUCKET_NAME = "test-bucket"
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """
+        in-process S3 (moto) with an empty bucket
+    """
+    from moto import mock_aws
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        import boto3
+        boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+        yield BUCKET_NAME
+
+
+@pytest.fixture
+def s3_server_bucket(monkeypatch):
+    """
+        S3 served by moto server mode with an empty bucket,
+        unsupported requests are answered by error responses (ClientError) as S3 does
+    """
+    from moto.server import ThreadedMotoServer
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_MAX_ATTEMPTS", "1")
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setenv("AWS_ENDPOINT_URL", "http://{h}:{p}".format(h=host, p=port))
+    try:
+        import boto3
+        boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+        yield BUCKET_NAME
+    finally:
+        server.stop()
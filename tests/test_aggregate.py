@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from data_pipeline.aggregate import aggregate_by_key
+from utils.handle_null import NullHandler
+
+COLUMNS_WITH_DROP = ["date"]
+COLUMNS_WITH_ZERO = ["t_dur_preci", "t_daily_preci"]
+COLUMNS_WITH_LINEAR = ["t_temper_avg", "t_rel_hmd_min"]
+
+
+def make_weather():
+    nan = np.nan
+    return pd.DataFrame({
+        "date": ["20200101", "20200101", "20200102", None, "20200103", "20200104", "20200104", "20200102"],
+        "t_dur_preci": [1.0, nan, 2.0, 5.0, nan, 3.0, 1.0, nan],
+        "t_daily_preci": [nan, 4.0, 2.5, 1.0, 0.5, nan, nan, 1.5],
+        # every value of 20200103 is null, so it is interpolated between neighbours
+        "t_temper_avg": [-1.0, 1.5, 3.0, 9.0, nan, 7.0, nan, 2.0],
+        "t_rel_hmd_min": [nan, nan, 40.0, 10.0, nan, 60.0, 55.0, nan],
+    }).astype(dict.fromkeys(COLUMNS_WITH_ZERO + COLUMNS_WITH_LINEAR, "float32"))
+
+
+def clean_with_null_handler(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        previous clean() of weather processors: NullHandler (drop, zero) and groupby by date twice
+    """
+    def groupby_date(d):
+        return d.groupby(["date"]).mean().reset_index()
+
+    nh = NullHandler(strategy={"drop": COLUMNS_WITH_DROP, "zero": COLUMNS_WITH_ZERO},
+                     df=df[COLUMNS_WITH_DROP + COLUMNS_WITH_ZERO])
+    linear = nh.fillna_with_linear(groupby_date(df)[COLUMNS_WITH_LINEAR])
+    drop_and_zero = groupby_date(nh.process())
+    return pd.concat([drop_and_zero, linear], axis=1)
+
+
+def test_aggregate_by_key_matches_null_handler_and_groupby():
+    df = make_weather()
+
+    result = aggregate_by_key(
+        df, columns_with_drop=COLUMNS_WITH_DROP, columns_with_zero=COLUMNS_WITH_ZERO,
+        columns_with_linear=COLUMNS_WITH_LINEAR, key="date"
+    )
+
+    pd.testing.assert_frame_equal(result, clean_with_null_handler(df), rtol=1e-6)
@@ -0,0 +1,152 @@
+import json
+
+import boto3
+import pytest
+
+from api.app import create_app
+from api.cache import CatalogCache
+from api.job import CrawlJob
+from api.metrics import DEFAULT_BUCKETS
+from utils.s3_manager.manage import S3Manager
+
+# bucket of catalogs served by app
+APP_BUCKET_NAME = "production-bobsim"
+
+
+@pytest.fixture
+def app_bucket(s3_bucket):
+    boto3.client("s3").create_bucket(Bucket=APP_BUCKET_NAME)
+    return APP_BUCKET_NAME
+
+
+@pytest.fixture
+def client(s3_bucket, monkeypatch):
+    # jobs stay queued, nothing is crawled
+    monkeypatch.setattr(CrawlJob, "run", lambda self: None)
+    app = create_app()
+    yield app.test_client()
+    app.extensions["crawl_job_queue"].shutdown()
+
+
+def test_create_crawl_job_rejects_invalid_worker_num(client):
+    response = client.post("/crawl_job?source=M&str_num=1&end_num=10&worker_num=two")
+
+    assert response.status_code == 400
+    assert "worker_num" in response.get_json()["error"]
+
+
+def test_create_crawl_job_rejects_overlapping_active_job(client):
+    first = client.post("/crawl_job?source=M&str_num=1&end_num=10")
+    assert first.status_code == 202
+
+    overlapped = client.post("/crawl_job?source=M&str_num=9&end_num=20")
+    assert overlapped.status_code == 409
+    assert overlapped.get_json()["job_id"] == first.get_json()["job_id"]
+
+    assert client.post("/crawl_job?source=M&str_num=10&end_num=20").status_code == 202
+    assert client.post("/crawl_job?source=H&str_num=1&end_num=10").status_code == 202
+
+
+def test_finished_job_does_not_block_the_same_range(client):
+    first = client.post("/crawl_job?source=M&str_num=1&end_num=10").get_json()
+    client.application.extensions["crawl_job_queue"].get(first["job_id"]).status = "done"
+
+    assert client.post("/crawl_job?source=M&str_num=1&end_num=10").status_code == 202
+
+
+def put_recipes(bucket_name):
+    s3 = boto3.client("s3")
+    s3.put_object(Bucket=bucket_name, Key="crawled_recipe/M/1-3.json",
+                  Body=json.dumps({"1": {"title": "김치찌개"}, "2": {"title": "된장국"}}, ensure_ascii=False))
+    s3.put_object(Bucket=bucket_name, Key="crawled_recipe/M/2-4.json",
+                  Body=json.dumps({"2": {"title": "된장찌개"}, "3": {"title": "미역국"}}, ensure_ascii=False))
+
+
+def test_get_recipes_keeps_list_of_files_by_default(client, app_bucket):
+    put_recipes(app_bucket)
+
+    response = client.get("/recipe/M")
+
+    assert response.status_code == 200
+    assert response.get_json() == S3Manager(bucket_name=app_bucket).fetch_dict_from_json(
+        key="crawled_recipe/M")
+    assert client.get("/recipe/M?limit=1").status_code == 400
+
+
+def test_get_recipes_page_keeps_duplicate_keys(client, app_bucket):
+    put_recipes(app_bucket)
+
+    page = client.get("/recipe/M?format=page&offset=1&limit=2").get_json()
+    assert page == {
+        "total": 4, "offset": 1, "limit": 2, "data": [{"2": {"title": "된장국"}}, {"2": {"title": "된장찌개"}}]
+    }
+
+    lines = client.get("/recipe/M?format=jsonl&offset=3").get_data().decode("utf-8").splitlines()
+    assert lines == ['{"3": {"title": "미역국"}}']
+
+
+def test_catalog_larger_than_cache_is_not_kept(s3_bucket):
+    put_recipes(s3_bucket)
+    cache = CatalogCache(bucket_name=s3_bucket, max_bytes=10)
+
+    catalog = cache.get(key="crawled_recipe/M")
+
+    assert len(catalog) == 4
+    assert len(cache.catalogs) == 0
+
+
+def metric(text: str, name: str, **labels) -> float or None:
+    """
+        value of a sample in prometheus text format, None if there is not
+    """
+    selector = "{name}{{{labels}}} ".format(
+        name=name, labels=",".join(map(lambda i: '{k}="{v}"'.format(k=i[0], v=i[1]), labels.items())))
+    values = [float(line[len(selector):]) for line in text.splitlines() if line.startswith(selector)]
+    return values[0] if len(values) > 0 else None
+
+
+def test_metrics_of_routes(client, app_bucket):
+    put_recipes(app_bucket)
+    route = "/<prefix>/<source>"
+
+    # buffered response is closed as a WSGI server does, then its latency is observed
+    assert client.get("/recipe/M?format=page", buffered=True).status_code == 200
+    assert client.get("/recipe/M?format=xml", buffered=True).status_code == 400
+    assert client.get("/no/such/path", buffered=True).status_code == 404
+
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert metric(text, "http_responses_total", method="GET", route=route, status=200) == 1
+    assert metric(text, "http_responses_total", method="GET", route=route, status=400) == 1
+    # raw paths do not make series of their own
+    assert metric(text, "http_responses_total", method="GET", route="<unmatched>", status=404) == 1
+    assert "/no/such/path" not in text
+
+    assert metric(text, "http_request_duration_seconds_count", method="GET", route=route) == 2
+    buckets = list(map(
+        lambda b: metric(text, "http_request_duration_seconds_bucket", method="GET", route=route, le=b),
+        list(map(str, DEFAULT_BUCKETS)) + ["+Inf"]
+    ))
+    assert buckets == sorted(buckets) and buckets[-1] == 2
+    assert metric(text, "http_request_duration_seconds_sum", method="GET", route=route) > 0
+
+
+def test_in_flight_of_streamed_response(client, app_bucket):
+    put_recipes(app_bucket)
+    route = "/<prefix>/<source>"
+
+    response = client.get("/recipe/M?format=jsonl", buffered=False)
+    first = next(iter(response.response))
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert metric(text, "http_requests_in_flight", method="GET", route=route) == 1
+    # latency of streamed response is observed when it is closed
+    assert metric(text, "http_request_duration_seconds_count", method="GET", route=route) is None
+
+    assert json.loads(first) == {"1": {"title": "김치찌개"}}
+    response.close()
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert metric(text, "http_requests_in_flight", method="GET", route=route) == 0
+    assert metric(text, "http_request_duration_seconds_count", method="GET", route=route) == 1
+    assert metric(text, "http_responses_total", method="GET", route=route, status=200) == 1
@@ -0,0 +1,57 @@
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from data_pipeline.batch import partition_by_month, process_by_month, pick_month, month_range
+
+
+class CountProcessor:
+    """
+        processor which fails (1) on a partition with more than 2 rows
+    """
+
+    def __init__(self, bucket_name, date, origin_df, limit=2):
+        self.date = date
+        self.df = origin_df
+        self.limit = limit
+
+    def process(self):
+        assert (self.df["date"].dt.strftime("%Y%m") == self.date).all()
+        return 0 if len(self.df) <= self.limit else 1
+
+
+def make_origin():
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2019-05-01", "2019-05-31", None, "2019-06-15", "2018-12-01", "2019-05-02"]),
+        "value": range(6),
+    })
+
+
+def test_partition_by_month_with_nat(caplog):
+    with caplog.at_level(logging.WARNING):
+        partitions = partition_by_month(make_origin())
+
+    assert sorted(partitions.keys()) == ["201812", "201905", "201906"]
+    assert partitions["201905"]["value"].tolist() == [0, 1, 5]
+    assert "1 rows without 'date' are dropped" in caplog.text
+
+
+def test_process_by_month():
+    origin = make_origin()
+
+    assert process_by_month(CountProcessor, bucket_name="bucket", origin_df=origin) == {
+        "201812": 0, "201905": 1, "201906": 0
+    }
+    # month without data is regarded as fail
+    assert process_by_month(
+        CountProcessor, bucket_name="bucket", origin_df=origin, dates=["201906", "201907"], limit=3, max_workers=2
+    ) == {"201906": 0, "201907": 1}
+
+
+def test_pick_month_and_month_range():
+    df = pd.DataFrame({"일시": ["2019-11-30", "2019-12-01", "2019-12-31 23:00", "2020-01-01"]})
+
+    assert pick_month("일시", datetime(2019, 12, 1))(df).tolist() == [False, True, True, False]
+    assert month_range("일시", datetime(2019, 12, 1)) == ("일시", "2019-12", "2020-01")
+    assert month_range("일시", datetime(2019, 1, 1)) == ("일시", "2019-01", "2019-02")
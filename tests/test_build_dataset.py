@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from utils.build_dataset import build_master, build_process_fmp
+from utils.s3_manager.manage import S3Manager
+
+PROCESS_KEY = "public_data/{name}/process/{fmt}/201908.{fmt}"
+
+PRICE = pd.DataFrame({
+    "date": pd.to_datetime(["2019-08-01", "2019-08-01", "2019-08-02"]),
+    "region": ["서울", "부산", "서울"],
+    "standard_item_name": ["배추", "무", "배추"],
+    "price": [300.0, 150.0, 280.0],
+})
+TERRESTRIAL = pd.DataFrame({"date": pd.to_datetime(["2019-08-01", "2019-08-02"]), "t_temper_avg": [25.5, 27.0]})
+MARINE = pd.DataFrame({"date": pd.to_datetime(["2019-08-01", "2019-08-02"]), "m_temper_avg": [22.0, 23.5]})
+
+
+def put_process(bucket_name, file_format: str, price_scale: float = 1.0):
+    manager = S3Manager(bucket_name=bucket_name)
+    frames = {
+        "open_data_raw_material_price": PRICE.assign(price=PRICE["price"] * price_scale),
+        "open_data_terrestrial_weather": TERRESTRIAL,
+        "open_data_marine_weather": MARINE,
+    }
+    for name, df in frames.items():
+        manager.save_df(df=df, key=PROCESS_KEY.format(name=name, fmt=file_format), file_format=file_format)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_build_process_fmp_reads_processed_data_of_format(s3_bucket, file_format):
+    # the other format has different prices, so the format read is observable
+    put_process(s3_bucket, "csv", price_scale=1.0)
+    put_process(s3_bucket, "parquet", price_scale=2.0)
+
+    fmp = build_process_fmp(bucket_name=s3_bucket, date="201908", file_format=file_format)
+
+    scale = 1.0 if file_format == "csv" else 2.0
+    assert len(fmp) == 3
+    assert fmp["price"].tolist() == [300.0 * scale, 150.0 * scale, 280.0 * scale]
+    assert fmp["date"].dtype == "datetime64[ns]"
+    assert fmp["t_temper_avg"].tolist() == [25.5, 25.5, 27.0]
+    assert fmp["m_temper_avg"].tolist() == [22.0, 22.0, 23.5]
+    # categorical features are one-hot encoded by the extractor
+    assert {"region_서울", "region_부산", "standard_item_name_배추", "standard_item_name_무"} <= set(fmp.columns)
+
+
+def test_build_master_passes_file_format(s3_bucket):
+    put_process(s3_bucket, "parquet")
+
+    fmp = build_master(dataset="process_fmp", bucket_name=s3_bucket, date="201908", file_format="parquet")
+
+    pd.testing.assert_frame_equal(fmp, build_process_fmp(bucket_name=s3_bucket, date="201908", file_format="parquet"))
@@ -0,0 +1,33 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from query_builder.core import BulkInsertBuilder
+from utils.db import write_load_data
+
+
+def test_to_batches_makes_rows_by_chunk_with_null_as_none():
+    df = pd.DataFrame({
+        "name": ["a", None, "c"],
+        "price": [1.5, np.nan, 3.0],
+        "count": pd.array([1, None, 3], dtype="Int64"),
+    })
+
+    batches = list(BulkInsertBuilder.to_batches(df, chunk_size=2))
+
+    assert batches == [[("a", 1.5, 1), (None, None, None)], [("c", 3.0, 3)]]
+    assert type(batches[0][0][2]) is int
+
+
+def test_write_load_data_keeps_backslash_quote_and_null():
+    df = pd.DataFrame({"name": ["C:\\dir", 'say "hi"', None], "price": [1, 2, 3]})
+
+    fp = BytesIO()
+    write_load_data(df, fp)
+
+    assert fp.getvalue().decode("utf-8").splitlines() == [
+        "C:\\\\dir,1",
+        '"say ""hi""",2',
+        "\\N,3",
+    ]
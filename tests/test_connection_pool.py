@@ -0,0 +1,90 @@
+from utils.connection_pool import ConnectionPool
+
+
+class FakeDatabase:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeConnection:
+    """
+        autocommit off and REPEATABLE READ: the first read of a transaction takes a snapshot,
+        which is kept until commit or rollback
+    """
+
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.snapshot = None
+        self.pending = None
+
+    def read(self):
+        if self.pending is not None:
+            return self.pending
+        if self.snapshot is None:
+            self.snapshot = self.db.value
+        return self.snapshot
+
+    def write(self, value):
+        self.pending = value
+
+    def commit(self):
+        if self.pending is not None:
+            self.db.value = self.pending
+        self.snapshot, self.pending = None, None
+
+    def rollback(self):
+        self.snapshot, self.pending = None, None
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_pool(db):
+    return ConnectionPool(connect=lambda: FakeConnection(db), max_size=1)
+
+
+def test_second_borrower_sees_fresh_snapshot():
+    db = FakeDatabase(value=1)
+    pool = make_pool(db)
+
+    with pool.connection() as conn:
+        first = conn
+        assert conn.read() == 1
+
+    # committed by another client after the first read
+    writer = FakeConnection(db)
+    writer.write(2)
+    writer.commit()
+
+    with pool.connection() as conn:
+        assert conn is first
+        assert conn.read() == 2
+
+
+def test_uncommitted_write_does_not_leak_to_next_borrower():
+    db = FakeDatabase(value=1)
+    pool = make_pool(db)
+
+    with pool.connection() as conn:
+        conn.write(2)
+
+    with pool.connection() as conn:
+        assert conn.read() == 1
+    assert db.value == 1
+
+
+def test_connection_is_closed_if_rollback_fails():
+    db = FakeDatabase(value=1)
+    pool = make_pool(db)
+
+    with pool.connection() as conn:
+        def fail():
+            raise ConnectionError("lost")
+        conn.rollback = fail
+
+    assert pool.size == 0
+    with pool.connection() as conn:
+        assert conn.read() == 1
@@ -0,0 +1,120 @@
+import json
+from functools import partialmethod
+
+import boto3
+
+from api import job
+from crawler.pool import RecipeCrawlerPool
+from crawler.sink import from_ranges
+from utils.s3_manager.manage import S3Manager
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+class FakeCrawler:
+    """
+        crawler without browser: odd pages are not found and recipe 4 fails to upload its image
+    """
+
+    def __init__(self, candidate_num, bucket_name, key):
+        self.candidate_num = candidate_num
+        self.driver = FakeDriver()
+
+    @staticmethod
+    def safe(func, recipe_num):
+        try:
+            return func()
+        except ValueError:
+            return False
+
+    @staticmethod
+    def crawl_page(recipe_num):
+        if recipe_num % 2 == 1:
+            raise ValueError
+        return {"title": str(recipe_num)}, "http://image/{n}".format(n=recipe_num)
+
+    @staticmethod
+    def attach_image(recipe, image_url, recipe_id):
+        if recipe_id == 4:
+            raise ValueError
+        return dict(recipe, image_url=image_url)
+
+
+def test_crawl_records_failed_pages_and_images():
+    pool = RecipeCrawlerPool(FakeCrawler, candidate_num=range(10), bucket_name="bucket", key="key", worker_num=3)
+
+    recipes = pool.crawl()
+
+    assert list(recipes.keys()) == [0, 2, 6, 8]
+    assert recipes[2] == {"title": "2", "image_url": "http://image/2"}
+    assert pool.sink.failed == {1, 3, 4, 5, 7, 9}
+
+
+class CrashingCrawler(FakeCrawler):
+    """
+        FakeCrawler whose job crashes once at crash_at, every page tried is recorded
+    """
+    crash_at = None
+    tried = []
+
+    def __init__(self, candidate_num, bucket_name, key, **kwargs):
+        super().__init__(candidate_num, bucket_name, key)
+
+    @classmethod
+    def crawl_page(cls, recipe_num):
+        cls.tried.append(recipe_num)
+        if recipe_num == cls.crash_at:
+            cls.crash_at = None
+            raise RuntimeError("crash")
+        return FakeCrawler.crawl_page(recipe_num)
+
+
+def test_restarted_job_resumes_from_checkpoint(s3_bucket, monkeypatch):
+    saved = []
+    save_object = S3Manager.save_object
+
+    def record_save(self, body, key, kwargs=None):
+        saved.append(key)
+        return save_object(self, body=body, key=key, kwargs=kwargs)
+
+    monkeypatch.setattr(S3Manager, "save_object", record_save)
+    monkeypatch.setattr(RecipeCrawlerPool, "process_job", partialmethod(RecipeCrawlerPool.process_job, shard_size=2))
+    monkeypatch.setitem(job.RECIPE_CRAWLERS, "M", CrashingCrawler)
+    CrashingCrawler.crash_at, CrashingCrawler.tried = 12, []
+
+    first = job.CrawlJob(source="M", candidate_num=range(20), bucket_name=s3_bucket, worker_num=2)
+    first.run()
+
+    assert first.status == "failed" and "crash" in first.error
+    assert first.to_dict()["resumed"] == 0
+    checkpoint = first.runner.sink.result()
+    done, failed = from_ranges(checkpoint["done"]), from_ranges(checkpoint["failed"])
+    assert done == {0, 2, 6, 8, 10}
+    first_shards = list(checkpoint["shards"])
+
+    CrashingCrawler.tried = []
+    second = job.CrawlJob(source="M", candidate_num=range(20), bucket_name=s3_bucket, worker_num=2)
+    second.run()
+
+    assert second.status == "done"
+    # checkpointed ids are skipped, failed ids are retried
+    assert done.isdisjoint(CrashingCrawler.tried)
+    assert sorted(CrashingCrawler.tried) == sorted(set(range(20)) - done)
+    status = second.to_dict()
+    assert status["resumed"] == len(done | failed)
+    assert status["processed"] == 20
+
+    # shards of the first run are kept, new shards are appended and nothing is written twice
+    assert second.checkpoint["shards"][:len(first_shards)] == first_shards
+    shard_keys = list(filter(lambda k: "/shard-" in k, saved))
+    assert sorted(shard_keys) == sorted(set(shard_keys)) == sorted(second.checkpoint["shards"])
+
+    s3 = boto3.client("s3")
+    recipe_ids = list(map(lambda r: r["recipe_id"], (
+        json.loads(line) for key in second.checkpoint["shards"]
+        for line in s3.get_object(Bucket=s3_bucket, Key=key)["Body"].read().decode("utf-8").splitlines()
+    )))
+    assert sorted(recipe_ids) == [0, 2, 6, 8, 10, 12, 14, 16, 18]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.handle_null import NullHandler
+
+STRATEGY = {
+    "drop": ["low"],
+    "zero": ["rain", "memo"],
+    "linear": ["wind", "high"],
+}
+
+
+def reference_process(df: pd.DataFrame, strategy: dict) -> pd.DataFrame:
+    """
+        previous process: fill each strategy on its own frame and concat them by index
+    """
+    nh = NullHandler(strategy=strategy, df=df)
+    filled = list(map(lambda name: nh.fillna_method[name](df.filter(items=strategy[name])), strategy))
+    return pd.concat(filled + [df.drop(columns=nh.get_columns_list(), axis=1)], axis=1, join="inner")
+
+
+@pytest.fixture
+def weather():
+    rng = np.random.default_rng(0)
+    n = 50
+
+    def with_null(values, ratio=0.2):
+        return pd.Series(values).mask(rng.random(n) < ratio)
+
+    # non-default index, not sorted and not starting from 0
+    index = pd.Index(rng.permutation(np.arange(100, 100 + n)) * 3, name="obs")
+    return pd.DataFrame({
+        "location": with_null(rng.choice(["서울", "부산"], n).astype(object)).to_numpy(),
+        "wind": with_null(rng.random(n) * 10).to_numpy(),
+        "low": with_null(rng.normal(10, 5, n)).to_numpy(),
+        "rain": with_null(rng.random(n) * 30).astype("float32").to_numpy(),
+        "memo": with_null(rng.choice(["a", "b"], n).astype(object)).to_numpy(),
+        "high": with_null(rng.normal(20, 5, n), ratio=0.5).to_numpy(),
+    }, index=index)
+
+
+@pytest.mark.parametrize("max_workers", [None, 2])
+def test_process_matches_reference(weather, max_workers):
+    before = weather.copy()
+    nh = NullHandler(strategy=STRATEGY, df=weather)
+
+    result = nh.process(max_workers=max_workers)
+
+    pd.testing.assert_frame_equal(result, reference_process(weather, STRATEGY))
+    assert list(result.columns) == ["low", "rain", "memo", "wind", "high", "location"]
+    assert result.index.equals(weather.index[weather["low"].notna()])
+    # only the column without strategy keeps null
+    assert result.drop(columns=["location"]).notna().all().all()
+    # input is not modified
+    pd.testing.assert_frame_equal(weather, before)
+
+    expected_missing = weather.isna().sum()
+    pd.testing.assert_series_equal(nh.missing, expected_missing[expected_missing > 0])
+
+
+def test_process_without_null(weather):
+    df = weather.dropna()
+    nh = NullHandler(strategy=STRATEGY, df=df)
+
+    result = nh.process(max_workers=2)
+
+    pd.testing.assert_frame_equal(result, df[["low", "rain", "memo", "wind", "high", "location"]])
+    assert nh.missing is None
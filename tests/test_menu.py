@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator import menu
+
+RECIPE_ITEM = pd.DataFrame({
+    "recipe_id": [1, 1, 2, 2, 2, 3, 4],
+    "item_id": [10, 11, 10, 12, 13, 14, 11],
+})
+RECIPE = pd.DataFrame({"id": [1, 2, 3, 4], "name": ["a", "b", "c", "d"], "season_id": [0, 0, 1, 1]})
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    loaded = {"recipe_item": RECIPE_ITEM}
+    monkeypatch.setattr(menu, "load_recipe_item", lambda: loaded["recipe_item"])
+    monkeypatch.setattr(menu, "load_recipe", lambda: RECIPE)
+    menu.clear_recipe_item_matrix()
+    yield loaded
+    menu.clear_recipe_item_matrix()
+
+
+def merge_cost_menu(fridge, threshold=2):
+    """
+        previous cost_menu: join recipe_item to fridge and aggregate by recipe
+    """
+    joined = pd.merge(RECIPE_ITEM, fridge, how="left", left_on="item_id", right_on="id")
+    grouped = joined.groupby("recipe_id")
+    menus = pd.DataFrame({
+        "item_count": grouped.apply(lambda x: x.price.isnull().sum()),
+        "cost": grouped.apply(lambda x: x.price.fillna(0).sum()).astype(np.int64),
+    }).reset_index()
+    menus = menus[menus.item_count < threshold]
+    return pd.merge(RECIPE, menus, how="inner", left_on="id", right_on="recipe_id").drop(["recipe_id"], axis=1)
+
+
+def test_cost_menu_matches_merge(tables):
+    fridge = pd.DataFrame({"id": [10, 11, 12, 15], "quantity": [1, 2, 1, 1], "price": [100, 200, 300, 50]})
+
+    result = menu.cost_menu(fridge, 1, threshold=2)
+
+    pd.testing.assert_frame_equal(
+        result.drop(["user_id"], axis=1), merge_cost_menu(fridge), check_dtype=False
+    )
+
+
+def test_cost_menu_of_user_group(tables):
+    # quantity and price of an item are arrays of users, as price() makes them
+    fridge = pd.DataFrame({
+        "id": [10, 11, 12],
+        "quantity": [np.array([1, 0]), np.array([1, 1]), np.array([0, 1])],
+        "price": [np.array([100, np.nan]), np.array([200, 210]), np.array([np.nan, 300])],
+    })
+
+    result = menu.cost_menu(fridge, 2, threshold=2).set_index(["user_id", "id"])
+
+    assert result.loc[(0, 1), ["item_count", "cost"]].tolist() == [0, 300]
+    assert result.loc[(1, 1), ["item_count", "cost"]].tolist() == [1, 210]
+    assert result.loc[(1, 4), ["item_count", "cost"]].tolist() == [0, 210]
+    assert (1, 2) not in result.index
+
+
+def test_clear_recipe_item_matrix(tables):
+    item_ids = (10, 11, 12, 13, 14)
+    before = menu.load_recipe_item_matrix(item_ids)
+    tables["recipe_item"] = pd.concat([RECIPE_ITEM, pd.DataFrame({"recipe_id": [5], "item_id": [12]})])
+
+    assert menu.load_recipe_item_matrix(item_ids) is before
+    menu.clear_recipe_item_matrix()
+    assert 5 in menu.load_recipe_item_matrix(item_ids).recipe_ids
+
+
+@pytest.fixture
+def random_tables(monkeypatch):
+    rng = np.random.default_rng(7)
+    recipe_num, item_num = 60, 25
+    recipe_item = pd.DataFrame({
+        "recipe_id": np.repeat(np.arange(1, recipe_num + 1), 4),
+        "item_id": rng.integers(0, item_num + 3, recipe_num * 4),  # some items are not in fridge
+    }).drop_duplicates()
+    recipe = pd.DataFrame({"id": np.arange(1, recipe_num + 1), "name": "r", "season_id": 0})
+    monkeypatch.setattr(menu, "load_recipe_item", lambda: recipe_item)
+    monkeypatch.setattr(menu, "load_recipe", lambda: recipe)
+    menu.clear_recipe_item_matrix()
+    yield rng, item_num
+    menu.clear_recipe_item_matrix()
+
+
+def random_fridge(rng, item_num, user_num):
+    return pd.DataFrame({
+        "id": np.arange(item_num),
+        "quantity": list(rng.integers(0, 2, (item_num, user_num))),
+        "price": list(rng.integers(1, 50, (item_num, user_num)).astype(float)),
+    })
+
+
+def flip(rng, fridge, num):
+    """
+        recapture of fridge: flip quantity of a few items and reprice some of them
+    """
+    fridge = fridge.copy()
+    fridge["quantity"] = list(np.stack(fridge.quantity.to_numpy()))
+    for i in rng.choice(len(fridge), num, replace=False):
+        fridge.at[i, "quantity"] = 1 - fridge.at[i, "quantity"]
+        fridge.at[i, "price"] = np.where(rng.random(len(fridge.at[i, "price"])) < 0.5,
+                                         rng.integers(1, 50, len(fridge.at[i, "price"])), fridge.at[i, "price"])
+    return fridge
+
+
+def full_top_k(fridge, user_num, k, threshold):
+    # recipes are in order of id, heap breaks ties of cost by it as well
+    menus = menu.cost_menu(fridge, user_num, threshold=threshold)
+    menus = menus.sort_values(["user_id", "cost", "id"]).groupby("user_id").head(k)
+    return menus.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("k", [1, 5, 100])
+def test_fridge_menu_index_matches_cost_menu(random_tables, k):
+    rng, item_num = random_tables
+    user_num, threshold = 3, 3
+    fridge = random_fridge(rng, item_num, user_num)
+    index = menu.FridgeMenuIndex(threshold=threshold)
+
+    expected = full_top_k(fridge, user_num, k, threshold)
+    pd.testing.assert_frame_equal(index.update(fridge).top_k(k), expected, check_dtype=False)
+    indexes = index.indexes
+
+    for _ in range(30):
+        fridge = flip(rng, fridge, rng.integers(1, 4))
+        result = index.update(fridge).top_k(k)
+
+        pd.testing.assert_frame_equal(result, full_top_k(fridge, user_num, k, threshold), check_dtype=False)
+    # recaptured fridges are applied incrementally
+    assert index.indexes is indexes
+
+
+def test_menu_index_version_and_compaction(random_tables):
+    rng, item_num = random_tables
+    fridge = random_fridge(rng, item_num, 1)
+    quantity, price = menu.fridge_matrices(fridge)
+    recipe_item = menu.load_recipe_item_matrix(tuple(fridge.id))
+    index = menu.MenuIndex(recipe_item, quantity[:, 0], price[:, 0], threshold=3)
+
+    # ids of items are their positions, pick one in some recipes
+    item_id = int(np.flatnonzero(recipe_item.matrix.getnnz(axis=0))[0])
+    recipes, _ = index.recipes_of(item_id)
+    before = index.version[recipes].copy()
+    index.update(item_id, 1, 1000)
+    index.update(item_id, 1, 1000)  # no change, no new version
+    assert (index.version[recipes] == before + 1).all()
+    # entries pushed before the update are stale now
+    assert any(r in set(recipes) and not index.is_valid((c, r, v)) for c, r, v in index.heap)
+
+    bound, pushed = 4 * len(index.version), len(index.heap)
+    for _ in range(500):
+        item_id = int(rng.integers(0, item_num))
+        index.update(item_id, int(rng.integers(0, 2)), int(rng.integers(1, 50)))
+        pushed += len(index.recipes_of(item_id)[0])
+        assert len(index.heap) <= bound + len(index.recipes_of(item_id)[0])
+    # heap would be far larger without compaction
+    assert pushed > 2 * bound
+
+    heap = index.heap
+    index.rebuild()
+    assert len(index.heap) <= len(heap)
+    assert all(map(index.is_valid, index.heap))
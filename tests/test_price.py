@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from simulator import price
+
+ITEMS = pd.DataFrame({
+    "id": [1, 2, 3],
+    "name": ["a", "b", "c"],
+    "sensitivity": [1, 1, 1],
+    "average": [1000.0, 2550.0, 40.0],
+    "delta": [200.0, 100.0, 30.0],
+})
+
+
+def test_price_matrix_is_items_by_users():
+    exist = np.ones((3, 6), dtype=int)
+
+    p = price.price_matrix(ITEMS, quantity=exist, random_state=0)
+
+    assert p.shape == (3, 6)
+
+
+def test_same_seed_same_matrix():
+    exist = np.random.default_rng(0).integers(0, 2, (3, 50))
+
+    first = price.price_matrix(ITEMS, quantity=exist, random_state=np.random.default_rng(7))
+    second = price.price_matrix(ITEMS, quantity=exist, random_state=np.random.default_rng(7))
+
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(price.price_matrix(ITEMS, quantity=exist, random_state=7), first)
+    assert not np.array_equal(price.price_matrix(ITEMS, quantity=exist, random_state=8), first)
+
+
+def test_samples_are_truncated():
+    exist = np.random.default_rng(0).integers(0, 2, (3, 2000))
+    avg, delta = ITEMS.average.to_numpy()[:, np.newaxis], ITEMS.delta.to_numpy()[:, np.newaxis]
+
+    p = price.sample_price(avg=ITEMS.average, delta=ITEMS.delta, exist=exist, random_state=0)
+
+    # missing items are not priced, the others are in [avg - delta, avg + delta] rounded to 10 won
+    assert (p[exist == 0] == 0).all()
+    priced = np.broadcast_to(exist == 1, p.shape)
+    low, upp = np.broadcast_to(avg - delta, p.shape), np.broadcast_to(avg + delta, p.shape)
+    assert (p[priced] >= np.floor(low[priced] / 10) * 10).all()
+    assert (p[priced] <= np.ceil(upp[priced] / 10) * 10).all()
+    assert (p % 10 == 0).all()
+
+
+def test_price_of_user_group():
+    data = ITEMS.assign(quantity=list(np.array([[1, 0], [1, 1], [0, 1]])))
+
+    result = price.price(data, num=2, random_state=0)
+
+    assert list(result.columns) == ["id", "name", "sensitivity", "quantity", "price"]
+    np.testing.assert_array_equal(
+        np.stack(result.price.to_numpy()),
+        price.price_matrix(ITEMS, quantity=np.array([[1, 0], [1, 1], [0, 1]]), random_state=0)
+    )
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from simulator import quantity
+
+ITEMS = pd.DataFrame({
+    "id": [1, 2, 3, 4],
+    "name": ["a", "b", "c", "d"],
+    "item_frequency": [0.0, 0.3, 0.7, 1.0],
+})
+
+
+def test_quantify_matrix_is_items_by_users():
+    q = quantity.quantify_matrix(ITEMS, num=5, random_state=0)
+
+    assert q.shape == (4, 5)
+    assert set(np.unique(q)) <= {0, 1}
+
+
+def test_same_seed_same_matrix():
+    first = quantity.quantify_matrix(ITEMS, num=50, random_state=np.random.default_rng(7))
+    second = quantity.quantify_matrix(ITEMS, num=50, random_state=np.random.default_rng(7))
+
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(quantity.quantify_matrix(ITEMS, num=50, random_state=7), first)
+    assert not np.array_equal(quantity.quantify_matrix(ITEMS, num=50, random_state=8), first)
+
+
+def test_samples_are_truncated(monkeypatch):
+    # values before binarize
+    monkeypatch.setattr(quantity, "binarize", lambda input_arr, threshold: input_arr)
+
+    x = quantity.sample_quantity(freq=ITEMS.item_frequency.to_numpy(), num=2000, random_state=0)
+
+    assert x.shape == (4, 2000)
+    assert (x >= 0).all() and (x <= 1).all()
+    # same distribution of each item as scalar analyze (truncnorm by item)
+    expected = np.array(list(map(
+        lambda f: quantity.get_truncated_normal(mean=f, sd=0.4, low=0, upp=1).mean(), ITEMS.item_frequency
+    )))
+    np.testing.assert_allclose(x.mean(axis=1), expected, atol=0.03)
+
+
+def test_quantify_keeps_index():
+    data = ITEMS.set_index(pd.Index([10, 20, 30, 40]))
+
+    result = quantity.quantify(data, num=3, random_state=0)
+
+    assert list(result.index) == [10, 20, 30, 40]
+    np.testing.assert_array_equal(
+        np.stack(result.quantity.to_numpy()), quantity.quantify_matrix(data, num=3, random_state=0)
+    )
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from itertools import islice
+
+import pandas as pd
+import pymysql.cursors
+import pytest
+
+import query_builder.core as core
+from query_builder.core import SelectBuilder, UpdateBuilder
+from simulator import menu
+from utils import db
+
+
+def test_check_update_binds_params_in_order_of_check_query(monkeypatch):
+    executed = []
+
+    def exec_void_query(args, query, schema_name):
+        executed.append((query, args))
+
+    def exec_return_query(query, schema_name, params=None):
+        executed.append((query, params))
+        return pd.DataFrame({"id": [3], "name": ["b"]})
+
+    monkeypatch.setattr(core, "exec_void_query", exec_void_query)
+    monkeypatch.setattr(core, "exec_return_query", exec_return_query)
+
+    UpdateBuilder(
+        table_name="item", value="name = %s", where_clause="WHERE id = %s", params=("b", 3)
+    ).execute()
+
+    (update, update_params), (check, check_params) = executed
+    assert update == "UPDATE item SET name = %s WHERE id = %s"
+    assert update_params == ("b", 3)
+    assert check == "SELECT * FROM item WHERE id = %s AND name = %s"
+    assert check_params == (3, "b")
+
+
+class FakeSSCursor:
+    """
+        unbuffered cursor: rows are fetched from server by fetchmany
+    """
+
+    def __init__(self, rows, calls):
+        self.rows = iter(rows)
+        self.calls = calls
+        self.description = (("recipe_id",), ("item_id",))
+
+    def execute(self, query, args=None):
+        self.calls.append(("execute", query, args))
+
+    def fetchmany(self, size):
+        self.calls.append(("fetchmany", size))
+        return list(islice(self.rows, size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.calls.append(("close",))
+
+
+class FakeConnection:
+    def __init__(self, rows, calls):
+        self.rows = rows
+        self.calls = calls
+
+    def cursor(self, cursor_class=None):
+        self.calls.append(("cursor", cursor_class))
+        return FakeSSCursor(self.rows, self.calls)
+
+
+@pytest.fixture
+def sscursor(monkeypatch):
+    rows = list(map(lambda i: (i // 3 + 1, 10 + i % 5), range(11)))
+    calls = []
+
+    @contextmanager
+    def pooled_connection(schema_name="bobsim_schema", local_infile=False):
+        calls.append(("borrow", schema_name))
+        yield FakeConnection(rows, calls)
+        calls.append(("return", schema_name))
+
+    monkeypatch.setattr(db, "pooled_connection", pooled_connection)
+    return rows, calls
+
+
+def test_execute_stream_fetches_chunks(sscursor):
+    rows, calls = sscursor
+    stream = SelectBuilder(
+        table_name="recipe_item", att_name="recipe_id, item_id", where_clause="WHERE recipe_id > %s", params=(0,)
+    ).execute_stream(chunk_size=4)
+
+    # nothing is executed until the stream is consumed
+    assert calls == []
+    chunks = list(stream)
+
+    assert list(map(len, chunks)) == [4, 4, 3]
+    assert list(chunks[0].columns) == ["recipe_id", "item_id"]
+    assert list(map(tuple, pd.concat(chunks).to_numpy())) == rows
+    assert calls[:3] == [
+        ("borrow", "bobsim_schema"),
+        ("cursor", pymysql.cursors.SSCursor),
+        ("execute", "SELECT recipe_id, item_id FROM recipe_item WHERE recipe_id > %s", (0,)),
+    ]
+    assert list(filter(lambda c: c[0] == "fetchmany", calls)) == [("fetchmany", 4)] * 4
+    assert calls[-2:] == [("close",), ("return", "bobsim_schema")]
+
+
+def test_load_recipe_item_streams_chunks(sscursor):
+    rows, calls = sscursor
+
+    recipe_item = menu.load_recipe_item(chunk_size=5)
+
+    assert list(map(tuple, recipe_item.to_numpy())) == rows
+    assert recipe_item.index.tolist() == list(range(len(rows)))
+    assert ("cursor", pymysql.cursors.SSCursor) in calls
+    assert list(filter(lambda c: c[0] == "fetchmany", calls)) == [("fetchmany", 5)] * 4
+
+    menu.clear_recipe_item_matrix()
+    matrix = menu.load_recipe_item_matrix((10, 11, 12, 13, 14))
+    menu.clear_recipe_item_matrix()
+    assert matrix.recipe_ids.tolist() == [1, 2, 3, 4]
+    assert matrix.item_count.tolist() == [3, 3, 3, 2]
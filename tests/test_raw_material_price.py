@@ -0,0 +1,249 @@
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_pipeline.dtype import dtype, reduction_dtype, parse_dtype
+from data_pipeline.open_data_raw_material_price.core import OpenDataRawMaterialPrice
+from data_pipeline.translate import translation
+from data_pipeline.unit import DEFAULT_UNIT, UNIT, get_unit
+from utils.sparse import filter_sparse
+
+ORIGIN = """조사일자,조사지역명,조사단위명,조사등급명,조사구분명,표준품목명,당일조사가격,조사가격품목명
+2019-08-01,서울,1kg,상품,소매,배추,3000,배추
+2019-08-01,부산,1kg,상품,소매,무,1500,무
+2019-08-02,서울,1kg,중품,도매,배추,2800,배추
+"""
+
+
+def load(dtypes: dict, compact: bool) -> pd.DataFrame:
+    """
+        same as OpenDataRawMaterialPrice.load (+ validate) without s3
+    """
+    options = {"usecols": list(dtypes.keys()), "dtype": parse_dtype(dtypes)} if compact else {}
+    df = pd.read_csv(StringIO(ORIGIN), **options)
+    return df[dtypes.keys()].astype(dtype=dtypes).rename(columns=translation["raw_material_price"])
+
+
+def test_digest_by_day_does_not_depend_on_compact_mode():
+    default = load(dtype["raw_material_price"], compact=False)
+    compact = load(reduction_dtype["raw_material_price"], compact=True)
+    assert default.dtypes.to_dict() != compact.dtypes.to_dict()
+    pd.testing.assert_frame_equal(
+        OpenDataRawMaterialPrice.normalize(compact), OpenDataRawMaterialPrice.normalize(default)
+    )
+
+    digests = OpenDataRawMaterialPrice.digest_by_day(default)
+
+    assert list(digests.keys()) == ["2019-08-01", "2019-08-02"]
+    assert OpenDataRawMaterialPrice.digest_by_day(compact) == digests
+
+
+def test_digest_by_day_changes_only_with_rows_of_the_day():
+    df = load(dtype["raw_material_price"], compact=False)
+    changed = df.assign(price=df["price"].where(df.index != 2, 2900))
+
+    before, after = OpenDataRawMaterialPrice.digest_by_day(df), OpenDataRawMaterialPrice.digest_by_day(changed)
+
+    assert before["2019-08-01"] == after["2019-08-01"]
+    assert before["2019-08-02"] != after["2019-08-02"]
+    # order-insensitive
+    assert OpenDataRawMaterialPrice.digest_by_day(df.iloc[::-1]) == before
+
+
+STD_LIST_KEY = "food_material_price_predict_model/constants/std_list.pkl"
+ORIGIN_KEY = "public_data/open_data_raw_material_price/origin/csv/{name}.csv"
+HEADER = "조사일자,조사지역명,조사단위명,조사등급명,조사구분명,표준품목명,당일조사가격\n"
+
+
+def put_origin(bucket, name: str, rows: list):
+    import boto3
+    body = (HEADER + "".join(map(lambda r: ",".join(map(str, r)) + "\n", rows))).encode("euc-kr")
+    boto3.client("s3").put_object(Bucket=bucket, Key=ORIGIN_KEY.format(name=name), Body=body)
+
+
+def full_process(bucket, objects: list) -> pd.DataFrame:
+    """
+        processed partition of every origin row, regardless of objects they are in
+    """
+    price = OpenDataRawMaterialPrice(bucket_name=bucket, date="201908", incremental=True)
+    origin = price.validate(pd.read_csv(StringIO(HEADER + "".join(
+        map(lambda r: ",".join(map(str, r)) + "\n", [row for rows in objects for row in rows]))
+    )))
+    return price.clean(price.filter(origin))
+
+
+def processed(bucket) -> pd.DataFrame:
+    price = OpenDataRawMaterialPrice(bucket_name=bucket, date="201908", file_format="parquet", incremental=True)
+    return price.load_process().astype({"region": "object", "standard_item_name": "object"})
+
+
+def assert_processed(bucket, objects: list):
+    expected = full_process(bucket, objects).astype({"region": "object", "standard_item_name": "object"})
+    pd.testing.assert_frame_equal(processed(bucket), expected, check_dtype=False)
+
+
+def incremental(bucket, caplog) -> str:
+    caplog.clear()
+    price = OpenDataRawMaterialPrice(bucket_name=bucket, date="201908", file_format="parquet", incremental=True)
+    assert price.process() == 0
+    return caplog.text
+
+
+def test_process_incremental(s3_bucket, caplog):
+    from utils.s3_manager.manage import S3Manager
+
+    caplog.set_level("INFO")
+    S3Manager(bucket_name=s3_bucket).save_dump(x=["배추", "무"], key=STD_LIST_KEY)
+    month = [
+        ("2019-08-01", "서울", "1KG", "상품", "소비자가격", "배추", 3000),
+        ("2019-08-01", "부산", "1KG", "상품", "소비자가격", "무", 1500),
+        ("2019-08-02", "서울", "1KG", "상품", "소비자가격", "배추", 2800),
+        ("2019-08-02", "서울", "1KG", "중품", "도매가격", "배추", 2000),
+    ]
+    put_origin(s3_bucket, "201908", month)
+    full = OpenDataRawMaterialPrice(bucket_name=s3_bucket, date="201908", file_format="parquet")
+    assert full.process() == 0
+    assert_processed(s3_bucket, [month])
+
+    # no-op
+    assert "up to date" in incremental(s3_bucket, caplog)
+
+    # new day, and a daily object of a day already in the month object
+    daily = [
+        ("2019-08-01", "서울", "1KG", "중품", "소비자가격", "배추", 3200),
+        ("2019-08-03", "서울", "1KG", "상품", "소비자가격", "파", 900),
+    ]
+    put_origin(s3_bucket, "20190801", daily)
+    log = incremental(s3_bucket, caplog)
+    assert "1 origin objects are changed, 1 reloaded, 2 days to be processed" in log
+    assert_processed(s3_bucket, [month, daily])
+
+    # changed day of the month object, the daily object shares it
+    month[1] = ("2019-08-01", "부산", "1KG", "상품", "소비자가격", "무", 1700)
+    put_origin(s3_bucket, "201908", month)
+    log = incremental(s3_bucket, caplog)
+    assert "1 origin objects are changed, 1 reloaded, 1 days to be processed" in log
+    assert_processed(s3_bucket, [month, daily])
+
+    # day removed from the daily object
+    daily = daily[:1]
+    put_origin(s3_bucket, "20190801", daily)
+    incremental(s3_bucket, caplog)
+    assert_processed(s3_bucket, [month, daily])
+
+    assert "up to date" in incremental(s3_bucket, caplog)
+    manifest = OpenDataRawMaterialPrice(
+        bucket_name=s3_bucket, date="201908", file_format="parquet", incremental=True
+    ).load_manifest()
+    assert manifest["object_days"] == {
+        ORIGIN_KEY.format(name="201908"): ["2019-08-01", "2019-08-02"],
+        ORIGIN_KEY.format(name="20190801"): ["2019-08-01"],
+    }
+    assert sorted(manifest["days"]) == ["2019-08-01", "2019-08-02"]
+
+
+CATEGORY_COLUMNS = ["standard_item_name", "survey_price_item_name", "standard_breed_name", "survey_price_type_name"]
+
+
+def reference_convert_by_unit(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        previous convert_by_unit: get_unit per row
+    """
+    return df.assign(unit=lambda r: r.unit_name.astype(object).map(lambda x: get_unit(x))).assign(
+        price=lambda x: x.price / x.unit
+    ).drop(columns=["unit_name", "unit"], axis=1)
+
+
+def reference_combine_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """
+        previous combine_categories: strings concatenated per row
+    """
+    return df.astype(object).assign(
+        item_name=lambda x: x.standard_item_name + x.survey_price_item_name + x.standard_breed_name +
+        x.survey_price_type_name
+    ).drop(columns=CATEGORY_COLUMNS, axis=1)
+
+
+def reference_filter_sparse(column: pd.Series, std_list: list) -> pd.Series:
+    """
+        previous filter_sparse: replace every unique value not in std_list
+    """
+    sparse_list = list(filter(lambda x: x not in std_list, column.unique()))
+    return column.replace(sparse_list, "others")
+
+
+def random_column(rng, values: list, n: int, dtype: str) -> pd.Series:
+    """
+        values with missing ones, as object or categorical column
+    """
+    column = pd.Series(rng.choice(values + [None], n), dtype="object").where(lambda s: s.notna(), np.nan)
+    return column.astype(dtype)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("column_dtype", ["object", "category"])
+def test_convert_by_unit_matches_reference(seed, column_dtype):
+    rng = np.random.default_rng(seed)
+    n = 200
+    df = pd.DataFrame({
+        "unit_name": random_column(rng, list(UNIT.keys())[:8] + ["3KG", "1봉"], n, column_dtype),
+        "price": rng.integers(100, 10000, n),
+        "region": random_column(rng, ["서울", "부산"], n, column_dtype),
+    })
+
+    result = OpenDataRawMaterialPrice.convert_by_unit(df)
+
+    pd.testing.assert_frame_equal(result, reference_convert_by_unit(df))
+    # missing unit_name keeps price (default unit)
+    missing = df["unit_name"].isna().to_numpy()
+    assert missing.any()
+    assert (result["price"].to_numpy()[missing] == df["price"].to_numpy()[missing] / DEFAULT_UNIT).all()
+
+
+def test_convert_by_unit_without_unit_name():
+    df = pd.DataFrame({"unit_name": pd.Series([np.nan, np.nan], dtype="category"), "price": [100, 200]})
+
+    result = OpenDataRawMaterialPrice.convert_by_unit(df)
+
+    assert result["price"].tolist() == [100.0, 200.0]
+    assert list(result.columns) == ["price"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("column_dtype", ["object", "category"])
+def test_combine_categories_matches_reference(seed, column_dtype):
+    rng = np.random.default_rng(seed)
+    n = 200
+    # "ab" + "c" and "a" + "bc" make the same name
+    df = pd.DataFrame(dict(map(
+        lambda c: (c, random_column(rng, ["a", "ab", "bc", "c"], n, column_dtype)), CATEGORY_COLUMNS
+    ))).assign(price=rng.integers(100, 10000, n))
+
+    result = OpenDataRawMaterialPrice.combine_categories(df)
+
+    assert isinstance(result["item_name"].dtype, pd.CategoricalDtype)
+    assert result["item_name"].isna().any()
+    pd.testing.assert_frame_equal(
+        result.astype({"item_name": "object"}), reference_combine_categories(df).astype({"price": "int64"})
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("column_dtype", ["object", "category"])
+def test_filter_sparse_matches_reference(seed, column_dtype):
+    rng = np.random.default_rng(seed)
+    values = ["배추", "무", "파", "양파", "마늘", "others"]
+    column = random_column(rng, values, 200, column_dtype)
+    std_list = list(rng.choice(values, 3, replace=False))
+
+    result = filter_sparse(column=column, std_list=std_list)
+
+    expected = reference_filter_sparse(column.astype(object), std_list)
+    assert column.isna().any()
+    assert result.notna().all()
+    pd.testing.assert_series_equal(result.astype(object), expected.astype(object))
+    if column_dtype == "category":
+        # sorting by the column is the same as sorting by values
+        assert list(result.cat.categories) == sorted(result.cat.categories)
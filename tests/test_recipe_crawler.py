@@ -0,0 +1,144 @@
+import json
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import boto3
+import pytest
+
+from crawler.ancestor import SeleniumCrawler
+from crawler.pool import RecipeCrawlerPool
+from crawler.recipe import MangaeRecipeCrawler
+from crawler.static import StaticDriver
+from utils.s3_manager import manage
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "mangae"
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def guess_type(self, path):
+        # saved pages are named by recipe id without extension
+        return super().guess_type(path) if "." in Path(path).name else "text/html; charset=utf-8"
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def recipe_server(tmp_path):
+    """
+        saved pages of 10000recipe served by a local HTTP server, '{base}' in pages is replaced by its url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=str(tmp_path)))
+    base = "http://127.0.0.1:{port}".format(port=server.server_address[1])
+
+    (tmp_path / "images").mkdir()
+    for path in FIXTURES.rglob("*"):
+        if path.is_file():
+            target = tmp_path / path.relative_to(FIXTURES)
+            if path.parent.name == "images":
+                target.write_bytes(path.read_bytes())
+            else:
+                target.write_text(path.read_text(encoding="utf-8").replace("{base}", base), encoding="utf-8")
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+class Browser(StaticDriver):
+    """
+        stands in for chrome: 'rendered' page is the saved page after JS ran
+    """
+    threads = []
+
+    def get(self, url: str) -> None:
+        self.threads.append(threading.current_thread())
+        super().get(url + ".rendered")
+
+
+def make_crawler(base, bucket_name, candidate_num):
+    crawler = MangaeRecipeCrawler(
+        base_url=base, candidate_num=candidate_num, bucket_name=bucket_name, key="crawled_recipe/mangae",
+        backend="lxml"
+    )
+    crawler.driver.fallback = Browser
+    return crawler
+
+
+def test_crawl_page_of_static_html(recipe_server, s3_bucket):
+    crawler = make_crawler(recipe_server, s3_bucket, range(101, 102))
+
+    recipe, image_url = crawler.crawl_page(recipe_num=101)
+
+    assert dict(recipe) == {
+        "title": "김치찌개",
+        "duration": 30,
+        "person": 2,
+        "items": {"김치": 0.5, "돼지고기": 200.0},
+        "tags": ["찌개", "김치", "한식"],
+    }
+    assert image_url == recipe_server + "/images/101.jpg"
+    assert crawler.driver.browser is None
+
+
+def test_process_async_renders_off_event_loop(recipe_server, s3_bucket):
+    crawler = make_crawler(recipe_server, s3_bucket, range(101, 104))
+    Browser.threads = []
+
+    recipes = crawler.process_async(concurrency=4)
+
+    # 103 is not found
+    assert sorted(recipes.keys()) == [101, 102]
+    assert recipes[102]["title"] == "된장국"
+    assert recipes[102]["duration"] == 60
+    assert recipes[102]["items"] == {"된장": 1.5}
+    assert recipes[101]["image_url"].endswith("crawled_recipe/mangae/images/101.jpg")
+
+    assert len(Browser.threads) == 1
+    assert Browser.threads[0] is not threading.main_thread()
+
+    s3 = boto3.client("s3")
+    keys = sorted(map(lambda o: o["Key"], s3.list_objects_v2(Bucket=s3_bucket)["Contents"]))
+    assert keys == [
+        "crawled_recipe/mangae/101-103.json",
+        "crawled_recipe/mangae/images/101.jpg",
+        "crawled_recipe/mangae/images/102.jpg",
+    ]
+    saved = json.loads(s3.get_object(Bucket=s3_bucket, Key="crawled_recipe/mangae/101-103.json")["Body"].read())
+    assert saved["101"]["title"] == "김치찌개"
+
+
+def test_pool_crawls_shards_with_real_s3_manager(recipe_server, s3_bucket, monkeypatch):
+    created_on = []
+    resource = boto3.resource
+
+    def record_resource(*args, **kwargs):
+        created_on.append(threading.current_thread())
+        return resource(*args, **kwargs)
+
+    monkeypatch.setattr(manage.boto3, "resource", record_resource)
+    monkeypatch.setattr(SeleniumCrawler, "open_browser", lambda self: Browser())
+    pool = RecipeCrawlerPool(
+        MangaeRecipeCrawler, candidate_num=range(101, 104), bucket_name=s3_bucket, key="crawled_recipe/mangae",
+        worker_num=3, io_worker_num=2, base_url=recipe_server, backend="lxml"
+    )
+
+    recipes = pool.process()
+
+    assert sorted(recipes.keys()) == [101, 102]
+    assert recipes[102]["title"] == "된장국"
+    assert pool.sink.failed == {103}
+    # S3Manager of every crawler is made on the calling thread, not on workers of pool
+    assert len(created_on) == 4
+    assert set(created_on) == {threading.current_thread()}
+
+    keys = sorted(map(lambda o: o["Key"], boto3.client("s3").list_objects_v2(Bucket=s3_bucket)["Contents"]))
+    assert keys == [
+        "crawled_recipe/mangae/101-103.json",
+        "crawled_recipe/mangae/images/101.jpg",
+        "crawled_recipe/mangae/images/102.jpg",
+    ]
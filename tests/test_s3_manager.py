@@ -0,0 +1,205 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import boto3
+import pandas as pd
+import pytest
+from botocore.response import StreamingBody
+
+from data_pipeline.batch import month_range, pick_month
+from utils.s3_manager.cache import S3Cache
+from utils.s3_manager.manage import S3Manager
+
+
+def make_body(data: bytes):
+    return StreamingBody(BytesIO(data), len(data))
+
+
+def test_parse_body_decodes_euc_kr_csv_from_streaming_body():
+    data = "조사일자,조사지역명,당일조사가격\n2019-05-01,서울,1000\n2019-05-02,부산,2000\n".encode("euc-kr")
+
+    df = S3Manager.parse_body(make_body(data), conversion_type="csv")
+
+    assert list(df.columns) == ["조사일자", "조사지역명", "당일조사가격"]
+    assert df["조사지역명"].tolist() == ["서울", "부산"]
+    assert df["당일조사가격"].tolist() == [1000, 2000]
+
+
+def test_save_object_from_many_threads(s3_bucket):
+    manager = S3Manager(bucket_name=s3_bucket)
+    keys = list(map(lambda i: "images/{i}.jpg".format(i=i), range(32)))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(
+            lambda k: manager.save_img(data=BytesIO(k.encode()), key=k, kwargs={"ContentType": "image/jpg"}), keys
+        ))
+
+    assert all(codes)
+    saved = manager.list_objects(prefix="images/")
+    assert sorted(map(lambda o: o["Key"], saved)) == sorted(keys)
+
+
+def put_weather(bucket_name):
+    locations = ["서울", "부산", "대구"]
+    data = "일시,지점,평균기온(°C)\n" + "".join(map(
+        lambda i: "2019-0{m}-0{d},{loc},{t}\n".format(m=1 + i % 2, d=1 + i // 2, loc=locations[i % 3], t=i),
+        range(8)
+    ))
+    boto3.client("s3").put_object(Bucket=bucket_name, Key="origin/csv/weather.csv", Body=data.encode("euc-kr"))
+
+
+def test_fetch_df_from_csv_chunks_keeps_category(s3_bucket):
+    put_weather(s3_bucket)
+    manager = S3Manager(bucket_name=s3_bucket)
+
+    # categories of chunks differ: [부산, 서울], [대구, 서울], ...
+    df = manager.fetch_df_from_csv_chunks(
+        key="origin/csv", chunksize=2, dtype={"지점": "category"},
+        row_filter=lambda chunk: chunk["일시"].str.startswith("2019-01")
+    )[0]
+    whole = manager.fetch_df_from_csv(key="origin/csv", dtype={"지점": "category"})[0]
+
+    assert df["지점"].dtype == whole["지점"].dtype
+    pd.testing.assert_frame_equal(df, whole[whole["일시"].str.startswith("2019-01")].reset_index(drop=True))
+
+
+WEATHER_COLUMNS = ["일시", "지점", "평균기온(°C)"]
+WEATHER_DTYPE = {"지점": "category"}
+
+
+def fetch_month_by_chunks(manager, term):
+    return manager.fetch_df_from_csv_chunks(
+        key="origin/csv", chunksize=2, row_filter=pick_month("일시", term), columns=WEATHER_COLUMNS,
+        dtype=WEATHER_DTYPE
+    )[0]
+
+
+def test_fetch_df_from_csv_select_falls_back_to_streaming(s3_server_bucket):
+    # S3 Select supports only utf-8 objects, origin csv is euc-kr
+    put_weather(s3_server_bucket)
+    manager = S3Manager(bucket_name=s3_server_bucket)
+    term = datetime(2019, 1, 1)
+
+    df = manager.fetch_df_from_csv_select(
+        key="origin/csv", columns=WEATHER_COLUMNS, where=month_range("일시", term), dtype=WEATHER_DTYPE
+    )[0]
+
+    assert len(df) == 4
+    pd.testing.assert_frame_equal(df, fetch_month_by_chunks(manager, term))
+
+
+def test_fetch_df_from_csv_select_parses_utf8_records(s3_bucket, monkeypatch):
+    put_weather(s3_bucket)
+    manager = S3Manager(bucket_name=s3_bucket)
+    term = datetime(2019, 1, 1)
+    expected = fetch_month_by_chunks(manager, term)
+
+    def select_object_content(Bucket, Key, Expression, **kwargs):
+        assert (Bucket, Key) == (s3_bucket, "origin/csv/weather.csv")
+        assert Expression == \
+            "SELECT s._1, s._2, s._3 FROM S3Object s WHERE s._1 >= '2019-01' AND s._1 < '2019-02'"
+        records = expected.to_csv(header=False, index=False).encode("utf-8")
+        # records are split into events at any byte, even in the middle of a character
+        return {"Payload": iter([
+            {"Records": {"Payload": records[:7]}}, {"Records": {"Payload": records[7:]}}, {"Stats": {}}, {"End": {}}
+        ])}
+
+    monkeypatch.setattr(manager.s3.meta.client, "select_object_content", select_object_content)
+
+    df = manager.fetch_df_from_csv_select(
+        key="origin/csv", columns=WEATHER_COLUMNS, where=month_range("일시", term), dtype=WEATHER_DTYPE
+    )[0]
+
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_cache_misses_changed_object(s3_bucket, tmp_path):
+    manager = S3Manager(bucket_name=s3_bucket, cache=S3Cache(cache_dir=tmp_path))
+    s3 = boto3.client("s3")
+    s3.put_object(Bucket=s3_bucket, Key="data/a.json", Body=b'{"v": 1}')
+
+    assert manager.fetch_dict_from_json(key="data/a.json") == [{"v": 1}]
+    assert manager.fetch_dict_from_json(key="data/a.json") == [{"v": 1}]
+    assert (manager.cache.hits, manager.cache.misses) == (1, 1)
+
+    # new ETag, the stale entry is not served
+    s3.put_object(Bucket=s3_bucket, Key="data/a.json", Body=b'{"v": 2}')
+    assert manager.fetch_dict_from_json(key="data/a.json") == [{"v": 2}]
+    assert manager.cache.stats == {"hits": 1, "misses": 2, "size": len(b'{"v": 1}') + len(b'{"v": 2}')}
+
+    manager.cache.clear()
+    assert manager.cache.stats == {"hits": 0, "misses": 0, "size": 0}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = S3Cache(cache_dir=tmp_path, max_bytes=25)
+
+    def put(key):
+        cache.open("bucket", key, "etag", fetch=lambda: BytesIO(b"0123456789")).close()
+
+    put("a")
+    put("b")
+    # b is accessed before a
+    past = datetime(2020, 1, 1).timestamp()
+    os.utime(tmp_path / cache.make_name("bucket", "b", "etag"), (past, past))
+    os.utime(tmp_path / cache.make_name("bucket", "a", "etag"), (past + 1, past + 1))
+    cache.open("bucket", "a", "etag", fetch=None).close()
+
+    put("c")
+
+    assert cache.get("bucket", "b", "etag") is None
+    cache.get("bucket", "a", "etag").close()
+    cache.get("bucket", "c", "etag").close()
+    assert cache.size == 20
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+class BrokenBody(BytesIO):
+    def read(self, *args):
+        if self.tell() > 0:
+            raise ConnectionResetError("reset while streaming")
+        return super().read(4)
+
+
+def test_cache_does_not_keep_partial_file(tmp_path):
+    cache = S3Cache(cache_dir=tmp_path)
+
+    with pytest.raises(ConnectionResetError):
+        cache.open("bucket", "key", "etag", fetch=lambda: BrokenBody(b"0123456789"))
+
+    assert list(tmp_path.iterdir()) == []
+    assert cache.misses == 1
+
+
+def test_parquet_round_trip_keeps_dtypes(s3_bucket):
+    manager = S3Manager(bucket_name=s3_bucket)
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2019-08-01", "2019-08-02", "2019-08-02"]),
+        "region": pd.Categorical(["서울", "부산", "서울"]),
+        "price": pd.Series([1000, 1500, 2800], dtype="int32"),
+        "t_temper_avg": pd.Series([25.5, None, 27.0], dtype="float32"),
+    })
+
+    assert manager.save_df(df=df, key="process/parquet/201908.parquet", file_format="parquet")
+
+    fetched = manager.fetch_df_from_parquet(key="process/parquet/201908.parquet")
+    assert len(fetched) == 1
+    pd.testing.assert_frame_equal(fetched[0], df)
+
+    projected = manager.fetch_df(key="process/parquet/201908.parquet", file_format="parquet",
+                                 columns=["region", "price"])[0]
+    pd.testing.assert_frame_equal(projected, df[["region", "price"]])
+
+
+def test_csv_round_trip_of_save_df(s3_bucket):
+    manager = S3Manager(bucket_name=s3_bucket)
+    df = pd.DataFrame({"date": ["2019-08-01", "2019-08-02"], "region": ["서울", "부산"], "price": [1000, 1500]})
+
+    assert manager.save_df(df=df, key="process/csv/201908.csv")
+
+    pd.testing.assert_frame_equal(manager.fetch_df(key="process/csv/201908.csv")[0], df)
+    pd.testing.assert_frame_equal(
+        manager.fetch_df(key="process/csv/201908.csv", columns=["region"])[0], df[["region"]]
+    )
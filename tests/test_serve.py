@@ -0,0 +1,68 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("gunicorn")
+
+from api import serve  # noqa: E402
+from api.job import CrawlJob, CrawlJobQueue  # noqa: E402
+
+
+def test_parse_args_defaults():
+    options = serve.parse_args(["serve"])
+
+    assert options == {
+        "bind": "0.0.0.0:9000",
+        "workers": serve.DEFAULT_WORKERS,
+        "threads": serve.DEFAULT_THREADS,
+        "worker_class": "gthread",
+        "timeout": serve.DEFAULT_TIMEOUT,
+        "graceful_timeout": serve.DEFAULT_GRACEFUL_TIMEOUT,
+        "worker_exit": serve.worker_exit,
+    }
+
+
+def test_parse_args_warns_many_workers(caplog):
+    options = serve.parse_args(["serve", "--host", "127.0.0.1", "--port", "9100", "--workers", "2", "--threads", "4"])
+
+    assert options["bind"] == "127.0.0.1:9100"
+    assert (options["workers"], options["threads"]) == (2, 4)
+    assert "2 workers do not share crawl jobs and metrics" in caplog.text
+
+
+def test_options_are_valid_gunicorn_settings():
+    application = serve.CrawlingApplication(options=serve.parse_args(["serve", "--threads", "4"]))
+
+    assert application.cfg.threads == 4
+    assert application.cfg.worker_class_str == "gthread"
+    assert application.cfg.worker_exit is serve.worker_exit
+
+
+def test_worker_exit_cancels_queued_jobs(s3_bucket, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def run(self):
+        ran.append(self.job_id)
+        started.set()
+        release.wait(timeout=10)
+
+    monkeypatch.setattr(CrawlJob, "run", run)
+    job_queue = CrawlJobQueue(max_workers=1)
+    running = job_queue.submit(CrawlJob(source="M", candidate_num=range(1, 10), bucket_name=s3_bucket))
+    job_queue.submit(CrawlJob(source="M", candidate_num=range(10, 20), bucket_name=s3_bucket))
+    assert started.wait(timeout=10)
+
+    serve.worker_exit(server=None, worker=SimpleNamespace(wsgi=SimpleNamespace(extensions={
+        "crawl_job_queue": job_queue
+    })))
+    release.set()
+    job_queue.executor.shutdown(wait=True)
+
+    # the running job is left to stop with the worker, the queued one never runs
+    assert ran == [running.job_id]
+
+
+def test_worker_exit_without_job_queue():
+    serve.worker_exit(server=None, worker=SimpleNamespace(wsgi=object()))
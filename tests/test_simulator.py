@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator import core, menu
+from simulator.core import BatchSimulator
+from simulator.user import UserGroup
+
+ITEMS = pd.DataFrame({
+    "id": [10, 11, 12, 13, 14, 15],
+    "name": ["a", "b", "c", "d", "e", "f"],
+    "item_frequency": [0.9, 0.6, 0.5, 0.8, 0.3, 0.7],
+    "average": [1000, 2000, 0, 500, 3000, 800],
+    "delta": [100, 300, 10, 50, 200, 0],
+})
+RECIPE_ITEM = pd.DataFrame({
+    "recipe_id": [1, 1, 2, 2, 2, 3, 4],
+    "item_id": [10, 11, 10, 13, 14, 14, 11],
+})
+RECIPE = pd.DataFrame({"id": [1, 2, 3, 4], "name": ["a", "b", "c", "d"], "season_id": [0, 0, 1, 1]})
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    monkeypatch.setattr(core, "exec_return_query", lambda query, schema_name: ITEMS)
+    monkeypatch.setattr(menu, "load_recipe_item", lambda: RECIPE_ITEM)
+    monkeypatch.setattr(menu, "load_recipe", lambda: RECIPE)
+    menu.clear_recipe_item_matrix()
+    yield
+    menu.clear_recipe_item_matrix()
+
+
+def test_user_group_is_columnar():
+    users = UserGroup(5, random_state=0)
+
+    assert users.ids.tolist() == [1, 2, 3, 4, 5]
+    assert users.gender.shape == users.b_type.shape == (5,)
+    assert list(users.record.columns) == ["id", "gender", "driven"]
+    assert users.record.id.tolist() == [1, 2, 3, 4, 5]
+
+
+def test_batch_simulator_process(tables, caplog):
+    caplog.set_level("INFO")
+    simulator = BatchSimulator(user_num=10, chunk_size=3, random_state=0)
+
+    users = simulator.process()
+
+    # items without average or delta are filtered
+    assert users.items.id.tolist() == [10, 11, 13, 14]
+    assert users.quantity.shape == users.price.shape == (4, 10)
+    assert users.quantity.dtype == np.int8 and users.price.dtype == np.int32
+    assert (users.price[users.quantity == 0] == 0).all()
+
+    # menus of chunks are the same as menus of all users at once
+    assert set(users.menu.user_id) <= set(users.ids)
+    expected = menu.load_recipe_item_matrix(tuple(users.items.id)).cost_menus(
+        users.quantity, users.price, user_ids=users.ids
+    )
+    pd.testing.assert_frame_equal(
+        users.menu.sort_values(["user_id", "recipe_id"]).reset_index(drop=True),
+        expected.sort_values(["user_id", "recipe_id"]).reset_index(drop=True)
+    )
+
+    assert "10 users are simulated in" in caplog.text
+    assert "users/sec" in caplog.text
+
+
+def test_batch_simulator_is_reproducible(tables):
+    first = BatchSimulator(user_num=7, chunk_size=2, random_state=3).process()
+    second = BatchSimulator(user_num=7, chunk_size=2, random_state=3).process()
+
+    np.testing.assert_array_equal(first.quantity, second.quantity)
+    np.testing.assert_array_equal(first.price, second.price)
+    np.testing.assert_array_equal(first.gender, second.gender)
+
+
+def test_user_of_group(tables):
+    users = BatchSimulator(user_num=4, random_state=1).process()
+
+    fridge = users.fridge(2)
+    assert (fridge.quantity > 0).all()
+    assert fridge.id.tolist() == users.items.id[users.quantity[:, 2] > 0].tolist()
+
+    # index of one user serves the menus of the user costed by batch
+    top = users.menu_index(2).top_k(k=100).sort_values("recipe_id").reset_index(drop=True)
+    costed = users.menu[users.menu.user_id == users.ids[2]].sort_values("recipe_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(top, costed.drop(columns=["user_id"]), check_dtype=False)